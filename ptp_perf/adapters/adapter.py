@@ -1,6 +1,10 @@
 import asyncio
+import logging
+import math
 from asyncio import CancelledError
+from dataclasses import dataclass
 from datetime import timedelta
+from typing import Optional
 
 from ptp_perf.models import PTPEndpoint
 
@@ -21,17 +25,75 @@ class Adapter:
         raise NotImplementedError()
 
 
+@dataclass
+class IntervalStatistics:
+    """Accounting of the ticks of an IntervalActionAdapter."""
+    ticks: int = 0
+    """Number of updates executed."""
+    overruns: int = 0
+    """Number of updates that did not finish before the next tick was due."""
+    skipped_ticks: int = 0
+    """Number of ticks that were skipped because of overruns."""
+    update_duration_total: timedelta = timedelta(0)
+    update_duration_max: timedelta = timedelta(0)
+
+    @property
+    def update_duration_mean(self) -> Optional[timedelta]:
+        if self.ticks == 0:
+            return None
+        return self.update_duration_total / self.ticks
+
+    def __str__(self):
+        return (f"{self.ticks} ticks (mean update {self.update_duration_mean}, max update {self.update_duration_max}), "
+                f"{self.overruns} overruns, {self.skipped_ticks} skipped ticks")
+
+
 class IntervalActionAdapter(Adapter):
-    """An adapter that runs a task at a fixed interval. This class is meant to be subclassed."""
+    """An adapter that runs a task at a fixed interval. This class is meant to be subclassed.
+
+    Ticks are scheduled at absolute deadlines (start + n * interval) on the event loop's monotonic clock, so the
+    period does not drift with the cost of update(). If an update takes longer than the interval,
+    the missed ticks are skipped (not executed late) and counted in the statistics."""
     interval: timedelta = timedelta(seconds=1)
+    statistics: IntervalStatistics
+    last_update_duration: Optional[timedelta] = None
+    """The duration of the last update, i.e. the collection cost of the last tick."""
+
+    def __init__(self, endpoint: PTPEndpoint):
+        super().__init__(endpoint)
+        self.statistics = IntervalStatistics()
 
     async def run(self):
+        loop = asyncio.get_running_loop()
+        interval = self.interval.total_seconds()
+        next_deadline = loop.time()
         try:
             while True:
+                update_start = loop.time()
                 await self.update()
-                await asyncio.sleep(1)
+                update_end = loop.time()
+
+                self.last_update_duration = timedelta(seconds=update_end - update_start)
+                self.statistics.ticks += 1
+                self.statistics.update_duration_total += self.last_update_duration
+                self.statistics.update_duration_max = max(self.statistics.update_duration_max, self.last_update_duration)
+
+                next_deadline += interval
+                if update_end > next_deadline:
+                    missed_ticks = math.floor((update_end - next_deadline) / interval) + 1
+                    self.statistics.overruns += 1
+                    self.statistics.skipped_ticks += missed_ticks
+                    next_deadline += missed_ticks * interval
+                    logging.debug(
+                        f"{type(self).__name__}: Update took {self.last_update_duration}, skipped {missed_ticks} ticks."
+                    )
+
+                await asyncio.sleep(next_deadline - loop.time())
         except CancelledError:
             pass
+        finally:
+            if self.statistics.ticks > 0:
+                logging.info(f"{type(self).__name__} (interval {self.interval}): {self.statistics}")
 
     async def update(self):
         raise NotImplementedError()
@@ -8,6 +8,10 @@ from ptp_perf.invoke.invocation import Invocation
 from ptp_perf.models import PTPEndpoint
 from ptp_perf.util import unpack_one_value_or_error
 
+IPERF_INTERVAL_REPORT_PATTERN = r"sec .*bits/sec"
+"""The per-second bandwidth reports of iPerf (-i 1), of which only every IPERF_KEEP_EVERY-th is kept."""
+IPERF_KEEP_EVERY = 60
+
 
 @dataclass
 class NetworkPerformanceDegrader:
@@ -39,7 +43,9 @@ class NetworkPerformanceDegrader:
 
         if self.endpoint.machine.plugin_settings.iperf_server:
             logging.info("Launching iPerf server...")
-            self.iperf_invocation = Invocation.of_command(*iperf_command, '-s')
+            self.iperf_invocation = Invocation.of_command(*iperf_command, '-s').capture_bounded().add_output_filter(
+                IPERF_INTERVAL_REPORT_PATTERN, keep_every=IPERF_KEEP_EVERY
+            )
         else:
             logging.debug("Waiting momentarily for iPerf server to come up...")
             await self.wait_for_port_open(server_address, 5001)
@@ -47,7 +53,7 @@ class NetworkPerformanceDegrader:
             # Launching clients
             self.iperf_invocation = Invocation.of_command(
                 *iperf_command, '-c', server_address, '-d', '-t', '0'
-            )
+            ).capture_bounded().add_output_filter(IPERF_INTERVAL_REPORT_PATTERN, keep_every=IPERF_KEEP_EVERY)
 
         await self.iperf_invocation.run()
 
@@ -103,5 +109,5 @@ class StressNGPerformanceDegrader:
         logging.info("Launching stress_ng tasks...")
         self.stressng_process = Invocation.of_command(
             *stress_ng_command,
-        )
+        ).capture_bounded()
         await self.stressng_process.run()
@@ -1,17 +1,166 @@
 import json
 import logging
+import time
+from datetime import timedelta
+from typing import List, Optional
 
 import psutil
+from django.db import DatabaseError
 
 from ptp_perf.adapters.adapter import IntervalActionAdapter
-from ptp_perf.util import unpack_one_value
+from ptp_perf.models.resource_sample import ResourceSample
 from ptp_perf.utilities import psutil_utilities
+from ptp_perf.utilities.proc_sampler import ProcSampler, ProcessSample, PROC_PATH
+from ptp_perf.utilities.server_clock import ServerClock
+
+# Names of the CPU temperature sensor, by platform
+CPU_TEMPERATURE_SENSORS = ["cpu_thermal", "CPU-therm"]
+
+
+def read_cpu_temperature() -> Optional[float]:
+    temperatures = psutil.sensors_temperatures()
+    for sensor in CPU_TEMPERATURE_SENSORS:
+        if sensor in temperatures and len(temperatures[sensor]) != 0:
+            return temperatures[sensor][0].current
+    return None
 
 
 class ResourceMonitor(IntervalActionAdapter):
+    """Records the resource consumption of the vendor processes and the system as ResourceSample rows.
+
+    The process metrics are summed over all processes of the vendor (e.g. ptp4l and phc2sys).
+    With the 'proc' sampler (Benchmark.monitor_resource_consumption_sampler), metrics are read from /proc directly
+    and USS/PSS are only read every smaps_interval, as reading them is expensive. The 'psutil' sampler reads
+    everything through psutil on every tick, it is also used if /proc is not available.
+
+    Samples are saved in batches of flush_batch_size. With log_json (Benchmark.monitor_resource_consumption_json),
+    a full psutil snapshot is additionally logged as JSON once per interval, for debugging."""
     log_source = 'resource_monitor'
+    flush_batch_size: int = 30
+    max_pending_samples: int = 3600
+    """Samples are kept for a later attempt if the database is unreachable, up to this number."""
+
+    _pending_samples: List[ResourceSample]
+    _proc_sampler: Optional[ProcSampler] = None
+    _last_smaps_time: Optional[int] = None
+
+    def __init__(self, endpoint):
+        super().__init__(endpoint)
+        self._pending_samples = []
+        self.interval = endpoint.benchmark.monitor_resource_consumption_interval
+        self.smaps_interval = endpoint.benchmark.monitor_resource_consumption_smaps_interval
+        self.log_json = endpoint.benchmark.monitor_resource_consumption_json
+        if endpoint.benchmark.monitor_resource_consumption_sampler == "proc" and PROC_PATH.exists():
+            self._proc_sampler = ProcSampler()
+
+    async def run(self):
+        try:
+            await super().run()
+        finally:
+            await self.flush()
+            if self._proc_sampler is not None:
+                self._proc_sampler.close()
+
+    def get_pids(self) -> List[int]:
+        return [
+            invocation._process.pid for invocation in self.endpoint.profile.vendor.get_processes()
+            if invocation is not None and invocation._process is not None
+        ]
 
     async def update(self):
+        collection_start = time.monotonic_ns()
+        sample = ResourceSample(
+            endpoint=self.endpoint,
+            timestamp=ServerClock.resolve().now(),
+        )
+
+        if self._proc_sampler is not None:
+            self.collect_proc(sample, collection_start)
+        else:
+            self.collect_psutil(sample)
+
+        sample.collection_duration = timedelta(microseconds=(time.monotonic_ns() - collection_start) // 1000)
+        self._pending_samples.append(sample)
+        if len(self._pending_samples) >= self.flush_batch_size:
+            await self.flush()
+
+        if self.log_json:
+            self.log_snapshot()
+
+    def collect_proc(self, sample: ResourceSample, collection_start: int):
+        system = self._proc_sampler.system
+        sample.sys_cpu_frequency = system.cpu_frequency()
+        sample.sys_sensors_temperature_cpu = system.cpu_temperature()
+
+        interface_counters = system.interface_counters(self.endpoint.machine.ptp_interface)
+        if interface_counters is not None:
+            sample.sys_net_ptp_iface_bytes_sent = interface_counters.bytes_sent
+            sample.sys_net_ptp_iface_bytes_received = interface_counters.bytes_received
+            sample.sys_net_ptp_iface_packets_sent = interface_counters.packets_sent
+            sample.sys_net_ptp_iface_packets_received = interface_counters.packets_received
+
+        read_smaps = (self._last_smaps_time is None
+                      or collection_start - self._last_smaps_time >= self.smaps_interval.total_seconds() * 1e9)
+        process_sample = self._proc_sampler.sample_processes(self.get_pids(), read_smaps=read_smaps)
+        if process_sample is not None:
+            if read_smaps:
+                self._last_smaps_time = collection_start
+            self.apply_process_sample(sample, process_sample)
+
+    def collect_psutil(self, sample: ResourceSample):
+        sample.sys_cpu_frequency = psutil.cpu_freq().current
+        sample.sys_sensors_temperature_cpu = read_cpu_temperature()
+
+        interface_counters = psutil.net_io_counters(pernic=True).get(self.endpoint.machine.ptp_interface)
+        if interface_counters is not None:
+            sample.sys_net_ptp_iface_bytes_sent = interface_counters.bytes_sent
+            sample.sys_net_ptp_iface_bytes_received = interface_counters.bytes_recv
+            sample.sys_net_ptp_iface_packets_sent = interface_counters.packets_sent
+            sample.sys_net_ptp_iface_packets_received = interface_counters.packets_recv
+
+        process_samples = []
+        for pid in self.get_pids():
+            try:
+                process_data = psutil.Process(pid).as_dict(
+                    [
+                        "cpu_times",
+                        # This does not work on TK-1
+                        # 'io_counters',
+                        'memory_full_info', 'num_ctx_switches', 'num_threads'
+                    ]
+                )
+                process_samples.append(
+                    ProcessSample(
+                        cpu_user=process_data["cpu_times"].user,
+                        cpu_system=process_data["cpu_times"].system,
+                        mem_rss=process_data["memory_full_info"].rss,
+                        mem_vms=process_data["memory_full_info"].vms,
+                        ctx_switches_voluntary=process_data["num_ctx_switches"].voluntary,
+                        ctx_switches_involuntary=process_data["num_ctx_switches"].involuntary,
+                        num_threads=process_data["num_threads"],
+                        mem_uss=process_data["memory_full_info"].uss,
+                        mem_pss=getattr(process_data["memory_full_info"], "pss", None),
+                    )
+                )
+            except psutil.NoSuchProcess:
+                logging.info(f"Resource monitor: Process {pid} not found.")
+
+        if len(process_samples) != 0:
+            self.apply_process_sample(sample, sum(process_samples[1:], start=process_samples[0]))
+
+    @staticmethod
+    def apply_process_sample(sample: ResourceSample, process_sample: ProcessSample):
+        sample.proc_cpu_user = process_sample.cpu_user
+        sample.proc_cpu_system = process_sample.cpu_system
+        sample.proc_mem_uss = process_sample.mem_uss
+        sample.proc_mem_pss = process_sample.mem_pss
+        sample.proc_mem_rss = process_sample.mem_rss
+        sample.proc_mem_vms = process_sample.mem_vms
+        sample.proc_ctx_switches_voluntary = process_sample.ctx_switches_voluntary
+        sample.proc_ctx_switches_involuntary = process_sample.ctx_switches_involuntary
+        sample.proc_num_threads = process_sample.num_threads
+
+    def log_snapshot(self):
         system_data = {
             'cpu_times': psutil.cpu_times(),
             'cpu_percent': psutil.cpu_percent(),
@@ -24,21 +173,13 @@ class ResourceMonitor(IntervalActionAdapter):
         }
 
         process_data = {}
-        invocation = unpack_one_value(self.endpoint.profile.vendor.get_processes())
-        if invocation is not None and invocation._process is not None:
-            pid = invocation._process.pid
+        for pid in self.get_pids():
             try:
-                process = psutil.Process(pid)
-                process_data = process.as_dict(
-                    [
-                        "cpu_times", "cpu_percent",
-                        # This does not work on TK-1
-                        # 'io_counters',
-                        'memory_full_info', 'num_ctx_switches', 'num_threads'
-                    ]
+                process_data[pid] = psutil.Process(pid).as_dict(
+                    ["cpu_times", "cpu_percent", 'memory_full_info', 'num_ctx_switches', 'num_threads']
                 )
             except psutil.NoSuchProcess:
-                logging.info(f"Resource monitor: Process {pid} not found.")
+                pass
 
         all_data = {
             'system': system_data,
@@ -47,3 +188,14 @@ class ResourceMonitor(IntervalActionAdapter):
 
         all_data = psutil_utilities.recursive_namedtuple_to_dict(all_data)
         self.log(json.dumps(all_data))
+
+    async def flush(self):
+        if len(self._pending_samples) == 0:
+            return
+        try:
+            await ResourceSample.objects.abulk_create(self._pending_samples)
+            self._pending_samples = []
+        except DatabaseError as e:
+            logging.warning(f"Resource monitor: Failed to save {len(self._pending_samples)} samples: {e}")
+            # Drop the oldest samples if the database stays unreachable.
+            self._pending_samples = self._pending_samples[-self.max_pending_samples:]
@@ -1,6 +1,8 @@
 import logging
 from datetime import datetime, timedelta
 
+from django.db.models import Max
+
 from ptp_perf import util
 from ptp_perf.adapters.fault_generators import SoftwareFaultGenerator
 from ptp_perf.adapters.performance_degraders import NetworkPerformanceDegrader, StressNGPerformanceDegrader
@@ -8,9 +10,10 @@ from ptp_perf.adapters.resource_monitor import ResourceMonitor
 from ptp_perf.constants import PTPPERF_REPOSITORY_ROOT
 from ptp_perf.invoke.invocation import Invocation
 from ptp_perf.machine import Machine
-from ptp_perf.models import PTPProfile, PTPEndpoint
+from ptp_perf.models import PTPProfile, PTPEndpoint, LogRecord
 from ptp_perf.util import async_wait_for_condition
 from ptp_perf.utilities.django_utilities import get_server_datetime
+from ptp_perf.utilities.log_spool import LogSpool, LogSpoolUploader, upload_leftover_spools
 from ptp_perf.utilities.logging import LogToDBLogRecordHandler
 from ptp_perf.utilities.multi_task_controller import MultiTaskController
 from ptp_perf.vendor.registry import VendorDB
@@ -24,11 +27,17 @@ async def benchmark(endpoint_id: str):
     endpoint.restart_count += 1
     await endpoint.asave()
 
-
-    handler = LogToDBLogRecordHandler(endpoint)
+    # Log records go to a local spool first, so that logging continues when the database is unreachable.
+    # After a restart, the spool continues the sequence numbers of the previous run.
+    uploaded_records = await LogRecord.objects.filter(endpoint=endpoint).aaggregate(last_sequence=Max('spool_sequence'))
+    spool = LogSpool(endpoint.id, last_sequence=uploaded_records['last_sequence'] or 0)
+    handler = LogToDBLogRecordHandler(endpoint, spool=spool)
     handler.install()
+    uploader = LogSpoolUploader(spool)
+    uploader.start()
 
     background_tasks = MultiTaskController()
+    streaming_parser = None
 
     try:
         profile.vendor.create_configuration_file(endpoint)
@@ -61,6 +70,11 @@ async def benchmark(endpoint_id: str):
         if profile.benchmark.monitor_resource_consumption:
             background_tasks.add_coroutine(ResourceMonitor(endpoint).run())
 
+        # Extract samples while the vendor runs. Not on restarts, as the samples of the previous run were lost,
+        # and not with hardware faults, where the database is unreachable for parts of the benchmark.
+        if is_first_startup and not profile.benchmark.fault_hardware:
+            streaming_parser = profile.vendor.create_streaming_parser(endpoint)
+
         logging.info(f"Starting {profile.vendor}...")
         background_tasks.add_coroutine(
             profile.vendor.run(endpoint), label=f"{profile.vendor.name}"
@@ -86,7 +100,12 @@ async def benchmark(endpoint_id: str):
         logging.error(f"Benchmark {profile} failed: {e}")
         util.log_exception(e, force_traceback=True)
 
+    if streaming_parser is not None:
+        streaming_parser.save()
+
     handler.uninstall()
+    uploader.stop()
+    upload_leftover_spools(exclude_endpoint_id=endpoint.id)
 
     return profile
 
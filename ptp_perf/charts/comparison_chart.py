@@ -9,6 +9,7 @@ from pandas.core.dtypes.common import is_numeric_dtype
 from ptp_perf.charts.chart_container import ChartContainer, YAxisLabelType
 from ptp_perf.models import PTPEndpoint
 from ptp_perf.profiles.data_container import BootstrapMetric
+from ptp_perf.profiles.quantile_confidence import ConfidenceIntervalMethod
 from ptp_perf.util import unpack_one_value
 from ptp_perf.utilities import units
 from ptp_perf.utilities.colors import adjust_lightness
@@ -46,6 +47,10 @@ class ComparisonChart(ChartContainer):
     """Whether to import the confidence intervals from each endpoint that is plotted."""
     include_additional_quantile_confidence_intervals: bool = False
     """Whether to compute additional aggregate quantile confidence intervals for the confidence intervals provided by seaborn."""
+    confidence_interval_method: ConfidenceIntervalMethod = ConfidenceIntervalMethod.SCIPY_BOOTSTRAP
+    """How the additional quantile confidence intervals are computed (ORDER_STATISTIC is faster but not BCa)."""
+    confidence_interval_jobs: int = 1
+    """The number of worker processes for the additional quantile confidence intervals."""
     hue_name: str = "Vendor"
 
     axes: List[List[plt.Axes]] = None
@@ -76,25 +81,28 @@ class ComparisonChart(ChartContainer):
         # Draw error bars under the actual plot
         if self.include_additional_quantile_confidence_intervals:
             # Draw median = most important, last, for all vendors
-            for quantile in [0.05, 0.95, 0.5]:
-                for name, group in data.groupby(by=["hue", "x"]):
-                    if len(group) <= 1:
-                        continue
-
-                    bootstrap_metric = BootstrapMetric.create(group["y"], quantile=quantile)
-                    # if bootstrap_metric.relative_magnitude >= 0.1:
-                    base_color = seaborn.color_palette()[1] if unpack_one_value(group["hue"].unique()) == PTPDVendor.name else seaborn.color_palette()[0]
-                    if quantile == 0.5:
-                        color = adjust_lightness(base_color, 1.4)
-                    else:
-                        color = adjust_lightness(base_color, 0.6)
-                    axis.vlines(
-                        x=unpack_one_value(group["x"].unique()) + (0 if quantile == 0.5 else 0.25),
-                          # + Random().randint(-2, 2),
-                        ymin=bootstrap_metric.confidence_interval_lower,
-                        ymax=bootstrap_metric.confidence_interval_upper,
-                        color=color,
-                    )
+            groups = [
+                (quantile, group) for quantile in [0.05, 0.95, 0.5]
+                for name, group in data.groupby(by=["hue", "x"]) if len(group) > 1
+            ]
+            bootstrap_metrics = BootstrapMetric.create_many(
+                [group["y"] for quantile, group in groups], [quantile for quantile, group in groups],
+                method=self.confidence_interval_method, jobs=self.confidence_interval_jobs, use_cache=True,
+            )
+            for (quantile, group), bootstrap_metric in zip(groups, bootstrap_metrics):
+                # if bootstrap_metric.relative_magnitude >= 0.1:
+                base_color = seaborn.color_palette()[1] if unpack_one_value(group["hue"].unique()) == PTPDVendor.name else seaborn.color_palette()[0]
+                if quantile == 0.5:
+                    color = adjust_lightness(base_color, 1.4)
+                else:
+                    color = adjust_lightness(base_color, 0.6)
+                axis.vlines(
+                    x=unpack_one_value(group["x"].unique()) + (0 if quantile == 0.5 else 0.25),
+                      # + Random().randint(-2, 2),
+                    ymin=bootstrap_metric.confidence_interval_lower,
+                    ymax=bootstrap_metric.confidence_interval_upper,
+                    color=color,
+                )
 
         if self.use_bar:
             # assert linestyle is None
@@ -1,11 +1,12 @@
 from typing import List, Any, Iterable
 
+import pandas as pd
 from matplotlib import pyplot as plt
 
 from ptp_perf.charts.chart_container import ChartContainer, YAxisLabelType
 from ptp_perf.models import Sample
 from ptp_perf.models.sample_query import SampleQuery
-from ptp_perf.profiles.data_container import MergedTimeSeries
+from ptp_perf.profiles.data_container import MergedTimeSeries, COLUMN_CLOCK_DIFF, COLUMN_PATH_DELAY, COLUMN_SOURCE
 
 
 class DistributionComparisonChart(ChartContainer):
@@ -16,18 +17,28 @@ class DistributionComparisonChart(ChartContainer):
             nrows=2, ncols=1, figsize=(14, 7),
         )
 
-        merged_series = MergedTimeSeries.merge_series(
-            original_series=[query.run(Sample.SampleType.CLOCK_DIFF) for query in queries],
+        # Every query is stitched across its endpoints, the queries are then stitched one after another.
+        merged_frame = MergedTimeSeries.merge_frames(
+            frames=[
+                pd.concat(
+                    {
+                        COLUMN_CLOCK_DIFF: query.run(Sample.SampleType.CLOCK_DIFF),
+                        COLUMN_PATH_DELAY: query.run(Sample.SampleType.PATH_DELAY),
+                    },
+                    axis=1,
+                ).droplevel("endpoint_id")
+                for query in queries
+            ],
             labels=labels,
             timestamp_align=True,
         )
 
         self.plot_timeseries_distribution(
-            merged_series.clock_diff,
+            merged_frame[COLUMN_CLOCK_DIFF],
             self.axes[0],
             invert_axis=False,
             split=False,
-            x_discriminator=merged_series.get_discriminator()
+            x_discriminator=merged_frame[COLUMN_SOURCE]
         )
         self.plot_decorate_yaxis(
             self.axes[0], ylabel=YAxisLabelType.CLOCK_DIFF_ABS,
@@ -35,11 +46,11 @@ class DistributionComparisonChart(ChartContainer):
         self.axes[1].xaxis.set_label_text(None)
 
         self.plot_timeseries_distribution(
-            merged_series.path_delay,
+            merged_frame[COLUMN_PATH_DELAY],
             self.axes[1],
             invert_axis=False,
             split=False,
-            x_discriminator=merged_series.get_discriminator(),
+            x_discriminator=merged_frame[COLUMN_SOURCE],
             palette_index=3,
         )
 
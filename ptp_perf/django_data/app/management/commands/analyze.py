@@ -1,50 +1,113 @@
+import functools
 import logging
+import time
 from argparse import ArgumentParser
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, List, Tuple, TypeVar
 
 from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
 
 from ptp_perf import util, constants, config
-from ptp_perf.models import PTPProfile
+from ptp_perf.models import PTPProfile, PTPEndpoint, SampleSeries, BenchmarkSummaryAggregate
 from ptp_perf.models.benchmark_summary import BenchmarkSummary
 from ptp_perf.models.endpoint import ProfileCorruptError
 from ptp_perf.models.exceptions import NoDataError
 from ptp_perf.models.loglevel import LogLevel
 from ptp_perf.registry.benchmark_db import BenchmarkDB
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
 from ptp_perf.vendor.registry import VendorDB
 
+T = TypeVar("T")
+R = TypeVar("R")
 
-def analyze(force: bool = False):
+
+def analyze(force: bool = False, reparse: bool = False, jobs: int = 1):
     # profile_query = PTPProfile.objects.filter(is_processed=False).all()
     profile_query = PTPProfile.objects.all().filter(is_running=False)
     if not force:
         profile_query = profile_query.filter(is_processed=False)
+    profile_ids = list(profile_query.order_by("id").values_list("id", flat=True))
 
-    converted_profiles = 0
-
-    for profile in profile_query:
-        try:
-            convert_profile(profile)
-            BenchmarkSummary.invalidate(
-                benchmark=profile.benchmark, vendor=profile.vendor, cluster=profile.cluster
-            )
-            converted_profiles += 1
-        except Exception as e:
-            profile.log_analyze(f"Failed to convert profile! {e}", level=LogLevel.ERROR)
-
+    results = run_jobs(functools.partial(analyze_profile, reparse=reparse), profile_ids, jobs, "Analyzed profile")
+    return sum(results)
 
-    return converted_profiles
-
-def convert_profile(profile: PTPProfile):
-    """Parse the collected raw log data into a processable analyzed format."""
 
+def analyze_profile(profile_id: int, reparse: bool = False) -> bool:
+    """Convert one profile, runs in the workers of analyze. Returns whether the profile was converted."""
+    profile = PTPProfile.objects.get(id=profile_id)
+    converted = False
+    try:
+        convert_profile(profile, reparse=reparse)
+        converted = True
+    except Exception as e:
+        profile.refresh_from_db()
+        profile.log_analyze(f"Failed to convert profile! {e}", level=LogLevel.ERROR)
+    BenchmarkSummaryAggregate.update_profile(profile)
+    return converted
+
+
+def run_jobs(function: Callable[[T], R], items: List[T], jobs: int, description: str) -> Iterator[R]:
+    """Apply the function to the items, in a pool of jobs worker processes if jobs > 1.
+    Results are returned (and progress is logged) in the order of the items."""
+    if jobs > 1 and connection.vendor == 'sqlite':
+        logging.warning("SQLite does not support concurrent writes, running the jobs sequentially.")
+        jobs = 1
+
+    start_time = time.monotonic()
+
+    def log_progress(index: int, item: T):
+        elapsed = time.monotonic() - start_time
+        remaining = elapsed / (index + 1) * (len(items) - index - 1)
+        logging.info(
+            f"[{index + 1}/{len(items)}] {description} {item} "
+            f"(elapsed {timedelta(seconds=round(elapsed))}, ETA {timedelta(seconds=round(remaining))})"
+        )
+
+    if jobs <= 1:
+        for index, item in enumerate(items):
+            yield function(item)
+            log_progress(index, item)
+        return
+
+    # The workers must not share the database connections of this process.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_initialize_worker) as executor:
+        for index, (item, result) in enumerate(zip(items, executor.map(function, items))):
+            log_progress(index, item)
+            yield result
+
+
+def _initialize_worker():
+    util.setup_logging()
+    bootstrap_django_environment()
+
+
+def convert_profile(profile: PTPProfile, reparse: bool = False):
+    """Parse the collected raw log data into a processable analyzed format.
+    Samples that were extracted while the benchmark ran are used as is, unless reparse is set.
+    The profile is converted in one transaction, so that a failure leaves the previous analysis in place.
+    Analysis log records and endpoint statistics are written in bulk at the end, the log records also after a
+    failure (outside the rolled back transaction)."""
+    with profile.buffer_analysis_log(), transaction.atomic():
+        _convert_profile(profile, reparse)
+
+
+def _convert_profile(profile: PTPProfile, reparse: bool):
     total_samples = 0
-    profile.clear_analysis_data()
+    profile.clear_analysis_data(reparse=reparse)
     profile_endpoints = profile.ptpendpoint_set.all()
     for endpoint in profile_endpoints:
-        parsed_samples = profile.vendor.parse_log_data(endpoint)
-        profile.log_analyze(f"{endpoint} converted {len(parsed_samples)} samples.")
-        total_samples += len(parsed_samples)
+        if endpoint.samples_streamed:
+            # The sample rows may have been removed after packing them into series.
+            streamed_samples = endpoint.sample_set.count() or SampleSeries.count_samples(endpoint)
+            profile.log_analyze(f"{endpoint} has {streamed_samples} streamed samples.")
+            total_samples += streamed_samples
+        else:
+            parsed_samples = profile.vendor.parse_log_data(endpoint)
+            profile.log_analyze(f"{endpoint} converted {parsed_samples} samples.")
+            total_samples += parsed_samples
 
     try:
         parsed_faults = 0
@@ -58,10 +121,13 @@ def convert_profile(profile: PTPProfile):
             )
 
         for endpoint in profile_endpoints:
-            endpoint.process_system_metrics_data()
+            endpoint.pack_samples()
+
+        for endpoint in profile_endpoints:
+            endpoint.process_system_metrics_data(save=False)
 
         for endpoint in profile_endpoints:
-            endpoint.process_timeseries_data()
+            endpoint.process_timeseries_data(save=False)
 
         if total_samples == 0:
             raise ProfileCorruptError("No samples on entire profile, corrupt.")
@@ -77,28 +143,57 @@ def convert_profile(profile: PTPProfile):
         profile.save()
         profile.log_analyze(f"Profile marked as corrupt: {e}", level=LogLevel.ERROR)
 
+    # Also keeps the statistics computed before the profile turned out to be corrupt.
+    PTPEndpoint.save_analysis(profile_endpoints)
 
-def summarize(force: bool = False):
+
+def summarize(force: bool = False, exact: bool = False, jobs: int = 1):
+    """Recompute the summaries of the groups whose profiles changed (and create the missing ones).
+    With force, all aggregates and summaries are rebuilt, with exact from the samples."""
+    dirty_groups = set(
+        BenchmarkSummaryAggregate.objects.filter(is_dirty=True).values_list("benchmark_id", "vendor_id", "cluster_id")
+    )
+    summarized_groups = set(BenchmarkSummary.objects.values_list("benchmark_id", "vendor_id", "cluster_id"))
+
+    groups = []
     for vendor in VendorDB.ANALYZED_VENDORS:
         for cluster in config.ANALYZED_CLUSTERS:
             for benchmark in cluster.supported_benchmarks():
-                try:
-                    BenchmarkSummary.create(
-                        benchmark, vendor, cluster, force_update=force,
-                    )
-                except NoDataError:
-                    pass
+                group = (benchmark.id, vendor.id, cluster.id)
+                if force or exact or group in dirty_groups or group not in summarized_groups:
+                    groups.append(group)
+
+    list(run_jobs(functools.partial(summarize_group, force=force, exact=exact), groups, jobs, "Summarized"))
+
 
+def summarize_group(group: Tuple[str, str, str], force: bool = False, exact: bool = False):
+    """Summarize one (benchmark id, vendor id, cluster id). Runs in the workers of summarize."""
+    benchmark_id, vendor_id, cluster_id = group
+    benchmark, vendor, cluster = BenchmarkDB.get(benchmark_id), VendorDB.get(vendor_id), config.clusters.get(cluster_id)
+    try:
+        if force or exact:
+            aggregate = BenchmarkSummaryAggregate.get_group(*group, rebuild=force)
+            BenchmarkSummary.create(
+                benchmark, vendor, cluster, force_update=force, exact=exact,
+            )
+            aggregate.is_dirty = False
+            aggregate.save(update_fields=["is_dirty"])
+        else:
+            BenchmarkSummary.update(benchmark, vendor, cluster)
+    except NoDataError:
+        pass
 
-def run_analysis(force: bool, run_analyze: bool = True, run_summarize: bool = True):
+
+def run_analysis(force: bool, run_analyze: bool = True, run_summarize: bool = True, reparse: bool = False,
+                 exact_summary: bool = False, rebuild_summaries: bool = False, jobs: int = 1):
 
     if run_analyze:
         start_time = datetime.now()
-        converted_profiles = analyze(force=force)
+        converted_profiles = analyze(force=force, reparse=reparse, jobs=jobs)
         completion_time = datetime.now()
         logging.info(f"Analysis of {converted_profiles} profiles completed in {completion_time - start_time}.")
     if run_summarize:
-        summarize(force=force)
+        summarize(force=force or rebuild_summaries, exact=exact_summary, jobs=jobs)
 
 
 class Command(BaseCommand):
@@ -106,11 +201,19 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser: ArgumentParser):
         parser.add_argument("--force", action='store_true', help="Force analysis of all profiles, even if they were already analyzed.")
+        parser.add_argument("--reparse", action='store_true', help="Parse samples from the log records even if they were extracted while the benchmark ran.")
+        parser.add_argument("--exact-summary", action='store_true', help="Compute the summary statistics from the samples instead of the quantile sketches of the endpoints.")
+        parser.add_argument("--rebuild-summaries", action='store_true', help="Rebuild all benchmark summaries instead of only the ones whose profiles changed.")
+        parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes that analyze profiles and summarize benchmarks in parallel.")
 
     def handle(self, *args, **options):
         util.setup_logging()
 
         force = options["force"]
+        reparse = options["reparse"]
 
         with util.StackTraceGuard():
-            run_analysis(force)
+            run_analysis(
+                force, reparse=reparse, exact_summary=options["exact_summary"],
+                rebuild_summaries=options["rebuild_summaries"], jobs=options["jobs"],
+            )
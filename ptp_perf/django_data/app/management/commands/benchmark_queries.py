@@ -0,0 +1,161 @@
+import logging
+import re
+import statistics
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from ptp_perf import util
+from ptp_perf.models import PTPProfile, PTPEndpoint, Sample, LogRecord
+from ptp_perf.utilities.bulk_insert import bulk_insert
+
+BENCHMARK_ID = "query-benchmark"
+# Indexes created by migration 0048, which are dropped to measure the baseline.
+INDEXES = {
+    Sample: ["sample_endpoint_type_time", "sample_fault_endpoint"],
+    LogRecord: ["logrecord_endpoint_source_id"],
+}
+BRIN_INDEXES = ["sample_timestamp_brin", "logrecord_timestamp_brin"]
+LOG_SOURCES = ["ptp4l", "phc2sys", "resource_monitor"]
+
+
+class Command(BaseCommand):
+    help = ("Measure the latency of the hot Sample and LogRecord queries on a synthetic dataset, "
+            "with the indexes and without them (baseline).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000_000, help="Number of synthetic samples.")
+        parser.add_argument("--log-rows", type=int, default=None, help="Number of synthetic log records (default: rows / 10).")
+        parser.add_argument("--profiles", type=int, default=10)
+        parser.add_argument("--endpoints-per-profile", type=int, default=4)
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timed executions per query.")
+        parser.add_argument("--keep", action="store_true", default=False, help="Keep the synthetic dataset.")
+        parser.add_argument(
+            "--allow-index-changes", action="store_true", default=False,
+            help="Confirm that the configured database is dedicated to this benchmark. The baseline drops the indexes "
+                 "inside a transaction, which locks the sample and log record tables until it is rolled back.",
+        )
+
+    def handle(self, *args, **options):
+        if not options['allow_index_changes']:
+            raise CommandError(
+                f"This command drops indexes on the configured {connection.vendor} database "
+                f"'{connection.settings_dict['NAME']}' and locks its tables while measuring. "
+                f"Run it against a dedicated benchmark database and pass --allow-index-changes."
+            )
+        util.setup_logging()
+
+        profiles = PTPProfile.objects.filter(benchmark_id=BENCHMARK_ID)
+        if profiles.exists():
+            logging.info("Reusing the existing synthetic dataset.")
+        else:
+            self.create_dataset(
+                options['rows'], options['log_rows'] if options['log_rows'] is not None else options['rows'] // 10,
+                options['profiles'], options['endpoints_per_profile'],
+            )
+
+        queries = self.get_queries(profiles.first())
+        indexed = self.measure(queries, options['repeat'])
+        with transaction.atomic():
+            self.drop_indexes()
+            baseline = self.measure(queries, options['repeat'])
+            # Restore the indexes.
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Query latency on {connection.vendor} (median of {options['repeat']} runs):")
+        for name in queries.keys():
+            self.stdout.write(
+                f"{name:>20}: {baseline[name] * 1000:10.2f}ms without indexes, {indexed[name] * 1000:10.2f}ms with indexes "
+                f"(speedup {baseline[name] / indexed[name]:.1f}x)"
+            )
+
+        if not options['keep']:
+            profiles.delete()
+
+    @staticmethod
+    def create_dataset(rows: int, log_rows: int, num_profiles: int, endpoints_per_profile: int):
+        start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        endpoints: List[PTPEndpoint] = []
+        for profile_index in range(num_profiles):
+            profile = PTPProfile.objects.create(
+                benchmark_id=BENCHMARK_ID, vendor_id="linuxptp",
+                start_time=start_time, stop_time=start_time, is_running=False,
+            )
+            endpoints += [
+                PTPEndpoint.objects.create(profile=profile, machine_id=f"machine-{index}")
+                for index in range(endpoints_per_profile)
+            ]
+
+        def samples():
+            rows_per_endpoint = rows // len(endpoints)
+            for endpoint in endpoints:
+                for index in range(rows_per_endpoint):
+                    timestamp = start_time + timedelta(seconds=index // 2)
+                    sample_type = Sample.SampleType.CLOCK_DIFF if index % 2 == 0 else Sample.SampleType.PATH_DELAY
+                    yield endpoint.id, timestamp, sample_type, index
+                # One fault per endpoint
+                yield endpoint.id, start_time + timedelta(seconds=rows_per_endpoint // 4), Sample.SampleType.FAULT, 1
+                yield endpoint.id, start_time + timedelta(seconds=rows_per_endpoint // 3), Sample.SampleType.FAULT, 0
+
+        def log_records():
+            records_per_endpoint = log_rows // len(endpoints)
+            for endpoint in endpoints:
+                for index in range(records_per_endpoint):
+                    yield (endpoint.id, start_time + timedelta(milliseconds=index * 300),
+                           LOG_SOURCES[index % len(LOG_SOURCES)], f"Synthetic log message {index}")
+
+        logging.info(f"Creating {rows} samples and {log_rows} log records on {len(endpoints)} endpoints...")
+        bulk_insert(Sample, ['endpoint', 'timestamp', 'sample_type', 'value'], samples())
+        bulk_insert(LogRecord, ['endpoint', 'timestamp', 'source', 'message'], log_records())
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE app_sample, app_logrecord")
+
+    @staticmethod
+    def get_queries(profile: PTPProfile) -> Dict[str, Callable[[], QuerySet]]:
+        endpoint = profile.ptpendpoint_set.order_by('id').first()
+        convergence_timestamp = profile.start_time + timedelta(minutes=10)
+        return {
+            "sample_range": lambda: Sample.objects.filter(
+                endpoint=endpoint, sample_type=Sample.SampleType.CLOCK_DIFF, timestamp__gte=convergence_timestamp,
+            ).values_list('timestamp', 'value'),
+            "logrecord_source": lambda: LogRecord.objects.filter(
+                endpoint=endpoint, source="ptp4l",
+            ).order_by('id').values_list('timestamp', 'message'),
+            "profile_faults": lambda: Sample.objects.filter(
+                endpoint__profile=profile, sample_type=Sample.SampleType.FAULT,
+            ).order_by('id'),
+        }
+
+    @staticmethod
+    def measure(queries: Dict[str, Callable[[], QuerySet]], repeat: int) -> Dict[str, float]:
+        results = {}
+        for name, query in queries.items():
+            plan = query().explain(analyze=True) if connection.vendor == 'postgresql' else query().explain()
+            durations = []
+            for _ in range(repeat):
+                if connection.vendor == 'postgresql':
+                    # Server side execution time, excluding the transfer of the results.
+                    execution_time = re.search(r"Execution Time: ([\d.]+) ms", query().explain(analyze=True))
+                    durations.append(float(execution_time.group(1)) / 1000)
+                else:
+                    start = time.perf_counter()
+                    list(query())
+                    durations.append(time.perf_counter() - start)
+            results[name] = statistics.median(durations)
+            logging.info(f"{name} ({results[name] * 1000:.2f}ms):\n{plan}")
+        return results
+
+    @staticmethod
+    def drop_indexes():
+        # Plain DROP INDEX statements (instead of the schema editor) are transactional on PostgreSQL and sqlite.
+        index_names = [index_name for model_index_names in INDEXES.values() for index_name in model_index_names]
+        if connection.vendor == 'postgresql':
+            index_names += BRIN_INDEXES
+        with connection.cursor() as cursor:
+            for index_name in index_names:
+                cursor.execute(f"DROP INDEX IF EXISTS {connection.ops.quote_name(index_name)}")
@@ -0,0 +1,49 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ptp_perf import util
+from ptp_perf.models import PTPEndpoint, Sample
+from ptp_perf.util import user_prompt_confirmation
+
+
+class Command(BaseCommand):
+    help = "Convert the sample rows of analyzed endpoints into compact sample series."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", default=False,
+            help="Also repack endpoints that already have sample series."
+        )
+        parser.add_argument(
+            "--delete-rows", action="store_true", default=False,
+            help="Delete the CLOCK_DIFF and PATH_DELAY sample rows after packing them. "
+                 "FAULT rows are kept, they are queried across endpoints."
+        )
+
+    def handle(self, *args, **options):
+        util.setup_logging()
+
+        endpoints = PTPEndpoint.objects.filter(sample__isnull=False).distinct()
+        if not options['force']:
+            endpoints = endpoints.filter(sampleseries__isnull=True)
+        endpoint_ids = list(endpoints.values_list("id", flat=True))
+
+        if options['delete_rows']:
+            user_prompt_confirmation(
+                f"Do you want to delete the sample rows of {len(endpoint_ids)} endpoints after packing?"
+            )
+
+        packed_samples = 0
+        for index, endpoint in enumerate(PTPEndpoint.objects.filter(id__in=endpoint_ids).iterator()):
+            with transaction.atomic():
+                endpoint_samples = endpoint.pack_samples()
+                if options['delete_rows']:
+                    endpoint.sample_set.filter(
+                        sample_type__in=[Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY]
+                    ).delete()
+            packed_samples += endpoint_samples
+            logging.info(f"[{index + 1}/{len(endpoint_ids)}] {endpoint}: Packed {endpoint_samples} samples.")
+
+        logging.info(f"Packed {packed_samples} samples of {len(endpoint_ids)} endpoints.")
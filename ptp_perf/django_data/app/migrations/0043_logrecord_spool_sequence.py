@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-16 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0042_benchmarksummary_clock_diff_mean_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logrecord',
+            name='spool_sequence',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='logrecord',
+            constraint=models.UniqueConstraint(fields=('endpoint', 'spool_sequence'), name='unique_endpoint_spool_sequence'),
+        ),
+    ]
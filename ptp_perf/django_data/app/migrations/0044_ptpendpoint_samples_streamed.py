@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-16 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0043_logrecord_spool_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ptpendpoint',
+            name='samples_streamed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.2 on 2026-10-16 20:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0044_ptpendpoint_samples_streamed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceSample',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('timestamp', models.DateTimeField()),
+                ('proc_cpu_user', models.FloatField(null=True)),
+                ('proc_cpu_system', models.FloatField(null=True)),
+                ('proc_mem_uss', models.BigIntegerField(null=True)),
+                ('proc_mem_pss', models.BigIntegerField(null=True)),
+                ('proc_mem_rss', models.BigIntegerField(null=True)),
+                ('proc_mem_vms', models.BigIntegerField(null=True)),
+                ('proc_ctx_switches_voluntary', models.BigIntegerField(null=True)),
+                ('proc_ctx_switches_involuntary', models.BigIntegerField(null=True)),
+                ('proc_num_threads', models.IntegerField(null=True)),
+                ('sys_cpu_frequency', models.FloatField(null=True)),
+                ('sys_sensors_temperature_cpu', models.FloatField(null=True)),
+                ('sys_net_ptp_iface_bytes_sent', models.BigIntegerField(null=True)),
+                ('sys_net_ptp_iface_bytes_received', models.BigIntegerField(null=True)),
+                ('sys_net_ptp_iface_packets_sent', models.BigIntegerField(null=True)),
+                ('sys_net_ptp_iface_packets_received', models.BigIntegerField(null=True)),
+                ('endpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.ptpendpoint')),
+            ],
+        ),
+    ]
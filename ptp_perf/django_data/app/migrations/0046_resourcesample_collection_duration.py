@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-16 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0045_resourcesample'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resourcesample',
+            name='collection_duration',
+            field=models.DurationField(null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-16 20:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0046_resourcesample_collection_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SampleSeries',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('sample_type', models.CharField(choices=[('CLOCK_DIFF', 'Clock Diff'), ('PATH_DELAY', 'Path Delay'), ('FAULT', 'Fault')], max_length=255)),
+                ('chunk_index', models.IntegerField(default=0)),
+                ('count', models.IntegerField()),
+                ('start_timestamp', models.DateTimeField()),
+                ('end_timestamp', models.DateTimeField()),
+                ('timestamps', models.BinaryField()),
+                ('values', models.BinaryField()),
+                ('endpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.ptpendpoint')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='sampleseries',
+            constraint=models.UniqueConstraint(fields=('endpoint', 'sample_type', 'chunk_index'), name='unique_sample_series_chunk'),
+        ),
+    ]
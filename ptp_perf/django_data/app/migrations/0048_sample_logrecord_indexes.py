@@ -0,0 +1,56 @@
+# Generated by Django 5.0.2 on 2026-10-16 20:59
+
+from django.db import migrations, models
+from django.db.migrations import RunPython
+
+# Samples and log records are inserted in time order, so block range indexes on the timestamp are tiny but effective.
+# BRIN indexes are only available on PostgreSQL, so they are not part of the models' Meta.indexes.
+BRIN_INDEXES = [
+    ("sample_timestamp_brin", "app_sample"),
+    ("logrecord_timestamp_brin", "app_logrecord"),
+]
+
+
+def create_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in BRIN_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING brin ("timestamp")')
+
+
+def drop_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in BRIN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0047_sampleseries'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='logrecord',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='sample',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='logrecord',
+            index=models.Index(fields=['endpoint', 'source', 'id'], name='logrecord_endpoint_source_id'),
+        ),
+        migrations.AddIndex(
+            model_name='sample',
+            index=models.Index(fields=['endpoint', 'sample_type', 'timestamp'], name='sample_endpoint_type_time'),
+        ),
+        migrations.AddIndex(
+            model_name='sample',
+            index=models.Index(condition=models.Q(('sample_type', 'FAULT')), fields=['endpoint'], name='sample_fault_endpoint'),
+        ),
+        RunPython(create_brin_indexes, drop_brin_indexes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-16 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0048_sample_logrecord_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SampleSketch',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('sample_type', models.CharField(choices=[('CLOCK_DIFF', 'Clock Diff'), ('PATH_DELAY', 'Path Delay'), ('FAULT', 'Fault')], max_length=255)),
+                ('count', models.IntegerField()),
+                ('relative_accuracy', models.FloatField()),
+                ('data', models.BinaryField()),
+                ('endpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.ptpendpoint')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='samplesketch',
+            constraint=models.UniqueConstraint(fields=('endpoint', 'sample_type'), name='unique_sample_sketch'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-16 21:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0049_sample_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BenchmarkSummaryAggregate',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('benchmark_id', models.CharField(max_length=255)),
+                ('vendor_id', models.CharField(max_length=255)),
+                ('cluster_id', models.CharField(max_length=255)),
+                ('is_dirty', models.BooleanField(default=True)),
+                ('profile_ids', models.JSONField(default=list)),
+                ('primary_endpoints', models.IntegerField(default=0)),
+                ('unsketched_endpoints', models.IntegerField(default=0)),
+                ('missing_clock_diff_endpoints', models.IntegerField(default=0)),
+                ('missing_path_delay_endpoints', models.IntegerField(default=0)),
+                ('clock_diff_sketch', models.BinaryField(null=True)),
+                ('path_delay_sketch', models.BinaryField(null=True)),
+                ('statistics', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='benchmarksummaryaggregate',
+            constraint=models.UniqueConstraint(fields=('benchmark_id', 'vendor_id', 'cluster_id'), name='unique_summary_aggregate'),
+        ),
+    ]
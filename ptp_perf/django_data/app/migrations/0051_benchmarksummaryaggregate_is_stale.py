@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0050_benchmark_summary_aggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='benchmarksummaryaggregate',
+            name='is_stale',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,15 +1,19 @@
 import asyncio
 import logging
 import os
+import time
 from asyncio import subprocess, Task
 from dataclasses import dataclass, field
 from datetime import timedelta
 from pathlib import Path
-from typing import List, Union, Optional, Self
+from typing import List, Union, Optional, Self, Callable
 
 from ptp_perf import util
 from ptp_perf.invoke import settings
 from ptp_perf.invoke.environment import InvocationEnvironmentVariable, InvocationEnvironment
+from ptp_perf.invoke.output_capture import OutputCapture
+from ptp_perf.invoke.output_filter import OutputFilter
+from ptp_perf.utilities.server_clock import MONOTONIC_TIME_ATTRIBUTE
 
 
 class InvocationFailedException(Exception):
@@ -32,7 +36,25 @@ class Invocation:
     log_invocation: bool = True
     log_output: bool = True
     capture_output: bool = True
+    capture_head_size: Optional[int] = None
+    """Characters of output to keep from the start, None to keep all output (see OutputCapture)."""
+    capture_tail_size: int = 0
+    """Characters of output to keep from the end if the head is bounded."""
+    capture_spill_path: Optional[Path] = None
+    """File to write the complete output to, if the capture is bounded."""
     dump_output_on_failure: bool = False
+    line_callbacks: List[Callable[[str], None]] = field(default_factory=list)
+    """Called with every output line (without line ending) as it arrives, e.g. to parse samples while running."""
+    output_filters: List[OutputFilter] = field(default_factory=list)
+    """Filters applied to output lines before logging and capturing. Line callbacks still receive all lines."""
+
+    lines_read: int = 0
+    """Number of output lines read from the process (stdout and stderr, across restarts)."""
+    bytes_read: int = 0
+    """Number of output bytes read from the process (stdout and stderr, across restarts)."""
+    line_time: Optional[int] = None
+    """Local monotonic time (ns) at which the current output line was read, for line callbacks.
+    The log record of the line is timestamped with the same time."""
 
     _process: Optional[subprocess.Process] = None
     _monitor_task: Optional[Task] = None
@@ -40,7 +62,7 @@ class Invocation:
     _should_restart_process: Optional[bool] = False
 
     return_code: Optional[int] = None
-    output: Optional[str] = None
+    _output_capture: Optional[OutputCapture] = None
 
     @staticmethod
     def of_shell(command: str, **kwargs) -> "Invocation":
@@ -85,6 +107,27 @@ class Invocation:
             self.command.append(arg)
         return self
 
+    def add_line_callback(self, callback: Callable[[str], None]) -> Self:
+        self.line_callbacks.append(callback)
+        return self
+
+    def add_output_filter(self, pattern: str, keep_every: int = 0) -> Self:
+        """Drop output lines matching the pattern from logging and capture, optionally keeping every n-th line."""
+        self.output_filters.append(OutputFilter.of(pattern, keep_every))
+        return self
+
+    @property
+    def lines_dropped(self) -> int:
+        return sum(output_filter.dropped_lines for output_filter in self.output_filters)
+
+    def capture_bounded(self, head_size: int = 64 * 1024, tail_size: int = 256 * 1024,
+                        spill_path: Optional[Path] = None) -> Self:
+        """Only keep the start and the end of the output, for long-running processes."""
+        self.capture_head_size = head_size
+        self.capture_tail_size = tail_size
+        self.capture_spill_path = spill_path
+        return self
+
     def set_verify_exit_code(self, verify: bool):
         self.verify_return_code = verify
         return self
@@ -132,28 +175,60 @@ class Invocation:
             )
 
         # Don't reset output if its already there (process restart)
-        if self.capture_output and self.output is None:
-            self.output = ""
+        if self.capture_output and self._output_capture is None:
+            self._output_capture = OutputCapture(
+                head_size=self.capture_head_size,
+                tail_size=self.capture_tail_size,
+                spill_path=self.capture_spill_path,
+            )
 
         return self
 
-    async def read_output_lines(self, stream: asyncio.StreamReader):
-        """Iterate through the process output, logging and capturing output as necessary."""
+    async def read_output_lines(self, stream: asyncio.StreamReader, chunk_size: int = 64 * 1024):
+        """Iterate through the process output, logging and capturing output as necessary.
+        The output is read in chunks and split into lines manually, which is considerably cheaper than readline()."""
+        remainder = b''
         while True:
-            line = (await stream.readline()).decode()
-            if line == '':
+            chunk = await stream.read(chunk_size)
+            if chunk == b'':
+                if remainder:
+                    # Last line without line ending
+                    self._handle_output_line(remainder, line_ending='')
                 await self._process.wait()
                 break
-            if line:
-                if self.log_output:
-                    # We don't want the extra newline if it exists
-                    if line[-1] == '\n':
-                        self._logger.info(f'| {line[:-1]}')
-                    else:
-                        self._logger.info(f'| {line}')
+            self.bytes_read += len(chunk)
+
+            lines = (remainder + chunk if remainder else chunk).split(b'\n')
+            remainder = lines.pop()
+            for line in lines:
+                self._handle_output_line(line)
+
+    def _handle_output_line(self, line: bytes, line_ending: str = '\n'):
+        self.lines_read += 1
+
+        log_or_capture = self.log_output or self.capture_output
+        for output_filter in self.output_filters:
+            if not output_filter.accept(line):
+                log_or_capture = False
+                break
 
-                if self.capture_output:
-                    self.output += line
+        if not log_or_capture and len(self.line_callbacks) == 0:
+            # Nobody is interested in this line, skip decoding it.
+            return
+
+        decoded_line = line.decode(errors='replace')
+        self.line_time = time.monotonic_ns()
+        if log_or_capture:
+            if self.log_output:
+                self._logger.info('| %s', decoded_line, extra={MONOTONIC_TIME_ATTRIBUTE: self.line_time})
+            if self.capture_output:
+                self._output_capture.append(decoded_line + line_ending)
+
+        for callback in self.line_callbacks:
+            try:
+                callback(decoded_line)
+            except Exception as e:
+                self._logger.warning(f"Line callback {callback} failed: {e}")
 
     async def _communicate(self):
         async with asyncio.TaskGroup() as read_tasks:
@@ -197,7 +272,10 @@ class Invocation:
             self.return_code = self._process.returncode
 
             if self.log_invocation:
-                self._logger.info(f"Process {self.command_short_name} exited with return code {self.return_code}.")
+                self._logger.info(
+                    f"Process {self.command_short_name} exited with return code {self.return_code} "
+                    f"({self.lines_read} lines, {self.bytes_read} bytes of output, {self.lines_dropped} lines filtered)."
+                )
 
             if self.verify_return_code and not skip_verify_return_code and self.return_code not in self.expected_return_codes:
                 if self.dump_output_on_failure:
@@ -236,22 +314,33 @@ class Invocation:
         """Internal API to actually run the task."""
         self._should_restart_process = True
 
-        while self._should_restart_process:
-            await self._start()
-            try:
-                await self._communicate()
-            finally:
-                # Check if keep alive value has changed
-                self._should_restart_process = self.keep_alive
+        try:
+            while self._should_restart_process:
+                await self._start()
+                try:
+                    await self._communicate()
+                finally:
+                    # Check if keep alive value has changed
+                    self._should_restart_process = self.keep_alive
 
-                # Don't check exit code if we are restarting the process.
-                await self._terminate(timeout=5, skip_verify_return_code=self._should_restart_process)
+                    # Don't check exit code if we are restarting the process.
+                    await self._terminate(timeout=5, skip_verify_return_code=self._should_restart_process)
 
-            # Delay process restart to avoid too rapid looping
-            if self._should_restart_process:
-                await asyncio.sleep(self.restart_delay.total_seconds())
+                # Delay process restart to avoid too rapid looping
+                if self._should_restart_process:
+                    await asyncio.sleep(self.restart_delay.total_seconds())
+        finally:
+            if self._output_capture is not None:
+                self._output_capture.close()
         return self
 
+    @property
+    def output(self) -> Optional[str]:
+        """The captured output of the process, None if not started or not captured."""
+        if self._output_capture is None:
+            return None
+        return self._output_capture.text
+
 
     async def run(self, timeout: float = None) -> Self:
         self.run_as_task()
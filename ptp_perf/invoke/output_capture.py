@@ -0,0 +1,78 @@
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, List, Optional, TextIO
+
+
+@dataclass
+class OutputCapture:
+    """Collects the output of a process line by line.
+
+    By default, the entire output is kept. For long-running processes, the capture can be bounded to a head and a tail
+    window, so that memory stays constant while the beginning of the output (startup errors) and the end of the output
+    (the reason for a crash) are still available for failure dumps. Lines in between are dropped, but can optionally
+    be spilled to a file.
+    """
+    head_size: Optional[int] = None
+    """Number of characters to keep from the start of the output. None keeps the entire output."""
+    tail_size: int = 0
+    """Number of characters to keep from the end of the output once the head is full."""
+    spill_path: Optional[Path] = None
+    """If set, the complete output is additionally appended to this file."""
+
+    omitted_lines: int = 0
+    omitted_characters: int = 0
+
+    _head: List[str] = field(default_factory=list)
+    _head_length: int = 0
+    _head_full: bool = False
+    _tail: Deque[str] = field(default_factory=deque)
+    _tail_length: int = 0
+    _spill_file: Optional[TextIO] = None
+
+    @property
+    def bounded(self) -> bool:
+        return self.head_size is not None
+
+    @property
+    def truncated(self) -> bool:
+        return self.omitted_lines > 0
+
+    def append(self, line: str):
+        if self.spill_path is not None:
+            if self._spill_file is None:
+                self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+                self._spill_file = self.spill_path.open("a", encoding="utf-8")
+            self._spill_file.write(line)
+
+        if not self._head_full:
+            if self.head_size is None or self._head_length + len(line) <= self.head_size:
+                self._head.append(line)
+                self._head_length += len(line)
+                return
+            # Everything from here on goes to the tail to preserve the order of the lines.
+            self._head_full = True
+
+        self._tail.append(line)
+        self._tail_length += len(line)
+        while self._tail_length > self.tail_size and len(self._tail) > 0:
+            removed_line = self._tail.popleft()
+            self._tail_length -= len(removed_line)
+            self.omitted_lines += 1
+            self.omitted_characters += len(removed_line)
+
+    @property
+    def text(self) -> str:
+        if not self.truncated:
+            return "".join(self._head) + "".join(self._tail)
+
+        omission_note = f"[... {self.omitted_lines} lines omitted"
+        if self.spill_path is not None:
+            omission_note += f", complete output in {self.spill_path}"
+        omission_note += " ...]\n"
+        return "".join(self._head) + omission_note + "".join(self._tail)
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
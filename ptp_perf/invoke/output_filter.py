@@ -0,0 +1,30 @@
+import re
+from dataclasses import dataclass
+
+
+@dataclass
+class OutputFilter:
+    """Drops uninteresting output lines of an invocation before they are logged or captured.
+
+    Lines matching the pattern are dropped, except for every keep_every-th matching line if keep_every is set
+    (sampling, e.g. to keep one of 10 periodic status lines). Matching is done on the raw bytes, so dropped lines
+    are never decoded.
+    """
+    pattern: re.Pattern
+    keep_every: int = 0
+
+    matched_lines: int = 0
+    dropped_lines: int = 0
+
+    @staticmethod
+    def of(pattern: str, keep_every: int = 0) -> "OutputFilter":
+        return OutputFilter(re.compile(pattern.encode()), keep_every)
+
+    def accept(self, line: bytes) -> bool:
+        if self.pattern.search(line) is None:
+            return True
+        self.matched_lines += 1
+        if self.keep_every > 0 and (self.matched_lines - 1) % self.keep_every == 0:
+            return True
+        self.dropped_lines += 1
+        return False
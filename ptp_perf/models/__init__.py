@@ -4,6 +4,10 @@ from .profile import PTPProfile
 from .endpoint import PTPEndpoint
 from .log_record import LogRecord
 from .sample import Sample
+from .sample_series import SampleSeries
+from .sample_sketch import SampleSketch
+from .resource_sample import ResourceSample
 from .tag import Tag
 from .schedule_task import ScheduleTask
+from .benchmark_summary_aggregate import BenchmarkSummaryAggregate
 from .benchmark_summary import BenchmarkSummary
@@ -1,11 +1,11 @@
 import dataclasses
-from typing import Dict
+from typing import Dict, List
 
 import pandas as pd
-from django.db import models
+from django.db import models, transaction
 
 from ptp_perf.machine import Cluster
-from ptp_perf.models import Sample, PTPEndpoint
+from ptp_perf.models import Sample, PTPEndpoint, SampleSketch, BenchmarkSummaryAggregate
 from ptp_perf.models.endpoint import TimeNormalizationStrategy
 from ptp_perf.models.endpoint_type import EndpointType
 from ptp_perf.models.exceptions import NoDataError
@@ -14,6 +14,8 @@ from ptp_perf.profiles.benchmark import Benchmark
 from ptp_perf.utilities.django_utilities import DataFormatFloatField, GenericEngineeringFloatField, \
     PercentageFloatField, TimeFormatFloatField, TemperatureFormatFloatField, FrequencyFormatFloatField
 from ptp_perf.utilities.pandas_utilities import frame_column
+from ptp_perf.utilities.quantile_sketch import QuantileSketch
+from ptp_perf.utilities.series_reducers import CountReducer, MeanReducer, QuantileReducer
 from ptp_perf.vendor.vendor import Vendor
 
 
@@ -91,7 +93,10 @@ class BenchmarkSummary(models.Model):
 
 
     @staticmethod
-    def create(benchmark: Benchmark, vendor: Vendor, cluster: Cluster, force_update: bool = False):
+    def create(benchmark: Benchmark, vendor: Vendor, cluster: Cluster, force_update: bool = False, exact: bool = False):
+        """Summarize the primary slave endpoints of the benchmark, vendor and cluster.
+        The sample statistics are merged from the quantile sketches of the endpoints (see SampleSketch), unless
+        exact is set or some endpoints were analyzed without sketches, then the samples are loaded."""
         query_existing_objects = BenchmarkSummary.get_query(benchmark, vendor, cluster)
         if query_existing_objects.count() > 0:
             if force_update:
@@ -115,27 +120,45 @@ class BenchmarkSummary(models.Model):
 
         quantiles = [0.05, 0.5, 0.95, 0.99, 1]
 
-        try:
-            clock_data = data_query.run(Sample.SampleType.CLOCK_DIFF)
-            instance.count = len(clock_data.index.get_level_values("endpoint_id").unique())
+        endpoint_ids = list(data_query.get_endpoint_query().values_list("id", flat=True))
+        clock_sketches = SampleSketch.load_of_endpoints(endpoint_ids, Sample.SampleType.CLOCK_DIFF)
+        use_sketches = not exact and len(endpoint_ids) != 0 and len(clock_sketches) == len(endpoint_ids)
 
-            clock_data = clock_data.droplevel('endpoint_id').abs()
-            clock_quantiles = clock_data.quantile(quantiles).values
+        try:
+            if use_sketches:
+                clock_sketch = BenchmarkSummary._merge_sketches(endpoint_ids, clock_sketches)
+                instance.count = len(clock_sketches)
+                clock_quantiles = clock_sketch.quantiles(quantiles)
+                clock_mean = clock_sketch.mean
+            else:
+                # The samples are streamed per endpoint, so only the values are held in memory.
+                clock_count, clock_mean_reducer, clock_quantile_reducer = CountReducer(), MeanReducer(), QuantileReducer(quantiles)
+                data_query.reduce(
+                    Sample.SampleType.CLOCK_DIFF, [clock_count, clock_mean_reducer, clock_quantile_reducer], transform=pd.Series.abs,
+                )
+                instance.count = clock_count.level_count
+                clock_quantiles = clock_quantile_reducer.result()
+                clock_mean = clock_mean_reducer.result()
 
             instance.clock_diff_p05 = clock_quantiles[0]
             instance.clock_diff_median = clock_quantiles[1]
             instance.clock_diff_p95 = clock_quantiles[2]
             instance.clock_diff_p99 = clock_quantiles[3]
             instance.clock_diff_max = clock_quantiles[4]
-            instance.clock_diff_mean = clock_data.mean()
+            instance.clock_diff_mean = clock_mean
 
         except NoDataError:
             instance.count = 0
 
         try:
-            path_delay_data = data_query.run(Sample.SampleType.PATH_DELAY)
-            path_delay_data = path_delay_data.droplevel('endpoint_id')
-            path_delay_quantiles = path_delay_data.quantile(quantiles).values
+            if use_sketches:
+                path_delay_quantiles = BenchmarkSummary._merge_sketches(
+                    endpoint_ids, SampleSketch.load_of_endpoints(endpoint_ids, Sample.SampleType.PATH_DELAY)
+                ).quantiles(quantiles)
+            else:
+                path_delay_quantile_reducer = QuantileReducer(quantiles)
+                data_query.reduce(Sample.SampleType.PATH_DELAY, [path_delay_quantile_reducer])
+                path_delay_quantiles = path_delay_quantile_reducer.result()
 
             instance.path_delay_p05=path_delay_quantiles[0]
             instance.path_delay_median=path_delay_quantiles[1]
@@ -209,6 +232,88 @@ class BenchmarkSummary(models.Model):
 
         instance.save()
 
+    @staticmethod
+    def update(benchmark: Benchmark, vendor: Vendor, cluster: Cluster):
+        """Recompute the summary from the running aggregates of the group (see BenchmarkSummaryAggregate)."""
+        aggregate = BenchmarkSummaryAggregate.get_group(benchmark.id, vendor.id, cluster.id)
+        if aggregate.unsketched_endpoints != 0:
+            # Some endpoints need to be analyzed again to have sketches.
+            BenchmarkSummary.create(benchmark, vendor, cluster, force_update=True)
+        else:
+            instance = BenchmarkSummary.from_aggregate(aggregate)
+            with transaction.atomic():
+                BenchmarkSummary.invalidate(benchmark, vendor, cluster)
+                instance.save()
+            print(f'{benchmark} {vendor} {cluster}: {instance.count} endpoints summarized')
+
+        aggregate.is_dirty = False
+        aggregate.save(update_fields=["is_dirty"])
+
+    @staticmethod
+    def from_aggregate(aggregate: BenchmarkSummaryAggregate) -> "BenchmarkSummary":
+        """The summary of the aggregates, equivalent to create without exact."""
+        instance = BenchmarkSummary(
+            benchmark_id=aggregate.benchmark_id,
+            vendor_id=aggregate.vendor_id,
+            cluster_id=aggregate.cluster_id,
+            count=0,
+        )
+        quantiles = [0.05, 0.5, 0.95, 0.99, 1]
+
+        # Same as SampleQuery, which raises if any endpoint has no samples.
+        if aggregate.primary_endpoints != 0 and aggregate.missing_clock_diff_endpoints == 0:
+            clock_sketch = aggregate.get_clock_diff_sketch()
+            clock_quantiles = clock_sketch.quantiles(quantiles)
+            instance.count = aggregate.primary_endpoints
+            instance.clock_diff_p05 = clock_quantiles[0]
+            instance.clock_diff_median = clock_quantiles[1]
+            instance.clock_diff_p95 = clock_quantiles[2]
+            instance.clock_diff_p99 = clock_quantiles[3]
+            instance.clock_diff_max = clock_quantiles[4]
+            instance.clock_diff_mean = clock_sketch.mean
+
+        if aggregate.primary_endpoints != 0 and aggregate.missing_path_delay_endpoints == 0:
+            path_delay_quantiles = aggregate.get_path_delay_sketch().quantiles(quantiles)
+            instance.path_delay_p05 = path_delay_quantiles[0]
+            instance.path_delay_median = path_delay_quantiles[1]
+            instance.path_delay_p95 = path_delay_quantiles[2]
+            instance.path_delay_p99 = path_delay_quantiles[3]
+            instance.path_delay_max = path_delay_quantiles[4]
+
+        # Convergence
+        instance.convergence_duration = aggregate.mean("primary", "convergence_duration")
+        instance.convergence_max_offset = aggregate.mean("primary", "convergence_max_offset")
+        instance.convergence_rate = aggregate.mean("primary", "convergence_rate")
+        instance.converged_percentage = aggregate.mean("primary", "converged_percentage")
+        instance.converged_samples = aggregate.mean("primary", "converged_samples")
+
+        # Missing samples
+        instance.missing_samples_primary_percent = aggregate.mean("primary", "missing_samples_percent")
+        instance.missing_samples_all_percent = aggregate.mean("all_slaves", "missing_samples_percent")
+
+        # Fault tolerance
+        instance.fault_clock_diff_post_max_max = aggregate.maximum("primary", "fault_clock_diff_post_max")
+        instance.fault_clock_diff_post_max_min = aggregate.minimum("primary", "fault_clock_diff_post_max")
+        instance.fault_ratio_clock_diff_post_max_pre_median_mean = aggregate.mean("primary", "fault_ratio_clock_diff_post_max_pre_median")
+        instance.secondary_fault_clock_diff_post_max_max = aggregate.maximum("secondary", "fault_clock_diff_post_max")
+        instance.secondary_fault_clock_diff_post_max_min = aggregate.minimum("secondary", "fault_clock_diff_post_max")
+        instance.secondary_fault_ratio_clock_diff_post_max_pre_median_mean = aggregate.mean("secondary", "fault_ratio_clock_diff_post_max_pre_median")
+
+        # Resource consumption data
+        if aggregate.primary_endpoints > 0:
+            for field in instance.__dict__.keys():
+                if field.startswith('proc_') or field.startswith('sys_'):
+                    instance.__dict__[field] = (aggregate.sum("primary", field) or 0) / aggregate.primary_endpoints
+
+        return instance
+
+    @staticmethod
+    def _merge_sketches(endpoint_ids: List[int], sketches: Dict[int, QuantileSketch]) -> QuantileSketch:
+        # Same as SampleQuery, which raises if any endpoint has no samples.
+        if len(sketches) != len(endpoint_ids) or any(sketch.count == 0 for sketch in sketches.values()):
+            raise NoDataError(f"Missing samples on some of the endpoints {endpoint_ids}.")
+        return QuantileSketch.merge_all(sketches.values())
+
     @staticmethod
     def invalidate(benchmark: Benchmark, vendor: Vendor, cluster: Cluster):
         BenchmarkSummary.get_query(benchmark, vendor, cluster).delete()
@@ -0,0 +1,196 @@
+import typing
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.db import models, transaction
+
+from ptp_perf.models.endpoint import PTPEndpoint
+from ptp_perf.models.endpoint_type import EndpointType
+from ptp_perf.models.profile import PTPProfile
+from ptp_perf.models.sample import Sample
+from ptp_perf.models.sample_sketch import SampleSketch
+from ptp_perf.utilities.quantile_sketch import QuantileSketch
+
+RESOURCE_FIELDS = [field.name for field in PTPEndpoint._meta.fields if field.name.startswith(("proc_", "sys_"))]
+
+ENDPOINT_POPULATIONS: Dict[str, List[EndpointType]] = {
+    "primary": [EndpointType.PRIMARY_SLAVE],
+    "secondary": [EndpointType.SECONDARY_SLAVE],
+    "all_slaves": [EndpointType.PRIMARY_SLAVE, EndpointType.SECONDARY_SLAVE, EndpointType.TERTIARY_SLAVE],
+}
+"""The endpoints of a profile that contribute to the summary, by population."""
+
+STATISTICS_FIELDS: Dict[str, List[str]] = {
+    "primary": [
+        "convergence_duration", "convergence_max_offset", "convergence_rate",
+        "converged_percentage", "converged_samples", "missing_samples_percent",
+        "fault_clock_diff_post_max", "fault_ratio_clock_diff_post_max_pre_median",
+        *RESOURCE_FIELDS,
+    ],
+    "secondary": ["fault_clock_diff_post_max", "fault_ratio_clock_diff_post_max_pre_median"],
+    "all_slaves": ["missing_samples_percent"],
+}
+"""The endpoint fields that are aggregated, by population."""
+
+
+class BenchmarkSummaryAggregate(models.Model):
+    """
+    Running aggregates of the analyzed profiles of a benchmark, vendor and cluster, from which the BenchmarkSummary
+    is computed without loading any samples (see BenchmarkSummary.update).
+
+    Profiles are added to the aggregates as they are analyzed. Minimum and maximum cannot be subtracted, so when one
+    of its profiles is analyzed again or marked corrupt, the aggregates of a group become stale and are rebuilt from
+    the endpoints (not the samples) once on next access, instead of once per changed profile.
+    Groups whose aggregates changed are dirty until their summary is recomputed.
+    """
+    id = models.BigAutoField(primary_key=True)
+    benchmark_id = models.CharField(max_length=255)
+    vendor_id = models.CharField(max_length=255)
+    cluster_id = models.CharField(max_length=255)
+
+    is_dirty = models.BooleanField(default=True)
+    is_stale = models.BooleanField(default=False)
+    """A profile of the aggregates changed, the aggregates are rebuilt by get_group."""
+    profile_ids = models.JSONField(default=list)
+    """The profiles included in the aggregates."""
+
+    primary_endpoints = models.IntegerField(default=0)
+    unsketched_endpoints = models.IntegerField(default=0)
+    """Primary endpoints that were analyzed before sketches were stored, the summary then needs the samples."""
+    missing_clock_diff_endpoints = models.IntegerField(default=0)
+    missing_path_delay_endpoints = models.IntegerField(default=0)
+    clock_diff_sketch = models.BinaryField(null=True)
+    path_delay_sketch = models.BinaryField(null=True)
+
+    statistics = models.JSONField(default=dict)
+    """Count (of values that are not null), sum, minimum and maximum of endpoint fields: {population: {field: [...]}}.
+    Durations are in seconds."""
+
+    def __str__(self):
+        return f"{self.benchmark_id} {self.vendor_id} {self.cluster_id}: {len(self.profile_ids)} profiles"
+
+    @staticmethod
+    def get_group(benchmark_id: str, vendor_id: str, cluster_id: str, rebuild: bool = False) -> "BenchmarkSummaryAggregate":
+        """The aggregates of the group, which are built from all of its profiles on first access and rebuilt if they
+        are stale (or with rebuild)."""
+        aggregate, created = BenchmarkSummaryAggregate.objects.get_or_create(
+            benchmark_id=benchmark_id, vendor_id=vendor_id, cluster_id=cluster_id,
+        )
+        if created or aggregate.is_stale or rebuild:
+            aggregate.rebuild()
+        return aggregate
+
+    @staticmethod
+    def update_profile(profile: PTPProfile):
+        """Update the aggregates of the group of the profile after it was analyzed or marked corrupt."""
+        with transaction.atomic():
+            aggregate, created = BenchmarkSummaryAggregate.objects.select_for_update().get_or_create(
+                benchmark_id=profile.benchmark_id, vendor_id=profile.vendor_id, cluster_id=profile.cluster_id,
+            )
+            if created or aggregate.is_stale or profile.id in aggregate.profile_ids:
+                # Rebuilt once by get_group, e.g. after all profiles were analyzed again.
+                aggregate.is_stale = aggregate.is_dirty = True
+                aggregate.save(update_fields=["is_stale", "is_dirty"])
+            elif profile.is_processed and not profile.is_corrupted:
+                aggregate.add_profile(profile)
+                aggregate.save()
+
+    def get_profile_query(self) -> models.QuerySet[PTPProfile]:
+        return PTPProfile.objects.filter(
+            benchmark_id=self.benchmark_id, vendor_id=self.vendor_id, cluster_id=self.cluster_id,
+            is_processed=True, is_corrupted=False,
+        )
+
+    def rebuild(self):
+        """Recompute the aggregates from the endpoints of all profiles of the group."""
+        self.profile_ids = []
+        self.primary_endpoints = self.unsketched_endpoints = 0
+        self.missing_clock_diff_endpoints = self.missing_path_delay_endpoints = 0
+        self.clock_diff_sketch = self.path_delay_sketch = None
+        self.statistics = {}
+        for profile in self.get_profile_query().order_by("id"):
+            self.add_profile(profile)
+        self.is_dirty = True
+        self.is_stale = False
+        self.save()
+
+    def add_profile(self, profile: PTPProfile):
+        """Add the endpoints of the profile to the aggregates, does not save."""
+        endpoints = list(profile.ptpendpoint_set.filter(endpoint_type__in=ENDPOINT_POPULATIONS["all_slaves"]).values())
+
+        for population, endpoint_types in ENDPOINT_POPULATIONS.items():
+            population_statistics = self.statistics.setdefault(population, {})
+            for field in STATISTICS_FIELDS[population]:
+                values = [
+                    endpoint[field] for endpoint in endpoints
+                    if endpoint["endpoint_type"] in endpoint_types and endpoint[field] is not None
+                ]
+                if len(values) != 0:
+                    population_statistics[field] = self._merge_statistics(population_statistics.get(field), values)
+
+        primary_endpoint_ids = [
+            endpoint["id"] for endpoint in endpoints if endpoint["endpoint_type"] in ENDPOINT_POPULATIONS["primary"]
+        ]
+        clock_diff_sketches = SampleSketch.load_of_endpoints(primary_endpoint_ids, Sample.SampleType.CLOCK_DIFF)
+        path_delay_sketches = SampleSketch.load_of_endpoints(primary_endpoint_ids, Sample.SampleType.PATH_DELAY)
+        clock_diff_sketch = self.get_clock_diff_sketch() or QuantileSketch()
+        path_delay_sketch = self.get_path_delay_sketch() or QuantileSketch()
+        for endpoint_id in primary_endpoint_ids:
+            if endpoint_id not in clock_diff_sketches:
+                self.unsketched_endpoints += 1
+                continue
+            if clock_diff_sketches[endpoint_id].count == 0:
+                self.missing_clock_diff_endpoints += 1
+            clock_diff_sketch.merge(clock_diff_sketches[endpoint_id])
+            if endpoint_id not in path_delay_sketches or path_delay_sketches[endpoint_id].count == 0:
+                self.missing_path_delay_endpoints += 1
+            else:
+                path_delay_sketch.merge(path_delay_sketches[endpoint_id])
+
+        self.clock_diff_sketch = clock_diff_sketch.to_bytes()
+        self.path_delay_sketch = path_delay_sketch.to_bytes()
+        self.primary_endpoints += len(primary_endpoint_ids)
+        self.profile_ids.append(profile.id)
+        self.is_dirty = True
+
+    @staticmethod
+    def _merge_statistics(statistics: Optional[List[float]], values: List) -> List[float]:
+        values = [value.total_seconds() if isinstance(value, timedelta) else value for value in values]
+        if statistics is None:
+            return [len(values), sum(values), min(values), max(values)]
+        count, total, minimum, maximum = statistics
+        return [count + len(values), total + sum(values), min(minimum, *values), max(maximum, *values)]
+
+    def get_clock_diff_sketch(self) -> Optional[QuantileSketch]:
+        return QuantileSketch.from_bytes(self.clock_diff_sketch) if self.clock_diff_sketch is not None else None
+
+    def get_path_delay_sketch(self) -> Optional[QuantileSketch]:
+        return QuantileSketch.from_bytes(self.path_delay_sketch) if self.path_delay_sketch is not None else None
+
+    def _statistic(self, population: str, field: str, index: int) -> Optional[float]:
+        statistics = self.statistics.get(population, {}).get(field)
+        return statistics[index] if statistics is not None else None
+
+    def mean(self, population: str, field: str) -> typing.Union[float, timedelta, None]:
+        statistics = self.statistics.get(population, {}).get(field)
+        if statistics is None:
+            return None
+        mean = statistics[1] / statistics[0]
+        if isinstance(PTPEndpoint._meta.get_field(field), models.DurationField):
+            return timedelta(seconds=mean)
+        return mean
+
+    def sum(self, population: str, field: str) -> Optional[float]:
+        return self._statistic(population, field, 1)
+
+    def minimum(self, population: str, field: str) -> Optional[float]:
+        return self._statistic(population, field, 2)
+
+    def maximum(self, population: str, field: str) -> Optional[float]:
+        return self._statistic(population, field, 3)
+
+    class Meta:
+        app_label = 'app'
+        constraints = [
+            models.UniqueConstraint(fields=["benchmark_id", "vendor_id", "cluster_id"], name="unique_summary_aggregate"),
+        ]
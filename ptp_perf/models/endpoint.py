@@ -8,9 +8,10 @@ from enum import StrEnum
 from pathlib import Path
 from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from django.db import models
-from django.db.models import CASCADE
+from django.db.models import CASCADE, Avg, Max, QuerySet
 from django.forms import model_to_dict
 from pandas.core.dtypes.common import is_numeric_dtype
 
@@ -20,17 +21,18 @@ from ptp_perf.models.endpoint_type import EndpointType
 from ptp_perf.models.exceptions import NoDataError
 from ptp_perf.models.loglevel import LogLevel
 from ptp_perf.models.profile import PTPProfile
-from ptp_perf.profiles.analysis import detect_clock_step, detect_clock_convergence
 from ptp_perf.profiles.benchmark import Benchmark
-from ptp_perf.profiles.data_container import Timeseries, ConvergenceStatistics
+from ptp_perf.profiles.endpoint_analysis import analyze_endpoint, EndpointAnalysis
 from ptp_perf.util import unpack_one_value
 from ptp_perf.utilities import units, psutil_utilities
 from ptp_perf.utilities.django_utilities import TimeFormatFloatField, PercentageFloatField, DataFormatFloatField, \
     GenericEngineeringFloatField, TemperatureFormatFloatField, FrequencyFormatFloatField
+from ptp_perf.utilities.quantile_sketch import QuantileSketch
 from ptp_perf.utilities.serialization import ModelJSONEncoder
 
 if typing.TYPE_CHECKING:
     from ptp_perf.models.sample import Sample
+    from ptp_perf.models.resource_sample import ResourceSample
     from ptp_perf.charts.timeseries_chart import TimeseriesChart
 
 class ProfileCorruptError(Exception):
@@ -55,6 +57,9 @@ class PTPEndpoint(models.Model):
 
     endpoint_type = models.CharField(choices=EndpointType, max_length=32, default=EndpointType.UNKNOWN)
     """The type of endpoint this is, e.g. master, slave, switch, orchestrator etc. (see EndpointType)"""
+    samples_streamed = models.BooleanField(default=False)
+    """Whether the clock diff and path delay samples were extracted while the benchmark ran (see StreamingSampleParser).
+    If so, analysis does not need to parse them from the log records again."""
 
     # Summary statistics
     clock_diff_median = TimeFormatFloatField(null=True)
@@ -155,39 +160,63 @@ class PTPEndpoint(models.Model):
     def load_samples_to_series(self, sample_type: "Sample.SampleType", converged_only: bool = True,
                                remove_clock_step: bool = True, remove_clock_step_force: bool = True,
                                normalize_time: TimeNormalizationStrategy = TimeNormalizationStrategy.CONVERGENCE) -> Optional[pd.Series]:
-        from ptp_perf.models import Sample
-        sample_set = self.sample_set.filter(sample_type=sample_type)
-
+        return self.load_samples_to_series_by_type(
+            [sample_type], converged_only=converged_only, remove_clock_step=remove_clock_step,
+            remove_clock_step_force=remove_clock_step_force, normalize_time=normalize_time,
+        )[sample_type]
+
+    def load_samples_to_series_by_type(self, sample_types: typing.Iterable["Sample.SampleType"], converged_only: bool = True,
+                                       remove_clock_step: bool = True, remove_clock_step_force: bool = True,
+                                       normalize_time: TimeNormalizationStrategy = TimeNormalizationStrategy.CONVERGENCE) -> typing.Dict["Sample.SampleType", Optional[pd.Series]]:
+        """Load several sample types at once, see load_samples_to_series. Sample types without data map to None."""
+        from ptp_perf.models import Sample, SampleSeries
+
+        minimum_timestamp = None
         if converged_only:
             if self.convergence_timestamp is None:
                 raise RuntimeError(f"Requested converged data but no convergence time is present: {self}.")
-            sample_set = sample_set.filter(timestamp__gte=self.convergence_timestamp)
+            minimum_timestamp = self.convergence_timestamp
 
         if remove_clock_step:
             if self.clock_step_timestamp is None:
                 if remove_clock_step_force:
                     raise RuntimeError("Requested clock step exclusion but no clock step timestamp is present.")
-            else:
-                sample_set = sample_set.filter(timestamp__gte=self.clock_step_timestamp)
-
-        frame = pd.DataFrame(sample_set.values("timestamp", "value"))
-        if frame.empty:
-            return None
-        # print(frame)
-        # frame = frame.pivot(columns=["sample_type"])
-        # frame[COLUMN_CLOCK_DIFF] = frame.loc[frame["sample_type"] == "CLOCK_DIFF", "value"]
-        # frame = frame.set_index(["id", "endpoint_id", "timestamp", "sample_type"])["value"].unstack().reset_index()
-
-        # frame["timestamp"] = frame["timestamp"].dt.tz_localize(None)
-        series = frame.set_index("timestamp")["value"]
-
-        if sample_type == Sample.SampleType.CLOCK_DIFF or sample_type == Sample.SampleType.PATH_DELAY:
-            series *= units.NANOSECONDS_TO_SECONDS
-
-        if normalize_time != TimeNormalizationStrategy.NONE:
-            series.index -= self.get_normalization_origin(normalize_time)
-
-        return series
+            elif minimum_timestamp is None or self.clock_step_timestamp > minimum_timestamp:
+                minimum_timestamp = self.clock_step_timestamp
+
+        arrays = self.load_sample_arrays_by_type(sample_types, minimum_timestamp=minimum_timestamp)
+
+        result = {}
+        for sample_type, sample_arrays in arrays.items():
+            series = SampleSeries.to_series(*sample_arrays)
+            if minimum_timestamp is not None:
+                series = series[series.index >= minimum_timestamp]
+            if series.empty:
+                result[sample_type] = None
+                continue
+
+            if sample_type == Sample.SampleType.CLOCK_DIFF or sample_type == Sample.SampleType.PATH_DELAY:
+                series = series * units.NANOSECONDS_TO_SECONDS
+
+            if normalize_time != TimeNormalizationStrategy.NONE:
+                series.index -= self.get_normalization_origin(normalize_time)
+            result[sample_type] = series
+
+        return result
+
+    def load_sample_arrays_by_type(self, sample_types: typing.Iterable["Sample.SampleType"],
+                                   minimum_timestamp: Optional[datetime] = None) -> typing.Dict["Sample.SampleType", typing.Tuple[np.ndarray, np.ndarray]]:
+        """The raw timestamps (int64 ns) and values (int64) of several sample types, in the order they were recorded.
+        Prefers the compact series, falls back to the sample rows (only those at or after minimum_timestamp)."""
+        from ptp_perf.models import SampleSeries
+        from ptp_perf.models.sample_loader import load_sample_arrays
+
+        sample_types = list(sample_types)
+        arrays = SampleSeries.load_by_type(self, sample_types)
+        missing_sample_types = [sample_type for sample_type in sample_types if sample_type not in arrays]
+        if len(missing_sample_types) != 0:
+            arrays.update(load_sample_arrays(self.id, missing_sample_types, minimum_timestamp=minimum_timestamp))
+        return {sample_type: arrays[sample_type] for sample_type in sample_types}
 
     def get_normalization_origin(self, normalization_strategy):
         reference_points = {
@@ -201,111 +230,100 @@ class PTPEndpoint(models.Model):
         return data - self.get_normalization_origin(normalization)
 
 
-    def process_timeseries_data(self):
+    def process_timeseries_data(self, save: bool = True):
+        """Detect the clock step and convergence and compute the statistics of the samples (see analyze_endpoint).
+        Without save, the statistics and sketches are written later by save_analysis."""
         from ptp_perf.models.sample import Sample
 
-        entire_series = self.load_samples_to_series(
-            Sample.SampleType.CLOCK_DIFF, converged_only=False,
-            remove_clock_step=False, normalize_time=TimeNormalizationStrategy.NONE
-        )
-        if entire_series is None:
+        arrays = self.load_sample_arrays_by_type([Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY])
+        timestamps, clock_diff = arrays[Sample.SampleType.CLOCK_DIFF]
+        path_delay_timestamps, path_delay = arrays[Sample.SampleType.PATH_DELAY]
+        if len(timestamps) == 0:
+            # Empty sketches tell the benchmark summary that the endpoint has no data.
+            self._set_sketches(QuantileSketch(), QuantileSketch(), save)
             return
 
-        timestamps = entire_series.index
-        if not isinstance(timestamps.dtype, pd.DatetimeTZDtype):
-            raise ProfileCorruptError(f"Received a time series the is not a datetime64+tz (type: {timestamps.dtype}).")
-
-        # Basic sanity checks, no duplicate timestamps
-        if not timestamps.is_unique:
-            value_counts = timestamps.value_counts()
-            duplicate_timestamps = value_counts[value_counts != 1]
-            raise ProfileCorruptError(f"Timestamps not unique:\n{duplicate_timestamps}")
-        if not timestamps.is_monotonic_increasing:
-            time_index_diff = entire_series.index.diff()
-            time_rewinds = time_index_diff < timedelta(seconds=0)
-            # Show some context.
-            adjacent_values = pd.Series(time_rewinds).rolling(10).max().astype(bool).reset_index(drop=True)
-            steps_backward = entire_series[adjacent_values]
-            raise ProfileCorruptError(
-                f"Timestamps not monotonically increasing:\n{steps_backward}"
-            )
-
-        # We don't normalize time automatically anymore.
-        # Normalize time: Move the origin to the epoch
-        # timestamps = timestamps - timestamps.min()
-
-        Timeseries._validate_series(entire_series, maximum_allowable_time_jump=timedelta(minutes=1, seconds=10))
+        # Basic sanity checks, no duplicate timestamps and no time rewinds
+        if np.any(np.diff(timestamps) <= 0):
+            self._raise_invalid_timestamps(timestamps, clock_diff)
 
-        # Do some data post-processing to improve quality.
+        fault_interval = self._load_fault_interval()
 
-        # First: calculate missing data ratios
-        # Maximum gap: 3x the target sync interval.
-        maximum_allowable_time_jump = timedelta(seconds=self.benchmark.sync_interval_seconds * 3)
-        timeseries_gaps = self.calculate_missing_data(entire_series, maximum_allowable_time_jump)
-        total_time_missing = timeseries_gaps.sum()
-        self.missing_samples_count = total_time_missing.total_seconds() / self.benchmark.sync_interval_seconds
-        self.missing_samples_percent = total_time_missing.total_seconds() / self.benchmark.duration.total_seconds()
-
-        # Step 1: Remove the first big clock step.
-
-        # Remove any beginning zero values (no clock_difference information yet) from start
-        # (first non-zero value makes cumulative sum >= 0)
-        crop_condition = (entire_series != 0).cumsum()
-        frame_no_leading_zeros = entire_series[crop_condition != 0]
+        analysis = analyze_endpoint(
+            timestamps, clock_diff * units.NANOSECONDS_TO_SECONDS,
+            path_delay_timestamps, path_delay * units.NANOSECONDS_TO_SECONDS,
+            sync_interval_seconds=self.benchmark.sync_interval_seconds, duration=self.benchmark.duration,
+            max_permissible_clock_steps=self.benchmark.analyze_limit_permissible_clock_steps,
+            fault_interval=(
+                (fault_interval[0].value, fault_interval[1].value) if fault_interval is not None else None
+            ),
+        )
 
-        detected_clock_step = detect_clock_step(frame_no_leading_zeros, self.benchmark.analyze_limit_permissible_clock_steps)
-        self.clock_step_timestamp = detected_clock_step.time
-        self.clock_step_magnitude = detected_clock_step.magnitude
+        self.missing_samples_count = analysis.missing_samples_count
+        self.missing_samples_percent = analysis.missing_samples_percent
 
-        # Now crop after clock step
+        self.clock_step_timestamp = pd.Timestamp(analysis.clock_step_timestamp, tz="UTC")
+        self.clock_step_magnitude = analysis.clock_step_magnitude
         self.profile.log_analyze(
-            f"Clock step at {detected_clock_step.time}: {detected_clock_step.magnitude}", level=LogLevel.DEBUG
+            f"Clock step at {self.clock_step_timestamp}: {self.clock_step_magnitude}", level=LogLevel.DEBUG
         )
-        frame_no_clock_step = frame_no_leading_zeros[frame_no_leading_zeros.index > detected_clock_step.time]
-
-        Timeseries._validate_series(frame_no_clock_step)
 
-        minimum_convergence_time = timedelta(seconds=10)
-        detected_clock_convergence = detect_clock_convergence(frame_no_clock_step, minimum_convergence_time)
-
-        if detected_clock_convergence is None:
+        if analysis.convergence_timestamp is None:
             raise ProfileCorruptError("No clock convergence detected.")
 
-        remaining_benchmark_time = frame_no_clock_step.index.max() - detected_clock_convergence.timestamp
+        remaining_benchmark_time = pd.Timedelta(analysis.analyzed_end - analysis.convergence_timestamp)
         if remaining_benchmark_time < self.benchmark.duration * 0.5:
             self.profile.log_analyze(
                 f"Cropping of convergence zone resulted in a low remaining benchmark data time of {remaining_benchmark_time}",
                 level=LogLevel.WARNING,
             )
 
-        # Create some convergence statistics
-        convergence_series = frame_no_clock_step[frame_no_clock_step.index <= detected_clock_convergence.timestamp]
-        convergence_statistics = ConvergenceStatistics.from_convergence_series(detected_clock_convergence,
-                                                                               convergence_series)
-        self.convergence_timestamp = detected_clock_convergence.timestamp
-        self.convergence_duration = detected_clock_convergence.duration
-        self.convergence_rate = convergence_statistics.convergence_rate
-        self.convergence_max_offset = convergence_statistics.convergence_max_offset
-        self.converged_percentage = detected_clock_convergence.ratio_converged_samples
-        self.converged_samples = detected_clock_convergence.num_converged_samples
+        self.convergence_timestamp = pd.Timestamp(analysis.convergence_timestamp, tz="UTC")
+        self.convergence_duration = pd.Timedelta(analysis.convergence_duration)
+        self.convergence_rate = analysis.convergence_rate
+        self.convergence_max_offset = analysis.convergence_max_offset
+        self.converged_percentage = analysis.converged_percentage
+        self.converged_samples = analysis.converged_samples
+
+        self.clock_diff_median, self.clock_diff_p05, self.clock_diff_p95 = analysis.clock_diff
+        self.path_delay_median, self.path_delay_p05, self.path_delay_p95 = analysis.path_delay
+        self.path_delay_std = analysis.path_delay_std
 
+        # Sketches of the same samples as SampleQuery (converged_only) for the benchmark summaries.
+        self._set_sketches(analysis.clock_diff_sketch, analysis.path_delay_sketch, save)
 
-        # Now create the actual data
-        converged_series = frame_no_clock_step[frame_no_clock_step.index > detected_clock_convergence.timestamp]
-        Timeseries._validate_series(converged_series)
+        # If there was a fault, store fault statistics
+        if fault_interval is not None:
+            self._apply_fault_analysis(analysis, *fault_interval)
 
-        # self.summary_statistics = self.time_series.summarize()
-        abs_clock_diff = converged_series.abs()
-        self.clock_diff_median, self.clock_diff_p05, self.clock_diff_p95 = self.calculate_quantiles(abs_clock_diff)
+        if save:
+            self.save()
+        return self
 
-        path_delay_values = self.load_samples_to_series(Sample.SampleType.PATH_DELAY, converged_only=True, normalize_time=TimeNormalizationStrategy.NONE)
-        self.path_delay_median, self.path_delay_p05, self.path_delay_p95 = self.calculate_quantiles(path_delay_values)
-        self.path_delay_std = path_delay_values.std()
+    def _raise_invalid_timestamps(self, timestamps: np.ndarray, clock_diff: np.ndarray):
+        from ptp_perf.models import SampleSeries
+
+        entire_series = SampleSeries.to_series(timestamps, clock_diff)
+        if not entire_series.index.is_unique:
+            value_counts = entire_series.index.value_counts()
+            duplicate_timestamps = value_counts[value_counts != 1]
+            raise ProfileCorruptError(f"Timestamps not unique:\n{duplicate_timestamps}")
+
+        time_index_diff = entire_series.index.diff()
+        time_rewinds = time_index_diff < timedelta(seconds=0)
+        # Show some context.
+        adjacent_values = pd.Series(time_rewinds).rolling(10).max().astype(bool).reset_index(drop=True)
+        steps_backward = entire_series[adjacent_values.to_numpy()]
+        raise ProfileCorruptError(
+            f"Timestamps not monotonically increasing:\n{steps_backward}"
+        )
+
+    def _load_fault_interval(self) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """The start and end of the fault of the profile, None if there was no fault."""
+        from ptp_perf.models.sample import Sample
 
-        # If there was a fault, calculate fault statistics
         # We pull in faults from all locations so that every endpoint gets statistics
         try:
-            # This raises nodataexception if no faults found
             faults = Sample.objects.filter(
                 endpoint__profile_id=self.profile_id, sample_type=Sample.SampleType.FAULT
             )
@@ -314,67 +332,69 @@ class PTPEndpoint(models.Model):
                 raise ProfileCorruptError("Cannot support multiple faults in one profile at the moment.")
             fault_start = faults.filter(value=1).get()
             fault_end = faults.filter(value=0).get()
-            if fault_start.timestamp <= self.convergence_timestamp:
-                raise ProfileCorruptError("Clock did not converge before the first fault.")
-            if fault_start.timestamp >= fault_end.timestamp:
-                raise ProfileCorruptError("Fault ended before it started?")
-            if fault_end.timestamp > max(frame_no_clock_step.index):
-                # TODO: Investigate fault corruption
-                error_msg = f"Fault out of data range on endpoint {self} " \
-                            f"Data interval: [{min(frame_no_clock_step.index)}, {max(frame_no_clock_step.index)}], " \
-                            f"Fault interval: [{fault_start.timestamp}, {fault_end.timestamp}]"
-
-                if self.profile.benchmark.fault_location == self.endpoint_type:
-                    raise ProfileCorruptError(error_msg)
-                else:
-                    self.profile.log_analyze(error_msg, level=LogLevel.WARNING)
-
-            pre_fault_series = abs_clock_diff[abs_clock_diff.index <= fault_start.timestamp]
-            self.fault_clock_diff_pre_median, self.fault_clock_diff_pre_p05, self.fault_clock_diff_pre_p95 = (
-                self.calculate_quantiles(pre_fault_series)
-            )
-            pre_fault_path_delay = path_delay_values[path_delay_values.index <= fault_start.timestamp]
-            self.fault_path_delay_pre_median, self.fault_path_delay_pre_p05, self.fault_path_delay_pre_p95 = (
-                self.calculate_quantiles(pre_fault_path_delay)
-            )
-
-            post_fault_series = abs_clock_diff[abs_clock_diff.index >= fault_end.timestamp]
-            if not post_fault_series.empty:
-                self.fault_clock_diff_post_median, self.fault_clock_diff_post_p05, self.fault_clock_diff_post_p95 = (
-                    self.calculate_quantiles(post_fault_series)
-                )
-                post_fault_path_delay = path_delay_values[path_delay_values.index >= fault_end.timestamp]
-                self.fault_path_delay_post_median, self.fault_path_delay_post_p05, self.fault_path_delay_post_p95 = (
-                    self.calculate_quantiles(post_fault_path_delay)
-                )
-
-                self.fault_actual_duration = post_fault_series.index.min() - pre_fault_series.index.max()
-                self.fault_ratio_clock_diff_median = self.fault_clock_diff_post_median / self.fault_clock_diff_pre_median
-                self.fault_ratio_clock_diff_p95 = self.fault_clock_diff_post_p95 / self.fault_clock_diff_pre_p95
-
-                self.fault_clock_diff_post_max = post_fault_series.max()
-                self.fault_ratio_clock_diff_post_max_pre_median = self.fault_clock_diff_post_max / self.fault_clock_diff_pre_median
+        except Sample.DoesNotExist:
+            if self.benchmark.fault_location is not None:
+                raise ProfileCorruptError(f"Could not find fault for profile {self.profile} on benchmark {self.benchmark}")
+            return None
 
-                # Calculate how long it takes to return to normal (within 2x of pre-fault median)
-                post_fault_series_smoothed = post_fault_series.rolling(5).median()
-                post_fault_under_2x_median = post_fault_series[
-                    post_fault_series_smoothed < 2 * self.fault_clock_diff_pre_median
-                ]
-                if not post_fault_under_2x_median.empty:
-                    self.fault_clock_diff_return_to_normal_time = post_fault_under_2x_median.index[0] - fault_end.timestamp
-                else:
-                    self.fault_clock_diff_return_to_normal_time = None
+        if fault_start.timestamp >= fault_end.timestamp:
+            raise ProfileCorruptError("Fault ended before it started?")
+        return pd.Timestamp(fault_start.timestamp), pd.Timestamp(fault_end.timestamp)
+
+    def _apply_fault_analysis(self, analysis: EndpointAnalysis, fault_start: pd.Timestamp, fault_end: pd.Timestamp):
+        if fault_start <= self.convergence_timestamp:
+            raise ProfileCorruptError("Clock did not converge before the first fault.")
+        if fault_end.value > analysis.analyzed_end:
+            # TODO: Investigate fault corruption
+            error_msg = f"Fault out of data range on endpoint {self} " \
+                        f"Data interval: [{pd.Timestamp(analysis.analyzed_start, tz='UTC')}, {pd.Timestamp(analysis.analyzed_end, tz='UTC')}], " \
+                        f"Fault interval: [{fault_start}, {fault_end}]"
+
+            if self.profile.benchmark.fault_location == self.endpoint_type:
+                raise ProfileCorruptError(error_msg)
+            else:
+                self.profile.log_analyze(error_msg, level=LogLevel.WARNING)
+
+        fault = analysis.fault
+        self.fault_clock_diff_pre_median, self.fault_clock_diff_pre_p05, self.fault_clock_diff_pre_p95 = fault.clock_diff_pre
+        self.fault_path_delay_pre_median, self.fault_path_delay_pre_p05, self.fault_path_delay_pre_p95 = fault.path_delay_pre
+
+        if fault.clock_diff_post is not None:
+            self.fault_clock_diff_post_median, self.fault_clock_diff_post_p05, self.fault_clock_diff_post_p95 = fault.clock_diff_post
+            self.fault_path_delay_post_median, self.fault_path_delay_post_p05, self.fault_path_delay_post_p95 = fault.path_delay_post
+
+            self.fault_actual_duration = pd.Timedelta(fault.actual_duration) if fault.actual_duration is not None else None
+            self.fault_ratio_clock_diff_median = fault.ratio_clock_diff_median
+            self.fault_ratio_clock_diff_p95 = fault.ratio_clock_diff_p95
+            self.fault_clock_diff_post_max = fault.clock_diff_post_max
+            self.fault_ratio_clock_diff_post_max_pre_median = fault.ratio_clock_diff_post_max_pre_median
+            self.fault_clock_diff_return_to_normal_time = (
+                pd.Timedelta(fault.clock_diff_return_to_normal_time)
+                if fault.clock_diff_return_to_normal_time is not None else None
+            )
 
-            mid_fault_series = abs_clock_diff[(abs_clock_diff.index > fault_start.timestamp) & (abs_clock_diff.index < fault_end.timestamp)]
-            if not mid_fault_series.empty:
-                self.fault_clock_diff_mid_max = mid_fault_series.max()
+        if fault.clock_diff_mid_max is not None:
+            self.fault_clock_diff_mid_max = fault.clock_diff_mid_max
 
-        except (NoDataError, Sample.DoesNotExist):
-            if self.benchmark.fault_location is not None:
-                raise ProfileCorruptError(f"Could not find fault for profile {self.profile} on benchmark {self.benchmark}")
+    def _set_sketches(self, clock_diff_sketch: QuantileSketch, path_delay_sketch: QuantileSketch, save: bool):
+        from ptp_perf.models.sample import Sample
+        from ptp_perf.models.sample_sketch import SampleSketch
+        self._pending_sketches = {
+            Sample.SampleType.CLOCK_DIFF: clock_diff_sketch,
+            Sample.SampleType.PATH_DELAY: path_delay_sketch,
+        }
+        if save:
+            SampleSketch.store_many([self])
 
-        self.save()
-        return self
+    @staticmethod
+    def save_analysis(endpoints: typing.Iterable["PTPEndpoint"]):
+        """Write the statistics and sketches of endpoints processed without save, with a few queries."""
+        from ptp_perf.models.sample_sketch import SampleSketch
+        endpoints = list(endpoints)
+        PTPEndpoint.objects.bulk_update(
+            endpoints, fields=[field.name for field in PTPEndpoint._meta.concrete_fields if not field.primary_key],
+        )
+        SampleSketch.store_many(endpoints)
 
     def _validate_series(self, series: pd.Series, maximum_allowable_time_jump: timedelta = timedelta(seconds=5)):
         # Validate shape of frame and properties
@@ -424,8 +444,12 @@ class PTPEndpoint(models.Model):
         # We create multiple charts:
         # one only showing the filtered data and one showing the entire convergence trajectory
         if self.convergence_timestamp is not None:
-            clock_diff = self.load_samples_to_series(Sample.SampleType.CLOCK_DIFF, normalize_time=TimeNormalizationStrategy.CONVERGENCE)
-            path_delay = self.load_samples_to_series(Sample.SampleType.PATH_DELAY, normalize_time=TimeNormalizationStrategy.CONVERGENCE)
+            samples = self.load_samples_to_series_by_type(
+                [Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY],
+                normalize_time=TimeNormalizationStrategy.CONVERGENCE,
+            )
+            clock_diff = samples[Sample.SampleType.CLOCK_DIFF]
+            path_delay = samples[Sample.SampleType.PATH_DELAY]
 
             if clock_diff is None or path_delay is None:
                 raise NoDataError()
@@ -455,14 +479,12 @@ class PTPEndpoint(models.Model):
     def create_timeseries_chart_convergence(self, normalization=TimeNormalizationStrategy.CLOCK_STEP) -> "TimeseriesChart":
         from ptp_perf.charts.timeseries_chart import TimeseriesChart
         from ptp_perf.models.sample import Sample
-        clock_diff = self.load_samples_to_series(
-            Sample.SampleType.CLOCK_DIFF,
-            converged_only=False, remove_clock_step_force=False, normalize_time=normalization,
-        )
-        path_delay = self.load_samples_to_series(
-            Sample.SampleType.PATH_DELAY,
+        samples = self.load_samples_to_series_by_type(
+            [Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY],
             converged_only=False, remove_clock_step_force=False, normalize_time=normalization,
         )
+        clock_diff = samples[Sample.SampleType.CLOCK_DIFF]
+        path_delay = samples[Sample.SampleType.PATH_DELAY]
         # if self.check_dependent_file_needs_update(output_path) or force_regeneration:
         chart_convergence = TimeseriesChart(
             title=self.get_title("with Convergence"),
@@ -480,8 +502,9 @@ class PTPEndpoint(models.Model):
 
     def process_fault_data(self):
         from ptp_perf.models import LogRecord, Sample
-        records = LogRecord.objects.filter(source="fault-generator", endpoint__profile=self.profile).all()
+        records = LogRecord.objects.filter(source="fault-generator", endpoint__profile=self.profile).order_by("id").all()
         parsed_faults = 0
+        fault_samples = []
         for record in records:
             # We import faults either directly on the current endpoint.
             # If we are the orchestrator, then we get faults from switch2 (easier to regex match).
@@ -492,20 +515,81 @@ class PTPEndpoint(models.Model):
                 record.message
             )
             if match is not None:
-                sample = Sample(
-                    endpoint=self,
-                    timestamp=record.timestamp,
-                    sample_type=Sample.SampleType.FAULT,
-                    value=1 if match.group("status") == "imminent" else 0
+                fault_samples.append(
+                    Sample(
+                        endpoint=self,
+                        timestamp=record.timestamp,
+                        sample_type=Sample.SampleType.FAULT,
+                        value=1 if match.group("status") == "imminent" else 0
+                    )
                 )
-                sample.save()
                 parsed_faults += 1
+        Sample.objects.bulk_create(fault_samples)
         if parsed_faults > 0:
             self.profile.log_analyze(f"{self} parsed {parsed_faults} fault status records.")
         return parsed_faults
 
 
-    def process_system_metrics_data(self):
+    def process_system_metrics_data(self, save: bool = True):
+        """Compute the resource consumption statistics of this endpoint from its resource samples.
+        Endpoints recorded before resource samples were introduced are processed from the JSON log records.
+        Without save, the statistics are written later by save_analysis."""
+        from ptp_perf.models import ResourceSample
+        samples = ResourceSample.objects.filter(endpoint=self, proc_cpu_user__isnull=False)
+        if samples.exists():
+            self.process_resource_samples(samples, save=save)
+        else:
+            self.process_system_metrics_data_json(save=save)
+
+    def process_resource_samples(self, samples: "QuerySet[ResourceSample]", save: bool = True):
+        # Counters: difference between the first and the last sample
+        counter_columns = [
+            'timestamp', 'proc_cpu_user', 'proc_cpu_system',
+            'proc_ctx_switches_voluntary', 'proc_ctx_switches_involuntary',
+            'sys_net_ptp_iface_bytes_sent', 'sys_net_ptp_iface_bytes_received',
+            'sys_net_ptp_iface_packets_sent', 'sys_net_ptp_iface_packets_received',
+        ]
+        ordered_samples = samples.order_by('timestamp', 'id').values(*counter_columns)
+        first_sample = ordered_samples.first()
+        last_sample = ordered_samples.last()
+        difference = {
+            column: last_sample[column] - first_sample[column]
+            if last_sample[column] is not None and first_sample[column] is not None else None
+            for column in counter_columns
+        }
+
+        self.resource_profile_length = difference['timestamp']
+        self.proc_cpu_percent_system = difference['proc_cpu_system'] / self.resource_profile_length.total_seconds()
+        self.proc_cpu_percent_user = difference['proc_cpu_user'] / self.resource_profile_length.total_seconds()
+        self.proc_cpu_percent = self.proc_cpu_percent_system + self.proc_cpu_percent_user
+        self.proc_ctx_switches_voluntary = difference['proc_ctx_switches_voluntary']
+        self.proc_ctx_switches_involuntary = difference['proc_ctx_switches_involuntary']
+
+        # Gauges: aggregates over all samples
+        aggregates = samples.aggregate(
+            sys_cpu_frequency=Avg('sys_cpu_frequency'),
+            sys_sensors_temperature_cpu=Avg('sys_sensors_temperature_cpu'),
+            proc_mem_uss=Max('proc_mem_uss'),
+            proc_mem_pss=Max('proc_mem_pss'),
+            proc_mem_rss=Max('proc_mem_rss'),
+            proc_mem_vms=Max('proc_mem_vms'),
+        )
+        for key, value in aggregates.items():
+            setattr(self, key, value)
+
+        self.sys_net_ptp_iface_bytes_sent = difference['sys_net_ptp_iface_bytes_sent']
+        self.sys_net_ptp_iface_packets_sent = difference['sys_net_ptp_iface_packets_sent']
+        self.sys_net_ptp_iface_bytes_received = difference['sys_net_ptp_iface_bytes_received']
+        self.sys_net_ptp_iface_packets_received = difference['sys_net_ptp_iface_packets_received']
+        if self.sys_net_ptp_iface_packets_sent is not None and self.sys_net_ptp_iface_packets_received is not None:
+            self.sys_net_ptp_iface_packets_total = self.sys_net_ptp_iface_packets_received + self.sys_net_ptp_iface_packets_sent
+            self.sys_net_ptp_iface_bytes_total = self.sys_net_ptp_iface_bytes_received + self.sys_net_ptp_iface_bytes_sent
+
+        if save:
+            self.save()
+
+    def process_system_metrics_data_json(self, save: bool = True):
+        """Legacy version of process_system_metrics_data, parsing the resource monitor's JSON log records."""
         from ptp_perf.models import LogRecord
         from ptp_perf.adapters.resource_monitor import ResourceMonitor
         records = LogRecord.objects.filter(
@@ -716,12 +800,34 @@ class PTPEndpoint(models.Model):
             self.sys_net_ptp_iface_packets_total = (self.sys_net_ptp_iface_packets_received + self.sys_net_ptp_iface_packets_sent)
             self.sys_net_ptp_iface_bytes_total = (self.sys_net_ptp_iface_bytes_received + self.sys_net_ptp_iface_bytes_sent)
 
-            self.save()
+            if save:
+                self.save()
+
 
+    def pack_samples(self) -> int:
+        """Store the samples of this endpoint as compact series, which are preferred by load_samples_to_series."""
+        from ptp_perf.models import Sample, SampleSeries
+        return sum(SampleSeries.pack(self, sample_type) for sample_type in Sample.SampleType)
 
-    def clear_analysis_data(self):
+    def clear_analysis_data(self, reparse: bool = False):
         # Remove existing data. Does not clear the associated profile data.
-        self.sample_set.all().delete()
+        from ptp_perf.models.sample import Sample
+        if self.samples_streamed and not reparse:
+            # Keep the samples extracted during the benchmark.
+            self.sample_set.exclude(
+                sample_type__in=[Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY]
+            ).delete()
+            self.sampleseries_set.exclude(
+                sample_type__in=[Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY]
+            ).delete()
+            self.samplesketch_set.all().delete()
+        else:
+            self.sample_set.all().delete()
+            self.sampleseries_set.all().delete()
+            self.samplesketch_set.all().delete()
+            if self.samples_streamed:
+                self.samples_streamed = False
+                self.save(update_fields=['samples_streamed'])
 
 
     def log(self, message: str, source: str):
@@ -773,6 +879,6 @@ class PTPEndpoint(models.Model):
 
     def export_as_dict(self):
         endpoint_as_dict = model_to_dict(self)
-        endpoint_as_dict["logrecord_set"] = list(self.logrecord_set.values())
-        endpoint_as_dict["sample_set"] = list(self.sample_set.values())
+        endpoint_as_dict["logrecord_set"] = list(self.logrecord_set.order_by("id").values())
+        endpoint_as_dict["sample_set"] = list(self.sample_set.order_by("id").values())
         return endpoint_as_dict
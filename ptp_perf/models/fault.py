@@ -19,7 +19,7 @@ class Fault:
     def from_profile(profile: PTPProfile) -> List["Fault"]:
         faults: List[Sample] = Sample.objects.filter(
             endpoint__profile_id=profile.id, sample_type=Sample.SampleType.FAULT
-        )
+        ).order_by('id')
         parsed_faults = []
         fault_start = None
         for id, fault in enumerate(faults):
@@ -39,10 +39,10 @@ class Fault:
 
     @staticmethod
     def from_query(query: SampleQuery) -> List["Fault"]:
-        frame = query.run(Sample.SampleType.FAULT).reset_index()
-
         faults = []
-        for endpoint_id, endpoint_faults in frame.groupby("endpoint_id"):
+        for chunk in query.iter_chunks(Sample.SampleType.FAULT):
+            endpoint_faults = chunk.reset_index()
+            endpoint_id = unpack_one_value(endpoint_faults["endpoint_id"].unique())
             if len(endpoint_faults) < 2:
                 raise RuntimeError(
                     f"Cannot parse faults from frame of length: {len(endpoint_faults)}\n{endpoint_faults}")
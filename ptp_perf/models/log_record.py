@@ -11,13 +11,22 @@ class LogRecord(models.Model):
 
     message = models.TextField(null=False)
 
+    spool_sequence = models.BigIntegerField(null=True, blank=True)
+    """Sequence number of the record in the worker-side log spool, used to make uploads from the spool idempotent."""
+
     @property
     def machine(self):
         return self.endpoint.machine
 
     class Meta:
-        ordering = ('id',)
         app_label = 'app'
+        # No default ordering, queries that depend on the order (usually by id) must order explicitly.
+        indexes = [
+            models.Index(fields=['endpoint', 'source', 'id'], name='logrecord_endpoint_source_id'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['endpoint', 'spool_sequence'], name='unique_endpoint_spool_sequence'),
+        ]
 
     def __str__(self):
         return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} {self.endpoint.machine_id} {self.source} {self.message}"
@@ -1,3 +1,4 @@
+import contextlib
 import dataclasses
 import json
 import logging
@@ -18,6 +19,7 @@ if typing.TYPE_CHECKING:
     from ptp_perf.profiles.benchmark import Benchmark
     from ptp_perf.vendor.vendor import Vendor
     from ptp_perf.models import PTPEndpoint
+    from ptp_perf.models.analysis_logrecord import AnalysisLogRecord
 
 
 class PTPProfile(models.Model):
@@ -34,10 +36,13 @@ class PTPProfile(models.Model):
     start_time = models.DateTimeField()
     stop_time = models.DateTimeField(null=True, blank=True)
 
-    def clear_analysis_data(self):
+    _analysis_log_buffer: typing.Optional[typing.List["AnalysisLogRecord"]] = None
+
+    def clear_analysis_data(self, reparse: bool = False):
         # Remove existing analysis data including endpoint data.
+        # Samples extracted during the benchmark are kept unless reparse is set.
         for endpoint in self.ptpendpoint_set.all():
-            endpoint.clear_analysis_data()
+            endpoint.clear_analysis_data(reparse=reparse)
         self.analysislogrecord_set.all().delete()
 
         self.is_processed = False
@@ -45,7 +50,7 @@ class PTPProfile(models.Model):
         self.save()
 
     def log_analyze(self, message: str, level: LogLevel = LogLevel.INFO):
-        """Save a log message for the analysis run to the database."""
+        """Save a log message for the analysis run to the database (when leaving buffer_analysis_log, if active)."""
         from ptp_perf.models.analysis_logrecord import AnalysisLogRecord
         logging.log(level, message)
         log_record = AnalysisLogRecord(
@@ -54,7 +59,22 @@ class PTPProfile(models.Model):
             message=message,
             timestamp=get_server_datetime(),
         )
-        log_record.save()
+        if self._analysis_log_buffer is not None:
+            self._analysis_log_buffer.append(log_record)
+        else:
+            log_record.save()
+
+    @contextlib.contextmanager
+    def buffer_analysis_log(self):
+        """Collect the messages of log_analyze and save them at once when the block completes, even if it raises.
+        Enter it outside of the analysis transaction so that the messages of a failed analysis survive the rollback."""
+        from ptp_perf.models.analysis_logrecord import AnalysisLogRecord
+        self._analysis_log_buffer = []
+        try:
+            yield
+        finally:
+            log_records, self._analysis_log_buffer = self._analysis_log_buffer, None
+            AnalysisLogRecord.objects.bulk_create(log_records)
 
 
     @property
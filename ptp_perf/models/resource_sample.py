@@ -0,0 +1,43 @@
+from django.db import models
+
+from ptp_perf.models.endpoint import PTPEndpoint
+
+
+class ResourceSample(models.Model):
+    """
+    A sample of the resource consumption of a PTP endpoint, taken by the ResourceMonitor once per interval.
+    Counters (cpu times, context switches, network counters) are cumulative, rates are computed during analysis.
+    Process columns are null if the vendor process was not running when the sample was taken.
+    """
+    id = models.AutoField(primary_key=True)
+    endpoint = models.ForeignKey(PTPEndpoint, on_delete=models.CASCADE)
+    timestamp = models.DateTimeField(null=False)
+    collection_duration = models.DurationField(null=True)
+    """How long collecting this sample took, i.e. the overhead of the resource monitor itself."""
+
+    proc_cpu_user = models.FloatField(null=True)
+    """Cumulative user cpu time of the vendor process in seconds."""
+    proc_cpu_system = models.FloatField(null=True)
+    """Cumulative system cpu time of the vendor process in seconds."""
+    proc_mem_uss = models.BigIntegerField(null=True)
+    proc_mem_pss = models.BigIntegerField(null=True)
+    proc_mem_rss = models.BigIntegerField(null=True)
+    proc_mem_vms = models.BigIntegerField(null=True)
+    proc_ctx_switches_voluntary = models.BigIntegerField(null=True)
+    proc_ctx_switches_involuntary = models.BigIntegerField(null=True)
+    proc_num_threads = models.IntegerField(null=True)
+
+    sys_cpu_frequency = models.FloatField(null=True)
+    """Current cpu frequency in MHz."""
+    sys_sensors_temperature_cpu = models.FloatField(null=True)
+    """CPU temperature in degrees celsius, null if there is no known sensor."""
+    sys_net_ptp_iface_bytes_sent = models.BigIntegerField(null=True)
+    sys_net_ptp_iface_bytes_received = models.BigIntegerField(null=True)
+    sys_net_ptp_iface_packets_sent = models.BigIntegerField(null=True)
+    sys_net_ptp_iface_packets_received = models.BigIntegerField(null=True)
+
+    def __str__(self):
+        return f"{self.timestamp}: cpu={self.proc_cpu_user}+{self.proc_cpu_system}s rss={self.proc_mem_rss}"
+
+    class Meta:
+        app_label = 'app'
@@ -28,4 +28,11 @@ class Sample(models.Model):
 
     class Meta:
         app_label = 'app'
-        ordering = ['id']
+        # No default ordering, queries that depend on the order (usually by id) must order explicitly.
+        indexes = [
+            models.Index(fields=['endpoint', 'sample_type', 'timestamp'], name='sample_endpoint_type_time'),
+            # Faults are rare but are queried across all endpoints of a profile.
+            models.Index(
+                fields=['endpoint'], condition=models.Q(sample_type='FAULT'), name='sample_fault_endpoint'
+            ),
+        ]
@@ -0,0 +1,126 @@
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.db import connection
+
+from ptp_perf.models.sample import Sample
+
+SampleArrays = Tuple[np.ndarray, np.ndarray]
+"""Timestamps (int64 ns since the epoch, UTC) and values (int64) of samples, in the order they were recorded."""
+
+
+def _timestamp_ns_expression(column: str) -> str:
+    if connection.vendor == 'postgresql':
+        # EXTRACT(EPOCH ...) is numeric and exact to the microsecond.
+        return f"(EXTRACT(EPOCH FROM {column}) * 1000000)::bigint * 1000"
+    if connection.vendor == 'sqlite':
+        # Timestamps are stored as 'YYYY-MM-DD HH:MM:SS[.ffffff]' in UTC.
+        return (f"(CAST(strftime('%%s', {column}) AS INTEGER) * 1000000 "
+                f"+ CAST(substr({column} || '.000000', 21, 6) AS INTEGER)) * 1000")
+    raise NotImplementedError(f"Timestamp conversion is not implemented for database {connection.vendor}.")
+
+
+def _fetch_int64_rows(query: str, parameters: List, num_columns: int, fetch_size: int) -> np.ndarray:
+    """Fetch the integer rows of the query in blocks into a preallocated two-dimensional int64 array."""
+    data = np.empty((fetch_size, num_columns), dtype=np.int64)
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(query, parameters)
+        while rows := cursor.fetchmany(fetch_size):
+            if count + len(rows) > len(data):
+                data = np.resize(data, (2 * len(data), num_columns))
+            data[count:count + len(rows)] = rows
+            count += len(rows)
+    return data[:count]
+
+
+def load_sample_arrays(endpoint_id: int, sample_types: Iterable[Sample.SampleType],
+                       minimum_timestamp: Optional[datetime] = None, fetch_size: int = 65536) -> Dict[str, SampleArrays]:
+    """Load the samples of several types of an endpoint in one query, without creating a Python object per sample
+    beyond the rows returned by the database driver. The timestamps are converted to integers by the database and
+    the rows are fetched in blocks into a preallocated int64 array. Returns arrays (possibly empty) for every type."""
+    sample_types = list(sample_types)
+    quote_name = connection.ops.quote_name
+    timestamp_column = quote_name("timestamp")
+    # Sample types are encoded by their position, so that every column is an integer.
+    type_codes = " ".join(f"WHEN %s THEN {code}" for code in range(len(sample_types)))
+    query = (
+        f"SELECT CASE {quote_name('sample_type')} {type_codes} END, "
+        f"{_timestamp_ns_expression(timestamp_column)}, {quote_name('value')} "
+        f"FROM {quote_name(Sample._meta.db_table)} "
+        f"WHERE {quote_name('endpoint_id')} = %s AND {quote_name('sample_type')} IN ({', '.join(['%s'] * len(sample_types))})"
+    )
+    parameters = [*sample_types, endpoint_id, *sample_types]
+    if minimum_timestamp is not None:
+        query += f" AND {timestamp_column} >= %s"
+        parameters.append(connection.ops.adapt_datetimefield_value(minimum_timestamp))
+    query += f" ORDER BY {quote_name('id')}"
+
+    data = _fetch_int64_rows(query, parameters, 3, fetch_size)
+
+    result = {}
+    for code, sample_type in enumerate(sample_types):
+        selected = data[data[:, 0] == code]
+        result[sample_type] = (np.ascontiguousarray(selected[:, 1]), np.ascontiguousarray(selected[:, 2]))
+    return result
+
+
+def _query_of_endpoints(num_endpoints: int, minimum_timestamp_fields: Sequence[str]) -> str:
+    """The query of the endpoint ids, timestamps and values of the samples of one type of num_endpoints endpoints,
+    ordered by endpoint id and timestamp. For every endpoint field in minimum_timestamp_fields (e.g.
+    convergence_timestamp), samples before the endpoint's timestamp are excluded by joining the endpoint table."""
+    quote_name = connection.ops.quote_name
+    sample_table = quote_name(Sample._meta.db_table)
+    endpoint_table = quote_name(Sample._meta.get_field('endpoint').related_model._meta.db_table)
+    endpoint_id_column = f"{sample_table}.{quote_name('endpoint_id')}"
+    timestamp_column = f"{sample_table}.{quote_name('timestamp')}"
+    query = (
+        f"SELECT {endpoint_id_column}, {_timestamp_ns_expression(timestamp_column)}, {sample_table}.{quote_name('value')} "
+        f"FROM {sample_table} "
+    )
+    if len(minimum_timestamp_fields) != 0:
+        query += f"INNER JOIN {endpoint_table} ON {endpoint_table}.{quote_name('id')} = {endpoint_id_column} "
+    query += (
+        f"WHERE {sample_table}.{quote_name('sample_type')} = %s "
+        f"AND {endpoint_id_column} IN ({', '.join(['%s'] * num_endpoints)}) "
+    )
+    for field in minimum_timestamp_fields:
+        query += f"AND {timestamp_column} >= {endpoint_table}.{quote_name(field)} "
+    return query + f"ORDER BY {endpoint_id_column}, {timestamp_column}"
+
+
+def load_sample_arrays_of_endpoints(endpoint_ids: Sequence[int], sample_type: Sample.SampleType,
+                                    minimum_timestamp_fields: Sequence[str] = (),
+                                    chunk_size: int = 500, fetch_size: int = 65536) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Load the samples of one type of many endpoints, with one query per chunk_size endpoints.
+    Returns the endpoint ids, timestamps (int64 ns since the epoch) and values of the samples,
+    ordered by endpoint id and timestamp. Samples before any of the endpoint's minimum_timestamp_fields
+    (e.g. convergence_timestamp, clock_step_timestamp) are filtered by the database."""
+    endpoint_ids = sorted(int(endpoint_id) for endpoint_id in endpoint_ids)
+    chunks = []
+    for start in range(0, len(endpoint_ids), chunk_size):
+        chunk_endpoint_ids = endpoint_ids[start:start + chunk_size]
+        query = _query_of_endpoints(len(chunk_endpoint_ids), minimum_timestamp_fields)
+        chunks.append(_fetch_int64_rows(query, [sample_type, *chunk_endpoint_ids], 3, fetch_size))
+
+    data = np.concatenate(chunks) if len(chunks) != 0 else np.empty((0, 3), dtype=np.int64)
+    return (np.ascontiguousarray(data[:, 0]), np.ascontiguousarray(data[:, 1]),
+            np.ascontiguousarray(data[:, 2]))
+
+
+def iter_sample_arrays_of_endpoints(endpoint_ids: Sequence[int], sample_type: Sample.SampleType,
+                                    minimum_timestamp_fields: Sequence[str] = (),
+                                    chunk_size: int = 500, fetch_size: int = 65536) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Like load_sample_arrays_of_endpoints, but streams blocks of at most fetch_size samples from a server-side
+    cursor (on PostgreSQL), so that only one block is held in memory at a time."""
+    endpoint_ids = sorted(int(endpoint_id) for endpoint_id in endpoint_ids)
+    for start in range(0, len(endpoint_ids), chunk_size):
+        chunk_endpoint_ids = endpoint_ids[start:start + chunk_size]
+        query = _query_of_endpoints(len(chunk_endpoint_ids), minimum_timestamp_fields)
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(query, [sample_type, *chunk_endpoint_ids])
+            while rows := cursor.fetchmany(fetch_size):
+                data = np.array(rows, dtype=np.int64)
+                yield (np.ascontiguousarray(data[:, 0]), np.ascontiguousarray(data[:, 1]),
+                       np.ascontiguousarray(data[:, 2]))
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from datetime import timedelta
-from typing import Optional, Union
+from typing import Optional, Union, Tuple, Iterator, Iterable, Callable, List
 
 import numpy as np
 import pandas as pd
@@ -8,12 +8,15 @@ from django.db.models import QuerySet
 from pandas import MultiIndex
 
 from ptp_perf.machine import Machine, Cluster
-from ptp_perf.models import Sample, PTPEndpoint, PTPProfile
+from ptp_perf.models import Sample, PTPEndpoint, PTPProfile, SampleSeries
 from ptp_perf.models.endpoint import TimeNormalizationStrategy
 from ptp_perf.models.endpoint_type import EndpointType
 from ptp_perf.models.exceptions import NoDataError
+from ptp_perf.models.sample_loader import load_sample_arrays_of_endpoints, iter_sample_arrays_of_endpoints
 from ptp_perf.profiles.benchmark import Benchmark
+from ptp_perf.profiles.data_container import timestamp_merge_append
 from ptp_perf.utilities import units
+from ptp_perf.utilities.series_reducers import SeriesReducer
 from ptp_perf.vendor.registry import VendorDB
 from ptp_perf.vendor.vendor import Vendor
 
@@ -35,43 +38,175 @@ class SampleQuery:
     remove_clock_step: bool = True
     normalize_time: TimeNormalizationStrategy = TimeNormalizationStrategy.CONVERGENCE
 
-    timestamp_merge_append: bool = True
+    timestamp_merge_append: bool = False
     timestamp_merge_gap: timedelta = timedelta(seconds=1)
 
-    def run(self, sample_type: Sample.SampleType):
-        endpoints = self.get_endpoint_query().all()
+    def run(self, sample_type: Sample.SampleType) -> pd.Series:
+        """Load the samples of all endpoints matching the query, as a series indexed by (endpoint_id, timestamp).
+        The samples of all endpoints are loaded with a constant number of queries, filtering (convergence,
+        clock step) and time normalization are applied to all endpoints at once."""
+        endpoints = self._load_endpoints()
+        result = self._create_series(endpoints, sample_type, *self._load_arrays(endpoints["id"].to_numpy(), sample_type))
 
-        data = [
-            endpoint.load_samples_to_series(
-                sample_type,
-                converged_only=self.converged_only, remove_clock_step=self.remove_clock_step,
-                normalize_time=self.normalize_time,
-            ) for endpoint in endpoints
-        ]
+        # Cannot use None in data
+        if len(result.index.get_level_values("endpoint_id").unique()) != len(endpoints):
+            raise NoDataError(f"Endpoint in query {self} returned no data for sample type {sample_type}.")
 
-        if len(data) == 0:
-            raise NoDataError("No data found for query.")
+        if self.timestamp_merge_append:
+            # Absolute timestamps are stitched relative to the start of every endpoint's data.
+            timestamp_merge_append(
+                result, "endpoint_id", self.timestamp_merge_gap,
+                align_start=self.normalize_time == TimeNormalizationStrategy.NONE,
+            )
 
-        # Cannot use None in data
-        if any(data_series is None for data_series in data):
+        return result
+
+    def iter_chunks(self, sample_type: Sample.SampleType, chunk_size: Optional[int] = None) -> Iterator[pd.Series]:
+        """Iterate over the samples of the query in chunks, in the same format as run(), so that only one chunk is
+        held in memory at a time. Without chunk_size every chunk holds the samples of one endpoint, otherwise chunks
+        hold up to chunk_size samples (possibly of several endpoints, or part of one).
+        Sample rows are streamed from a server-side cursor. Timestamps are not stitched (timestamp_merge_append).
+        Raises NoDataError after the last chunk if an endpoint returned no data, like run()."""
+        endpoints = self._load_endpoints()
+        endpoint_ids = endpoints["id"].to_numpy()
+        fetch_size = chunk_size if chunk_size is not None else 65536
+
+        packed_endpoint_ids = set(
+            SampleSeries.objects.filter(
+                endpoint_id__in=endpoint_ids.tolist(), sample_type=sample_type
+            ).values_list("endpoint_id", flat=True)
+        )
+
+        def iter_blocks() -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+            for endpoint_id in sorted(packed_endpoint_ids):
+                endpoint_ids_block, timestamps, values = self._load_arrays(np.array([endpoint_id]), sample_type)
+                for start in range(0, len(timestamps), fetch_size):
+                    yield (endpoint_ids_block[start:start + fetch_size], timestamps[start:start + fetch_size],
+                           values[start:start + fetch_size])
+            yield from iter_sample_arrays_of_endpoints(
+                [endpoint_id for endpoint_id in endpoint_ids if endpoint_id not in packed_endpoint_ids], sample_type,
+                self._minimum_timestamp_fields(), fetch_size=fetch_size,
+            )
+
+        blocks = iter_blocks() if chunk_size is not None else self._group_blocks_by_endpoint(iter_blocks())
+        endpoints_with_data = set()
+        for block in blocks:
+            chunk = self._create_series(endpoints, sample_type, *block)
+            if len(chunk) == 0:
+                continue
+            endpoints_with_data.update(chunk.index.get_level_values("endpoint_id").unique())
+            yield chunk
+
+        if len(endpoints_with_data) != len(endpoints):
             raise NoDataError(f"Endpoint in query {self} returned no data for sample type {sample_type}.")
 
-        result = pd.concat(
-            data,
-            keys=[endpoint.id for endpoint in endpoints],
-            names=["endpoint_id"]
+    def reduce(self, sample_type: Sample.SampleType, reducers: Iterable[SeriesReducer],
+               transform: Callable[[pd.Series], pd.Series] = None, chunk_size: Optional[int] = None):
+        """Feed the samples of the query to the reducers chunk by chunk (see iter_chunks), optionally transforming
+        every chunk first (e.g. abs)."""
+        reducers = list(reducers)
+        for chunk in self.iter_chunks(sample_type, chunk_size=chunk_size):
+            if transform is not None:
+                chunk = transform(chunk)
+            for reducer in reducers:
+                reducer.update(chunk)
+
+    @staticmethod
+    def _group_blocks_by_endpoint(blocks: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Regroup blocks ordered by endpoint so that every block contains exactly one endpoint's samples."""
+        pending = []
+        for endpoint_ids, timestamps, values in blocks:
+            boundaries = np.flatnonzero(np.diff(endpoint_ids)) + 1
+            for start, end in zip([0, *boundaries], [*boundaries, len(endpoint_ids)]):
+                if len(pending) != 0 and pending[-1][0][0] != endpoint_ids[start]:
+                    yield tuple(np.concatenate(column) for column in zip(*pending))
+                    pending = []
+                pending.append((endpoint_ids[start:end], timestamps[start:end], values[start:end]))
+        if len(pending) != 0:
+            yield tuple(np.concatenate(column) for column in zip(*pending))
+
+    def _load_endpoints(self) -> pd.DataFrame:
+        """The ids of the endpoints of the query and their reference timestamps, ordered by id."""
+        endpoints = pd.DataFrame.from_records(
+            self.get_endpoint_query().order_by("id").values_list(
+                "id", "convergence_timestamp", "clock_step_timestamp", "profile__start_time"
+            ),
+            columns=["id", TimeNormalizationStrategy.CONVERGENCE, TimeNormalizationStrategy.CLOCK_STEP,
+                     TimeNormalizationStrategy.PROFILE_START],
         )
+        if len(endpoints) == 0:
+            raise NoDataError("No data found for query.")
+        if self.converged_only and endpoints[TimeNormalizationStrategy.CONVERGENCE].isna().any():
+            raise RuntimeError(f"Requested converged data but no convergence time is present on endpoints of query {self}.")
+        if self.remove_clock_step and endpoints[TimeNormalizationStrategy.CLOCK_STEP].isna().any():
+            raise RuntimeError("Requested clock step exclusion but no clock step timestamp is present.")
+        return endpoints
 
-        if self.timestamp_merge_append:
-            next_starting_timestamp = timedelta(seconds=0)
-            for label, group in result.groupby("endpoint_id"):
-                timestamp_index = group.index.get_level_values("timestamp")
-                timestamp_index += next_starting_timestamp
-                # TODO: Actually set the index
-                next_starting_timestamp = timestamp_index.max() + self.timestamp_merge_gap
+    def _create_series(self, endpoints: pd.DataFrame, sample_type: Sample.SampleType,
+                       endpoint_ids: np.ndarray, timestamps: np.ndarray, values: np.ndarray) -> pd.Series:
+        """Filter (convergence, clock step) and normalize the samples of the endpoints in one pass."""
+        # Position of the endpoint of every sample in the endpoints frame.
+        endpoint_positions = np.searchsorted(endpoints["id"].to_numpy(), endpoint_ids)
 
+        def reference_timestamps(column: str) -> np.ndarray:
+            reference = pd.to_datetime(endpoints[column], utc=True)
+            if reference.isna().any():
+                raise RuntimeError(f"Missing {column} timestamp on endpoints of query {self}.")
+            return reference.to_numpy(dtype="datetime64[ns]").view(np.int64)
 
-        return result
+        minimum_timestamps = np.full(len(endpoints), np.iinfo(np.int64).min, dtype=np.int64)
+        if self.converged_only:
+            minimum_timestamps = np.maximum(minimum_timestamps, reference_timestamps(TimeNormalizationStrategy.CONVERGENCE))
+        if self.remove_clock_step:
+            minimum_timestamps = np.maximum(minimum_timestamps, reference_timestamps(TimeNormalizationStrategy.CLOCK_STEP))
+        selected = timestamps >= minimum_timestamps[endpoint_positions]
+        endpoint_ids, timestamps, values, endpoint_positions = (
+            endpoint_ids[selected], timestamps[selected], values[selected], endpoint_positions[selected]
+        )
+
+        if self.normalize_time == TimeNormalizationStrategy.NONE:
+            timestamp_index = pd.DatetimeIndex(timestamps.view("datetime64[ns]"), name="timestamp").tz_localize("UTC")
+        else:
+            origins = reference_timestamps(self.normalize_time)
+            timestamp_index = pd.TimedeltaIndex(
+                (timestamps - origins[endpoint_positions]).view("timedelta64[ns]"), name="timestamp"
+            )
+
+        if sample_type == Sample.SampleType.CLOCK_DIFF or sample_type == Sample.SampleType.PATH_DELAY:
+            values = values * units.NANOSECONDS_TO_SECONDS
+
+        return pd.Series(
+            values,
+            index=MultiIndex.from_arrays([endpoint_ids, timestamp_index], names=["endpoint_id", "timestamp"]),
+            name="value",
+        )
+
+    def _minimum_timestamp_fields(self) -> List[str]:
+        """The endpoint fields before which samples are excluded, so that the database filters the sample rows."""
+        fields = []
+        if self.converged_only:
+            fields.append("convergence_timestamp")
+        if self.remove_clock_step:
+            fields.append("clock_step_timestamp")
+        return fields
+
+    def _load_arrays(self, endpoint_ids: np.ndarray, sample_type: Sample.SampleType) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The endpoint ids, timestamps and values of the samples of the endpoints, ordered by endpoint and timestamp.
+        Compact sample series are preferred, the sample rows of the remaining endpoints are loaded in bulk
+        (only those after convergence and the clock step, see _create_series for the series)."""
+        packed_series = SampleSeries.load_of_endpoints(endpoint_ids, sample_type)
+        row_endpoint_ids = [endpoint_id for endpoint_id in endpoint_ids if endpoint_id not in packed_series]
+        arrays = [load_sample_arrays_of_endpoints(row_endpoint_ids, sample_type, self._minimum_timestamp_fields())]
+        for endpoint_id, (timestamps, values) in packed_series.items():
+            # Series are stored in the order the samples were recorded.
+            order = np.argsort(timestamps, kind="stable")
+            arrays.append((np.full(len(timestamps), endpoint_id, dtype=np.int64), timestamps[order], values[order]))
+
+        endpoint_ids, timestamps, values = (np.concatenate(column) for column in zip(*arrays))
+        if len(packed_series) != 0:
+            order = np.argsort(endpoint_ids, kind="stable")
+            endpoint_ids, timestamps, values = endpoint_ids[order], timestamps[order], values[order]
+        return endpoint_ids, timestamps, values
 
     def get_endpoint_query(self) -> QuerySet[PTPEndpoint]:
         # Don't allow unprocessed or corrupted.
@@ -0,0 +1,155 @@
+import typing
+import zlib
+from typing import Optional, Tuple, Iterable, Dict
+
+import numpy as np
+import pandas as pd
+from django.db import models, transaction
+
+from ptp_perf.models.endpoint import PTPEndpoint
+from ptp_perf.models.sample import Sample
+
+
+def encode_int64_deltas(array: np.ndarray) -> bytes:
+    """Delta-encode an int64 array and compress it. Regularly spaced timestamps and slowly changing values
+    result in small, repetitive deltas that compress well."""
+    array = np.ascontiguousarray(array, dtype=np.int64)
+    deltas = np.diff(array, prepend=np.int64(0))
+    return zlib.compress(deltas.astype('<i8', copy=False).tobytes())
+
+
+def decode_int64_deltas(data: bytes) -> np.ndarray:
+    """Inverse of encode_int64_deltas."""
+    deltas = np.frombuffer(zlib.decompress(data), dtype='<i8')
+    return np.cumsum(deltas, dtype=np.int64)
+
+
+class SampleSeries(models.Model):
+    """
+    A series of samples of one type of a PTP endpoint, stored as compressed, delta-encoded int64 arrays.
+    Timestamps are nanoseconds since the epoch (UTC), values are the same as in Sample.value.
+    Long series may be split into several chunks, numbered consecutively by chunk_index.
+
+    This is the compact equivalent of the Sample rows of an endpoint, which remain the source of the series
+    (see SampleSeries.pack and the pack_samples command).
+    """
+    id = models.AutoField(primary_key=True)
+    endpoint = models.ForeignKey(PTPEndpoint, on_delete=models.CASCADE)
+    sample_type = models.CharField(choices=Sample.SampleType, null=False, max_length=255)
+    chunk_index = models.IntegerField(default=0)
+
+    count = models.IntegerField(null=False)
+    """Number of samples in this chunk."""
+    start_timestamp = models.DateTimeField(null=False)
+    end_timestamp = models.DateTimeField(null=False)
+    timestamps = models.BinaryField(null=False)
+    values = models.BinaryField(null=False)
+
+    default_chunk_size: typing.ClassVar[int] = 1_000_000
+
+    def __str__(self):
+        return f"{self.endpoint_id} {self.sample_type}[{self.chunk_index}]: {self.count} samples"
+
+    def decode(self) -> Tuple[np.ndarray, np.ndarray]:
+        return decode_int64_deltas(self.timestamps), decode_int64_deltas(self.values)
+
+    @classmethod
+    def store(cls, endpoint: PTPEndpoint, sample_type: Sample.SampleType,
+              timestamps: np.ndarray, values: np.ndarray, chunk_size: Optional[int] = None) -> int:
+        """Replace the series of sample_type of the endpoint with the timestamps (int64 ns since the epoch)
+        and values. Returns the number of chunks saved."""
+        if len(timestamps) != len(values):
+            raise ValueError(f"Received {len(timestamps)} timestamps but {len(values)} values.")
+        chunk_size = chunk_size if chunk_size is not None else cls.default_chunk_size
+
+        chunks = []
+        for chunk_index, start in enumerate(range(0, len(timestamps), chunk_size)):
+            chunk_timestamps = timestamps[start:start + chunk_size]
+            chunks.append(
+                SampleSeries(
+                    endpoint=endpoint, sample_type=sample_type, chunk_index=chunk_index,
+                    count=len(chunk_timestamps),
+                    start_timestamp=pd.Timestamp(chunk_timestamps.min(), tz="UTC").to_pydatetime(),
+                    end_timestamp=pd.Timestamp(chunk_timestamps.max(), tz="UTC").to_pydatetime(),
+                    timestamps=encode_int64_deltas(chunk_timestamps),
+                    values=encode_int64_deltas(values[start:start + chunk_size]),
+                )
+            )
+
+        with transaction.atomic():
+            SampleSeries.objects.filter(endpoint=endpoint, sample_type=sample_type).delete()
+            SampleSeries.objects.bulk_create(chunks)
+        return len(chunks)
+
+    @classmethod
+    def load(cls, endpoint: PTPEndpoint, sample_type: Sample.SampleType) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """The timestamps (int64 ns since the epoch) and values of the series, None if it was not stored."""
+        return cls.load_by_type(endpoint, [sample_type]).get(sample_type)
+
+    @classmethod
+    def load_by_type(cls, endpoint: PTPEndpoint,
+                     sample_types: Iterable[Sample.SampleType]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Load the series of several sample types in one query. Types without a stored series are omitted."""
+        return cls._decode_chunks(
+            SampleSeries.objects.filter(endpoint=endpoint, sample_type__in=list(sample_types)),
+            key=lambda chunk: chunk.sample_type,
+        )
+
+    @classmethod
+    def load_of_endpoints(cls, endpoint_ids: Iterable[int],
+                          sample_type: Sample.SampleType) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """Load the series of one sample type of several endpoints in one query, by endpoint id.
+        Endpoints without a stored series are omitted."""
+        return cls._decode_chunks(
+            SampleSeries.objects.filter(endpoint_id__in=[int(endpoint_id) for endpoint_id in endpoint_ids], sample_type=sample_type),
+            key=lambda chunk: chunk.endpoint_id,
+        )
+
+    @staticmethod
+    def _decode_chunks(query, key) -> Dict:
+        chunks_by_key = {}
+        for chunk in query.order_by("endpoint_id", "sample_type", "chunk_index"):
+            chunks_by_key.setdefault(key(chunk), []).append(chunk.decode())
+
+        result = {}
+        for chunk_key, chunks in chunks_by_key.items():
+            if len(chunks) == 1:
+                result[chunk_key] = chunks[0]
+            else:
+                result[chunk_key] = (
+                    np.concatenate([chunk[0] for chunk in chunks]), np.concatenate([chunk[1] for chunk in chunks])
+                )
+        return result
+
+    @classmethod
+    def pack(cls, endpoint: PTPEndpoint, sample_type: Sample.SampleType, chunk_size: Optional[int] = None) -> int:
+        """Store the Sample rows of sample_type of the endpoint as a series. Returns the number of samples packed.
+        The samples keep the order in which they were recorded, so that analysis still detects time rewinds.
+        If there are no rows (e.g. because they were deleted after packing), an existing series is kept."""
+        rows = endpoint.sample_set.filter(sample_type=sample_type).order_by("id").values_list(
+            "timestamp", "value"
+        )
+        frame = pd.DataFrame.from_records(rows.iterator(chunk_size=10000), columns=["timestamp", "value"])
+        if frame.empty:
+            return 0
+        timestamps = pd.to_datetime(frame["timestamp"], utc=True).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        cls.store(endpoint, sample_type, timestamps, frame["value"].to_numpy(dtype=np.int64), chunk_size)
+        return len(frame)
+
+    @classmethod
+    def count_samples(cls, endpoint: PTPEndpoint) -> int:
+        return SampleSeries.objects.filter(endpoint=endpoint).aggregate(total=models.Sum("count"))["total"] or 0
+
+    @staticmethod
+    def to_series(timestamps: np.ndarray, values: np.ndarray) -> pd.Series:
+        """Wrap decoded arrays in a series indexed by timezone aware timestamps, without copying the data."""
+        index = pd.DatetimeIndex(timestamps.view("datetime64[ns]"), name="timestamp").tz_localize("UTC")
+        return pd.Series(values, index=index, name="value", copy=False)
+
+    class Meta:
+        app_label = 'app'
+        constraints = [
+            models.UniqueConstraint(
+                fields=["endpoint", "sample_type", "chunk_index"], name="unique_sample_series_chunk"
+            ),
+        ]
@@ -0,0 +1,77 @@
+from typing import Dict, Iterable
+
+from django.db import models, transaction
+
+from ptp_perf.models.endpoint import PTPEndpoint
+from ptp_perf.models.sample import Sample
+from ptp_perf.utilities.quantile_sketch import QuantileSketch
+
+
+class SampleSketch(models.Model):
+    """
+    A quantile sketch of the converged samples of one type of a PTP endpoint, created by
+    PTPEndpoint.process_timeseries_data. The sketches of several endpoints are merged to summarize a benchmark
+    without loading the samples (see BenchmarkSummary.create).
+
+    Values are in seconds. CLOCK_DIFF sketches hold the absolute clock difference, PATH_DELAY sketches the path delay.
+    """
+    id = models.AutoField(primary_key=True)
+    endpoint = models.ForeignKey(PTPEndpoint, on_delete=models.CASCADE)
+    sample_type = models.CharField(choices=Sample.SampleType, null=False, max_length=255)
+
+    count = models.IntegerField(null=False)
+    """Number of samples in the sketch."""
+    relative_accuracy = models.FloatField(null=False)
+    data = models.BinaryField(null=False)
+    """The serialized QuantileSketch."""
+
+    def __str__(self):
+        return f"{self.endpoint_id} {self.sample_type}: {self.count} samples (relative accuracy {self.relative_accuracy})"
+
+    def decode(self) -> QuantileSketch:
+        return QuantileSketch.from_bytes(self.data)
+
+    @classmethod
+    def store(cls, endpoint: PTPEndpoint, sample_type: Sample.SampleType, sketch: QuantileSketch) -> "SampleSketch":
+        """Replace the sketch of sample_type of the endpoint."""
+        instance, _ = SampleSketch.objects.update_or_create(
+            endpoint=endpoint, sample_type=sample_type,
+            defaults=dict(count=sketch.count, relative_accuracy=sketch.relative_accuracy, data=sketch.to_bytes()),
+        )
+        return instance
+
+    @classmethod
+    def store_many(cls, endpoints: Iterable[PTPEndpoint]):
+        """Replace the sketches of the endpoints with the ones computed by PTPEndpoint.process_timeseries_data."""
+        sample_sketches = [
+            SampleSketch(
+                endpoint=endpoint, sample_type=sample_type,
+                count=sketch.count, relative_accuracy=sketch.relative_accuracy, data=sketch.to_bytes(),
+            )
+            for endpoint in endpoints for sample_type, sketch in getattr(endpoint, "_pending_sketches", {}).items()
+        ]
+        if len(sample_sketches) == 0:
+            return
+        with transaction.atomic():
+            SampleSketch.objects.filter(
+                endpoint_id__in={sample_sketch.endpoint_id for sample_sketch in sample_sketches},
+                sample_type__in={sample_sketch.sample_type for sample_sketch in sample_sketches},
+            ).delete()
+            SampleSketch.objects.bulk_create(sample_sketches)
+
+    @classmethod
+    def load_of_endpoints(cls, endpoint_ids: Iterable[int], sample_type: Sample.SampleType) -> Dict[int, QuantileSketch]:
+        """Load the sketches of one sample type of several endpoints in one query, by endpoint id.
+        Endpoints without a sketch are omitted."""
+        return {
+            sample_sketch.endpoint_id: sample_sketch.decode()
+            for sample_sketch in SampleSketch.objects.filter(
+                endpoint_id__in=[int(endpoint_id) for endpoint_id in endpoint_ids], sample_type=sample_type
+            )
+        }
+
+    class Meta:
+        app_label = 'app'
+        constraints = [
+            models.UniqueConstraint(fields=["endpoint", "sample_type"], name="unique_sample_sketch"),
+        ]
@@ -64,7 +64,7 @@ async def do_benchmark(configuration: Configuration, benchmark: Benchmark, vendo
                     "-o", "ServerAliveInterval=2", "-o", "ServerAliveCountMax=5",
                     "-o", "ConnectTimeout=5", "-o", "ConnectionAttempts=1"
                 ],
-            )
+            ).capture_bounded()
             controller.add_coroutine(
                 machine._ssh_session.run(), label=f"Orchestrator remote session {machine_endpoint.machine_id}"
             )
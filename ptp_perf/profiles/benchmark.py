@@ -95,6 +95,14 @@ class Benchmark:
 
     monitor_resource_consumption: bool = False
     """Capture system resource metrics during the benchmark run."""
+    monitor_resource_consumption_interval: timedelta = timedelta(seconds=1)
+    """The interval at which resource metrics are captured."""
+    monitor_resource_consumption_sampler: Literal["proc", "psutil"] = "proc"
+    """How resource metrics are captured: 'proc' reads /proc directly with low overhead, 'psutil' uses psutil."""
+    monitor_resource_consumption_smaps_interval: timedelta = timedelta(seconds=10)
+    """The interval at which the expensive USS/PSS memory metrics are captured by the 'proc' sampler."""
+    monitor_resource_consumption_json: bool = False
+    """Additionally log full psutil snapshots as JSON log records during the benchmark run, for debugging."""
 
     @property
     def storage_base_path(self) -> Path:
@@ -1,38 +1,79 @@
-from dataclasses import dataclass, field
+import hashlib
+from dataclasses import dataclass
 from pathlib import Path
-from typing import TypeVar, ClassVar, Dict, Any, Optional, Self
+from typing import TypeVar, ClassVar, Dict, Any, Optional, Self, Iterable, Union
+
+import numpy as np
+from pydantic import TypeAdapter
 
 from ptp_perf.constants import LOCAL_DIR
-from ptp_perf.utilities.pydantic import pydantic_save_model, pydantic_load_model
+from ptp_perf.utilities.cache_store import CacheStore, CacheStatistics
 
 T = TypeVar("T")
 
+
+def fingerprint(*parts: Union[str, bytes, memoryview, np.ndarray]) -> str:
+    """A cheap content hash of strings, buffers or arrays, to be used as (part of) a cache key.
+    Buffers and contiguous arrays (e.g. memory maps) are hashed in place, without copying them."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        elif isinstance(part, np.ndarray):
+            digest.update(str(part.dtype).encode())
+            part = np.ascontiguousarray(part).reshape(-1).view(np.uint8)
+        part = memoryview(part).cast("B")
+        digest.update(part.nbytes.to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
 @dataclass
 class DataCache:
-    cache: Optional[Dict[str, Any]] = field(default_factory=dict)
-    cache_location: ClassVar[str] = None
+    """A persistent cache of values by key, stored entry by entry in a CacheStore.
+    Subclasses share the store at cache_location, each in its own namespace (the class name by default).
+    Values are serialized with pydantic as value_type, increase version when it changes."""
+    cache_location: ClassVar[Path] = LOCAL_DIR.joinpath("data_cache.sqlite3")
+    namespace: ClassVar[Optional[str]] = None
+    version: ClassVar[int] = 1
+    value_type: ClassVar[Any] = Any
+    max_size: ClassVar[Optional[int]] = 256 * 1024 ** 2
+    """The maximum size of the serialized values in bytes, the least recently used entries are evicted beyond it."""
     singleton: ClassVar[Optional[Self]] = None
 
+    def __post_init__(self):
+        self.store = CacheStore(
+            self.cache_location, namespace=self.namespace or type(self).__name__,
+            version=self.version, max_size=self.max_size,
+        )
+        self._adapter = TypeAdapter(self.value_type)
+
     @classmethod
     def resolve(cls) -> Self:
         if cls.singleton is None:
-            if Path(cls.cache_location).exists():
-                cls.singleton = pydantic_load_model(cls, cls.cache_location)
-            else:
-                cls.singleton = cls()
+            cls.singleton = cls()
         return cls.singleton
 
+    @property
+    def statistics(self) -> CacheStatistics:
+        return self.store.statistics
+
     def get(self, key: str) -> T:
-        return self.cache[key]
+        value = self.store.get(key)
+        if value is None:
+            raise KeyError(key)
+        return self._adapter.validate_json(value)
 
-    def update(self, key: str, value: T):
-        self.cache[key] = value
-        pydantic_save_model(type(self), self, self.cache_location)
+    def get_many(self, keys: Iterable[str]) -> Dict[str, T]:
+        """The values of the keys that are cached."""
+        return {key: self._adapter.validate_json(value) for key, value in self.store.get_many(keys).items()}
 
-    def purge(self):
-        self.cache.clear()
-        Path(self.cache_location).unlink(missing_ok=True)
+    def update(self, key: str, value: T):
+        self.update_many({key: value})
 
+    def update_many(self, entries: Dict[str, T]):
+        """Insert several entries in one transaction."""
+        self.store.put_many({key: self._adapter.dump_json(value) for key, value in entries.items()})
 
-class SummaryStatisticCache(DataCache):
-    cache_location = LOCAL_DIR.joinpath("summary_statistic_cache.json")
+    def purge(self):
+        self.store.clear()
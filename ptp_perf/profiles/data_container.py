@@ -1,11 +1,11 @@
-import hashlib
 import io
 import logging
 import math
 import typing
 from dataclasses import dataclass
 from datetime import timedelta
-from typing import Iterable, Any, Optional, Dict, List
+from pathlib import Path
+from typing import Iterable, Any, Optional, Dict, List, Sequence, Union
 
 import matplotlib.pyplot as plt
 import matplotlib.ticker
@@ -14,8 +14,11 @@ import pandas as pd
 from pandas.core.dtypes.common import is_numeric_dtype, is_timedelta64_ns_dtype
 from pandas.core.dtypes.inference import is_number
 
-from ptp_perf.profiles.data_cache import SummaryStatisticCache
+from ptp_perf.profiles.data_cache import DataCache, fingerprint
+from ptp_perf.profiles.quantile_confidence import ConfidenceIntervalMethod, QuantileConfidenceRequest, \
+    compute_confidence_intervals
 from ptp_perf.util import unpack_one_value, TimerUtil
+from ptp_perf.utilities import columnar
 
 if typing.TYPE_CHECKING:
     from ptp_perf.profiles.analysis import DetectedClockConvergence
@@ -46,26 +49,27 @@ class BootstrapMetric:
         return formatter.format_data(self.value)
 
     @staticmethod
-    def create(data: pd.Series, quantile: float, abs: bool = False):
-        import scipy
-        if abs:
-            data = data.abs()
-
-        bootstrap_result = scipy.stats.bootstrap(
-            # Samples must be in a sequence, this isn't clear from the documentation
-            # https://docs.scipy.org/doc/scipy/reference/generated/scipy.stats.bootstrap.html
-            (data,),
-            lambda sample, axis: np.quantile(sample, quantile, axis=axis),
-            random_state=np.random.default_rng(0), vectorized=True,
-            # Try to stay within 10M values processed per batch to limit memory consumption
-            batch=max(10 * (1024 ** 2) // len(data), 1),
-            # method='basic',
-        )
-        return BootstrapMetric(
-            value=data.quantile(quantile),
-            confidence_interval_lower=bootstrap_result.confidence_interval.low,
-            confidence_interval_upper=bootstrap_result.confidence_interval.high
-        )
+    def create(data: pd.Series, quantile: float, abs: bool = False,
+               method: ConfidenceIntervalMethod = ConfidenceIntervalMethod.SCIPY_BOOTSTRAP, use_cache: bool = False):
+        return BootstrapMetric.create_many([data], [quantile], abs=abs, method=method, use_cache=use_cache)[0]
+
+    @staticmethod
+    def create_many(data: Sequence[pd.Series], quantiles: Sequence[float], abs: bool = False,
+                    method: ConfidenceIntervalMethod = ConfidenceIntervalMethod.SCIPY_BOOTSTRAP,
+                    jobs: int = 1, use_cache: bool = False) -> List["BootstrapMetric"]:
+        """Create the metrics of several series (each with its quantile) at once, see compute_confidence_intervals.
+        Missing values are skipped, like in Series.quantile."""
+        requests = [
+            QuantileConfidenceRequest(
+                values=(series.dropna().abs() if abs else series.dropna()).to_numpy(dtype=np.float64),
+                quantile=quantile, method=method,
+            )
+            for series, quantile in zip(data, quantiles, strict=True)
+        ]
+        return [
+            BootstrapMetric(value=value, confidence_interval_lower=lower, confidence_interval_upper=upper)
+            for value, lower, upper in compute_confidence_intervals(requests, jobs=jobs, use_cache=use_cache)
+        ]
 
     @property
     def relative_magnitude(self) -> float:
@@ -106,6 +110,11 @@ class SummaryStatistics:
         )
 
 
+class SummaryStatisticCache(DataCache):
+    """Summary statistics by fingerprint of the serialized series (see Timeseries.summarize)."""
+    value_type = SummaryStatistics
+
+
 @dataclass
 class ConvergenceStatistics:
     convergence_time: timedelta
@@ -163,19 +172,60 @@ def non_timestamp_index(df: pd.DataFrame) -> List[str]:
     return [name for name in df.index.names if name != COLUMN_TIMESTAMP_INDEX]
 
 
+PandasData = typing.TypeVar("PandasData", pd.Series, pd.DataFrame)
+
+
+def timestamp_merge_append(data: PandasData, group_level: str, gap: timedelta = timedelta(seconds=1),
+                           align_start: bool = False) -> PandasData:
+    """Stitch the groups of the index level group_level one after another on the timestamp level, in order of
+    their first appearance: every group is shifted so that it starts gap after the end of the previous group.
+    With align_start, groups are first moved to start at zero (datetimes become timedeltas), otherwise their
+    timestamps are taken as offsets from zero (e.g. normalized timedeltas), except that groups with negative
+    timestamps (e.g. samples before convergence) are moved to start at zero so that they do not overlap.
+    The timestamp level of data is replaced in place (the data itself is not copied), data is returned."""
+    index = data.index
+    timestamp_values = index.get_level_values(COLUMN_TIMESTAMP_INDEX)
+    if not align_start and not isinstance(timestamp_values, pd.TimedeltaIndex):
+        raise ValueError(f"Cannot stitch timestamps of type {timestamp_values.dtype} without align_start.")
+    timestamps = timestamp_values.as_unit("ns").asi8
+    group_codes, _ = pd.factorize(index.get_level_values(group_level))
+
+    group_bounds = pd.Series(timestamps).groupby(group_codes).agg(["min", "max"])
+    group_base = group_bounds["min"].to_numpy()
+    if not align_start:
+        group_base = np.minimum(group_base, 0)
+    group_length = group_bounds["max"].to_numpy() - group_base + pd.Timedelta(gap).value
+    # Start of every group: the sum of the lengths of the preceding groups.
+    group_start = np.concatenate(([0], np.cumsum(group_length[:-1])))
+
+    shifted = timestamps + (group_start - group_base)[group_codes]
+    shifted_values = pd.TimedeltaIndex(shifted.view("timedelta64[ns]"), name=COLUMN_TIMESTAMP_INDEX)
+
+    data.index = pd.MultiIndex.from_arrays(
+        [shifted_values if name == COLUMN_TIMESTAMP_INDEX else index.get_level_values(name) for name in index.names],
+        names=index.names,
+    )
+    return data
+
+
 @dataclass
 class Timeseries:
-    data: str
+    data: Union[bytes, np.ndarray, str, None] = None
+    """The serialized frame: a columnar frame (see ptp_perf.utilities.columnar), possibly memory mapped from a file,
+    or pandas table JSON. None if the series was created from a frame, which is only serialized on demand."""
     # This field doesn't have a type annotation so that pydantic will not pick it up.
     _data_frame = None
 
     @property
     def data_frame(self):
         if self._data_frame is None:
-            read_frame = pd.read_json(io.StringIO(self.data), convert_dates=True, orient='table')
-            Timeseries.convert_data_frame_index_type(
-                read_frame, COLUMN_TIMESTAMP_INDEX, "timedelta64[ns]",
-            )
+            if isinstance(self.data, str):
+                read_frame = pd.read_json(io.StringIO(self.data), convert_dates=True, orient='table')
+                Timeseries.convert_data_frame_index_type(
+                    read_frame, COLUMN_TIMESTAMP_INDEX, "timedelta64[ns]",
+                )
+            else:
+                read_frame = columnar.decode_frame(self.data)
             self.validate(read_frame)
 
             self._data_frame = read_frame
@@ -200,13 +250,31 @@ class Timeseries:
         return self.data_frame[COLUMN_SOURCE]
 
     @classmethod
-    def from_series(cls, frame: pd.DataFrame):
-        return cls(cls._serialize_frame(frame))
+    def from_series(cls, frame: pd.DataFrame, copy: bool = True):
+        """Create a series from the frame without serializing it.
+        Without copy, the series takes ownership of the frame (e.g. a frame that was just computed)."""
+        Timeseries._validate_frame(frame)
+        series = cls()
+        series._data_frame = frame.copy() if copy else frame
+        return series
 
-    @staticmethod
-    def _serialize_frame(result_frame):
-        serialization_frame: pd.DataFrame = result_frame.copy()
-        Timeseries._validate_frame(result_frame)
+    @classmethod
+    def load(cls, path: Path):
+        """Load a series saved with save, the file is memory mapped and the frame is only decoded on first access."""
+        return cls(columnar.map_file(path))
+
+    def save(self, path: Path, compress: bool = False):
+        path.write_bytes(self.to_bytes(compress=compress))
+
+    def to_bytes(self, compress: bool = False) -> columnar.Buffer:
+        """The frame as columnar frame. The serialized data is reused if it already has that format, memory mapped
+        data is returned as a memoryview instead of being copied."""
+        if self.data is not None and not isinstance(self.data, str) and columnar.is_compressed(self.data) == compress:
+            return self.data if isinstance(self.data, bytes) else memoryview(self.data)
+        return columnar.encode_frame(self.data_frame, compress=compress)
+
+    def to_json(self) -> str:
+        serialization_frame: pd.DataFrame = self.data_frame.copy()
 
         # Convert index type cause pandas cannot read iso timedeltas.
         Timeseries.convert_data_frame_index_type(serialization_frame, COLUMN_TIMESTAMP_INDEX, "int64")
@@ -309,7 +377,8 @@ class Timeseries:
         clock_diff = self.get_clock_diff(abs=True)
         path_delay = self.path_delay
 
-        data_hash = hashlib.md5(self.data.encode()).hexdigest()
+        # The serialized data is hashed as is (without decoding or copying it), only unserialized frames are encoded.
+        data_hash = fingerprint(self.data if self.data is not None else self.to_bytes())
         cache = SummaryStatisticCache.resolve()
 
         try:
@@ -318,7 +387,7 @@ class Timeseries:
             with TimerUtil("recalculating bootstrap metrics"):
                 statistics = SummaryStatistics(
                     clock_diff_median=BootstrapMetric.create(clock_diff, 0.5),
-                    clock_diff_p99=BootstrapMetric.create(clock_diff, 0.95),
+                    clock_diff_p95=BootstrapMetric.create(clock_diff, 0.95),
                     path_delay_median=BootstrapMetric.create(path_delay, 0.5),
                 )
 
@@ -367,7 +436,7 @@ class Timeseries:
         ], inplace=True)
         new_data.sort_index(inplace=True)
 
-        return Timeseries.from_series(new_data)
+        return Timeseries.from_series(new_data, copy=False)
 
 
     @property
@@ -378,7 +447,8 @@ class Timeseries:
         return f"Timeseries:\n{self.data_frame}"
 
     def memory_usage(self):
-        return len(self.data) + (self._data_frame.memory_usage(deep=True).sum() if self.data_frame is not None else 0)
+        return ((len(self.data) if self.data is not None else 0)
+                + (self._data_frame.memory_usage(deep=True).sum() if self._data_frame is not None else 0))
 
 class MergedTimeSeries(Timeseries):
 
@@ -386,22 +456,24 @@ class MergedTimeSeries(Timeseries):
     def merge_series(original_series: Iterable[Timeseries], labels: Iterable[Any],
                      timestamp_align: bool = False) -> "MergedTimeSeries":
         """Timestamp align: We modify all timestamps so that profiles are immediately adjacent to each other (stitched)."""
-        frames = []
-
-        start_timestamp = timedelta(seconds=0)
-
-        for series, label in zip(original_series, labels):
-            frame: pd.DataFrame = series.data_frame.copy()
-            frame[COLUMN_SOURCE] = label
-
-            if timestamp_align:
-                minimum_timestamp = frame.index.min()
-                frame.index += start_timestamp - minimum_timestamp
-
-                start_timestamp = frame.index.max() + timedelta(seconds=1)
-
-            frames.append(frame)
+        return MergedTimeSeries.from_series(
+            MergedTimeSeries.merge_frames(
+                [series.data_frame for series in original_series], labels, timestamp_align=timestamp_align
+            ),
+            copy=False,
+        )
 
-        merged_frame = pd.concat(frames)
+    @staticmethod
+    def merge_frames(frames: Iterable[pd.DataFrame], labels: Iterable[Any],
+                     timestamp_align: bool = False) -> pd.DataFrame:
+        """Merge frames indexed by timestamp into one frame, with the label of every row in the source column."""
+        frames = list(frames)
+        merged_frame = pd.concat(frames, keys=range(len(frames)), names=[COLUMN_SOURCE])
+        if timestamp_align:
+            timestamp_merge_append(merged_frame, COLUMN_SOURCE, align_start=True)
+
+        sources = merged_frame.index.get_level_values(COLUMN_SOURCE).to_numpy()
+        merged_frame = merged_frame.droplevel(COLUMN_SOURCE)
+        merged_frame[COLUMN_SOURCE] = np.asarray(list(labels), dtype=object)[sources]
         assert merged_frame.index.is_unique
-        return MergedTimeSeries.from_series(merged_frame)
+        return merged_frame
@@ -0,0 +1,276 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ptp_perf.utilities import units
+from ptp_perf.utilities.quantile_sketch import QuantileSketch
+
+QUANTILES = [0.5, 0.05, 0.95]
+"""Order of the quantiles of a window: median, p05, p95."""
+
+Quantiles = Tuple[float, float, float]
+NO_QUANTILES: Quantiles = (np.nan, np.nan, np.nan)
+
+
+def timedelta_ns(duration: timedelta) -> int:
+    return (duration.days * 86400 + duration.seconds) * units.NANOSECONDS_IN_SECOND + duration.microseconds * 1000
+
+
+@dataclass
+class FaultAnalysis:
+    """Statistics around a fault. Timestamps and durations are int64 ns, values in seconds.
+    The post fault statistics are None if there is no data after the fault."""
+    clock_diff_pre: Quantiles = NO_QUANTILES
+    path_delay_pre: Quantiles = NO_QUANTILES
+    clock_diff_post: Optional[Quantiles] = None
+    path_delay_post: Optional[Quantiles] = None
+
+    actual_duration: Optional[int] = None
+    ratio_clock_diff_median: Optional[float] = None
+    ratio_clock_diff_p95: Optional[float] = None
+    clock_diff_post_max: Optional[float] = None
+    ratio_clock_diff_post_max_pre_median: Optional[float] = None
+    clock_diff_return_to_normal_time: Optional[int] = None
+    clock_diff_mid_max: Optional[float] = None
+
+
+@dataclass
+class EndpointAnalysis:
+    """The result of analyze_endpoint, persisted by PTPEndpoint.process_timeseries_data.
+    Timestamps are int64 ns since the epoch, durations int64 ns and values in seconds."""
+    missing_samples_count: float
+    missing_samples_percent: float
+
+    clock_step_timestamp: int
+    clock_step_magnitude: float
+    analyzed_start: int
+    """The first timestamp after the clock step."""
+    analyzed_end: int
+    """The last timestamp of the clock difference."""
+
+    convergence_timestamp: Optional[int] = None
+    """None if the clock never converged, in which case there are no further statistics."""
+    convergence_duration: Optional[int] = None
+    convergence_max_offset: Optional[float] = None
+    convergence_rate: Optional[float] = None
+    converged_percentage: Optional[float] = None
+    converged_samples: Optional[int] = None
+
+    clock_diff: Quantiles = NO_QUANTILES
+    path_delay: Quantiles = NO_QUANTILES
+    path_delay_std: float = np.nan
+    clock_diff_sketch: QuantileSketch = field(default_factory=QuantileSketch)
+    path_delay_sketch: QuantileSketch = field(default_factory=QuantileSketch)
+
+    fault: Optional[FaultAnalysis] = None
+
+
+def calculate_quantiles(values: np.ndarray) -> Quantiles:
+    """Median, p05 and p95 (linear interpolation, like pandas) with a single partition of the values.
+    The values are partitioned in place, so pass a copy if the order matters. NaN if there are no values."""
+    if len(values) == 0:
+        return NO_QUANTILES
+    median, p05, p95 = np.quantile(values, QUANTILES, overwrite_input=True)
+    return median, p05, p95
+
+
+def _warn_time_jumps(deltas: np.ndarray, num_samples: int, maximum_allowable_time_jump: int):
+    """The warnings of Timeseries._validate_series, from precomputed timestamp differences."""
+    time_jumps = deltas[deltas >= maximum_allowable_time_jump]
+    if len(time_jumps) != 0:
+        logging.warning(f"Timeseries contains {len(time_jumps)} holes "
+                        f"(largest hole: {timedelta(microseconds=time_jumps.max() / 1000)}, "
+                        f"total: {timedelta(microseconds=time_jumps.sum() / 1000)} = {100 * time_jumps.sum() / deltas.sum():.0f}%)")
+    if num_samples < 600:
+        logging.warning(f"Timeseries contains too few data points: {num_samples}")
+
+
+def _detect_clock_step(timestamps: np.ndarray, values: np.ndarray,
+                       max_permissible_clock_steps: Optional[int]) -> Tuple[int, float]:
+    """See analysis.detect_clock_step."""
+    first_difference = np.abs(np.diff(values))
+    clock_step_positions = np.flatnonzero(first_difference >= 1)
+    if max_permissible_clock_steps is not None and len(clock_step_positions) > max_permissible_clock_steps:
+        raise RuntimeError(f"Found more than one clock step in timeseries profile: "
+                           f"{list(zip(timestamps[clock_step_positions + 1], first_difference[clock_step_positions]))}")
+    if len(clock_step_positions) == 0:
+        logging.warning(f"No clock step found in profile of length {len(values)}.")
+        # Just set it close to the benchmark starting time.
+        return timestamps[0] - units.NANOSECONDS_IN_SECOND, 0
+
+    clock_step_timestamp = timestamps[clock_step_positions[0] + 1]
+    clock_step_magnitude = first_difference[clock_step_positions[0]]
+    if not (50 <= clock_step_magnitude <= 70):
+        logging.warning(f"The clock step was not of a magnitude close to 1 minute: {clock_step_magnitude}")
+    if clock_step_timestamp - timestamps[0] >= 2 * 60 * units.NANOSECONDS_IN_SECOND:
+        logging.warning(f"The clock step was not within the first 2 minutes of runtime: {clock_step_timestamp}")
+    return clock_step_timestamp, clock_step_magnitude
+
+
+def _detect_converged(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """See analysis.detect_clock_convergence. Returns the positions of the sign changes
+    and whether each sample is in converged state (at least 3 sign flips within the last 15 samples)."""
+    window_size = 15
+    sign_changes = np.abs(np.diff(np.sign(values))) / 2
+    # Window sums from the cumulative sum are exact, the sign changes are multiples of 0.5.
+    cumulative_sign_changes = np.concatenate(([0], np.cumsum(sign_changes)))
+    converged = np.zeros(len(values), dtype=bool)
+    if len(values) > window_size:
+        converged[window_size:] = (cumulative_sign_changes[window_size:] - cumulative_sign_changes[:-window_size]) > 3
+    return np.flatnonzero(sign_changes > 0) + 1, converged
+
+
+def _return_to_normal_position(values: np.ndarray, threshold: float) -> Optional[int]:
+    """The first position at which the rolling median of 5 values is below the threshold."""
+    if len(values) < 5:
+        return None
+    rolling_median = np.median(np.lib.stride_tricks.sliding_window_view(values, 5), axis=1)
+    positions = np.flatnonzero(rolling_median < threshold)
+    return positions[0] + 4 if len(positions) != 0 else None
+
+
+def analyze_fault(timestamps: np.ndarray, abs_clock_diff: np.ndarray,
+                  path_delay_timestamps: np.ndarray, path_delay_values: np.ndarray,
+                  fault_start: int, fault_end: int) -> FaultAnalysis:
+    """Statistics before, during and after the fault from the converged, sorted samples."""
+    result = FaultAnalysis()
+    pre_end = np.searchsorted(timestamps, fault_start, side='right')
+    mid_start = pre_end
+    mid_end = np.searchsorted(timestamps, fault_end, side='left')
+    post_start = mid_end
+
+    result.clock_diff_pre = calculate_quantiles(abs_clock_diff[:pre_end].copy())
+    result.path_delay_pre = calculate_quantiles(
+        path_delay_values[:np.searchsorted(path_delay_timestamps, fault_start, side='right')].copy()
+    )
+
+    post_fault = abs_clock_diff[post_start:]
+    if len(post_fault) != 0:
+        result.clock_diff_post = calculate_quantiles(post_fault.copy())
+        result.path_delay_post = calculate_quantiles(
+            path_delay_values[np.searchsorted(path_delay_timestamps, fault_end, side='left'):].copy()
+        )
+        pre_median, _, pre_p95 = result.clock_diff_pre
+        post_median, _, post_p95 = result.clock_diff_post
+
+        if pre_end != 0:
+            result.actual_duration = timestamps[post_start] - timestamps[pre_end - 1]
+        result.ratio_clock_diff_median = post_median / pre_median
+        result.ratio_clock_diff_p95 = post_p95 / pre_p95
+        result.clock_diff_post_max = post_fault.max()
+        result.ratio_clock_diff_post_max_pre_median = result.clock_diff_post_max / pre_median
+
+        # Calculate how long it takes to return to normal (within 2x of pre-fault median)
+        return_position = _return_to_normal_position(post_fault, 2 * pre_median)
+        if return_position is not None:
+            result.clock_diff_return_to_normal_time = timestamps[post_start + return_position] - fault_end
+
+    if mid_end > mid_start:
+        result.clock_diff_mid_max = abs_clock_diff[mid_start:mid_end].max()
+    return result
+
+
+def analyze_endpoint(timestamps: np.ndarray, clock_diff: np.ndarray,
+                     path_delay_timestamps: np.ndarray, path_delay: np.ndarray,
+                     sync_interval_seconds: float, duration: timedelta,
+                     max_permissible_clock_steps: Optional[int] = 1,
+                     fault_interval: Optional[Tuple[int, int]] = None,
+                     minimum_convergence_time: timedelta = timedelta(seconds=10)) -> EndpointAnalysis:
+    """Detect the clock step and convergence of an endpoint and compute its statistics in one pass over the arrays.
+
+    The clock difference timestamps (int64 ns) must be strictly increasing, the values are in seconds (float64).
+    Path delay samples may be in any order. All time windows are cut with searchsorted on the sorted timestamps,
+    the differences between timestamps are computed once. The fault interval (int64 ns) is optional.
+    Raises RuntimeError if the data cannot be analyzed (e.g. too many clock steps or only zeros)."""
+    deltas = np.diff(timestamps)
+    _warn_time_jumps(deltas, len(timestamps), timedelta_ns(timedelta(minutes=1, seconds=10)))
+
+    # First: calculate missing data ratios
+    # Maximum gap: 3x the target sync interval.
+    maximum_allowable_time_jump = timedelta_ns(timedelta(seconds=sync_interval_seconds * 3))
+    total_time_missing = deltas[deltas >= maximum_allowable_time_jump].sum() / units.NANOSECONDS_IN_SECOND
+    missing_samples_count = total_time_missing / sync_interval_seconds
+    missing_samples_percent = total_time_missing / duration.total_seconds()
+
+    # Remove any leading zero values (no clock_difference information yet)
+    non_zero_positions = np.flatnonzero(clock_diff != 0)
+    if len(non_zero_positions) == 0:
+        raise RuntimeError("Clock difference contains only zero values.")
+    data_start = non_zero_positions[0]
+
+    clock_step_timestamp, clock_step_magnitude = _detect_clock_step(
+        timestamps[data_start:], clock_diff[data_start:], max_permissible_clock_steps
+    )
+    # Crop after clock step
+    data_start = max(data_start, np.searchsorted(timestamps, clock_step_timestamp, side='right'))
+    _warn_time_jumps(deltas[data_start:], len(timestamps) - data_start, timedelta_ns(timedelta(seconds=5)))
+
+    result = EndpointAnalysis(
+        missing_samples_count=missing_samples_count,
+        missing_samples_percent=missing_samples_percent,
+        clock_step_timestamp=clock_step_timestamp,
+        clock_step_magnitude=clock_step_magnitude,
+        analyzed_start=timestamps[min(data_start, len(timestamps) - 1)],
+        analyzed_end=timestamps[-1],
+    )
+
+    sign_change_positions, converged = _detect_converged(clock_diff[data_start:])
+    # Initial convergence point: We allow the sign to flip 5 times during initial synchronization
+    num_flips_during_convergence = 5
+    if len(sign_change_positions) <= num_flips_during_convergence:
+        logging.warning(f"Clock never converged.")
+        return result
+    convergence_timestamp = timestamps[data_start + sign_change_positions[num_flips_during_convergence]]
+    if convergence_timestamp - timestamps[data_start] < timedelta_ns(minimum_convergence_time):
+        logging.warning(f"Convergence too fast. Assuming {minimum_convergence_time} seconds.")
+        convergence_timestamp = timestamps[data_start] + timedelta_ns(minimum_convergence_time)
+    result.convergence_timestamp = convergence_timestamp
+    result.convergence_duration = convergence_timestamp - timestamps[data_start]
+
+    # Converged data starts after the convergence timestamp, the sketches include it (like SampleQuery).
+    converged_start = np.searchsorted(timestamps, convergence_timestamp, side='right')
+    sketch_start = np.searchsorted(timestamps, convergence_timestamp, side='left')
+
+    converged_after_convergence = converged[converged_start - data_start:]
+    if len(converged_after_convergence) != 0:
+        result.converged_percentage = converged_after_convergence.sum() / len(converged_after_convergence)
+        if result.converged_percentage < 0.9:
+            logging.warning(
+                f"Clock stability low: ({result.converged_percentage * 100:.0f}% of samples in converged state)."
+            )
+    else:
+        logging.warning(f"No convergence data after convergence time of {convergence_timestamp}.")
+    result.converged_samples = len(converged_after_convergence)
+
+    # Convergence statistics
+    if converged_start > data_start:
+        result.convergence_max_offset = np.abs(clock_diff[data_start:converged_start]).max()
+        result.convergence_rate = result.convergence_max_offset / (result.convergence_duration / units.NANOSECONDS_IN_SECOND)
+    else:
+        logging.warning("No convergence data on profile, cannot calculate convergence statistics.")
+
+    # Statistics of the converged data
+    _warn_time_jumps(deltas[converged_start:], len(timestamps) - converged_start, timedelta_ns(timedelta(seconds=5)))
+    abs_clock_diff = np.abs(clock_diff[sketch_start:])
+    converged_abs_clock_diff = abs_clock_diff[converged_start - sketch_start:]
+    result.clock_diff = calculate_quantiles(converged_abs_clock_diff.copy())
+
+    if len(path_delay_timestamps) > 1 and np.any(path_delay_timestamps[1:] < path_delay_timestamps[:-1]):
+        order = np.argsort(path_delay_timestamps, kind='stable')
+        path_delay_timestamps, path_delay = path_delay_timestamps[order], path_delay[order]
+    path_delay_start = np.searchsorted(path_delay_timestamps, convergence_timestamp, side='left')
+    path_delay_timestamps, path_delay = path_delay_timestamps[path_delay_start:], path_delay[path_delay_start:]
+    result.path_delay = calculate_quantiles(path_delay.copy())
+    result.path_delay_std = path_delay.std(ddof=1) if len(path_delay) > 1 else np.nan
+
+    result.clock_diff_sketch.add(abs_clock_diff)
+    result.path_delay_sketch.add(path_delay)
+
+    if fault_interval is not None:
+        result.fault = analyze_fault(
+            timestamps[converged_start:], converged_abs_clock_diff, path_delay_timestamps, path_delay, *fault_interval
+        )
+    return result
@@ -0,0 +1,156 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ptp_perf.profiles.data_cache import DataCache, fingerprint
+
+QuantileConfidenceInterval = Tuple[float, Optional[float], Optional[float]]
+"""The quantile and the lower and upper bound of its confidence interval."""
+
+
+class ConfidenceIntervalMethod(StrEnum):
+    SCIPY_BOOTSTRAP = "scipy_bootstrap"
+    """scipy.stats.bootstrap (BCa) with 9999 resamples of the entire data. Accurate but slow on large data."""
+    ORDER_STATISTIC = "order_statistic"
+    """Distribution-free interval between two order statistics chosen with the binomial distribution.
+    Exact (coverage of at least the confidence level) and needs no resampling."""
+    BOOTSTRAP = "bootstrap"
+    """Percentile bootstrap that draws the order statistics of each resample directly from the sorted data,
+    instead of resampling the entire data. Supports m-out-of-n resampling (see resample_size)."""
+
+
+class BootstrapMetricCache(DataCache):
+    """Confidence intervals by fingerprint of the data and the parameters (see QuantileConfidenceRequest.key)."""
+    value_type = Tuple[Optional[float], Optional[float], Optional[float]]
+
+
+@dataclass
+class QuantileConfidenceRequest:
+    """The confidence interval of one quantile of the values."""
+    values: np.ndarray
+    quantile: float
+    method: ConfidenceIntervalMethod = ConfidenceIntervalMethod.SCIPY_BOOTSTRAP
+    confidence_level: float = 0.95
+    resamples: int = 9999
+    resample_size: Optional[int] = None
+    """The number of values per resample of the bootstrap method, the number of values if None."""
+
+    def key(self) -> str:
+        return (f"{fingerprint(np.asarray(self.values, dtype=np.float64))}-{self.quantile}-{self.method}-"
+                f"{self.confidence_level}-{self.resamples}-{self.resample_size}")
+
+    def compute(self) -> QuantileConfidenceInterval:
+        values = np.asarray(self.values, dtype=np.float64)
+        if self.method == ConfidenceIntervalMethod.SCIPY_BOOTSTRAP:
+            return scipy_bootstrap_interval(values, self.quantile, self.confidence_level, self.resamples)
+        if self.method == ConfidenceIntervalMethod.ORDER_STATISTIC:
+            return order_statistic_interval(values, self.quantile, self.confidence_level)
+        if self.method == ConfidenceIntervalMethod.BOOTSTRAP:
+            return bootstrap_interval(
+                np.sort(values), self.quantile, self.confidence_level, self.resamples, self.resample_size
+            )
+        raise NotImplementedError(f"Unknown confidence interval method: {self.method}")
+
+
+def scipy_bootstrap_interval(values: np.ndarray, quantile: float, confidence_level: float = 0.95,
+                             resamples: int = 9999) -> QuantileConfidenceInterval:
+    import scipy
+    bootstrap_result = scipy.stats.bootstrap(
+        # Samples must be in a sequence, this isn't clear from the documentation
+        # https://docs.scipy.org/doc/scipy/reference/generated/scipy.stats.bootstrap.html
+        (values,),
+        lambda sample, axis: np.quantile(sample, quantile, axis=axis),
+        random_state=np.random.default_rng(0), vectorized=True,
+        confidence_level=confidence_level, n_resamples=resamples,
+        # Try to stay within 10M values processed per batch to limit memory consumption
+        batch=max(10 * (1024 ** 2) // len(values), 1),
+    )
+    return (np.quantile(values, quantile),
+            bootstrap_result.confidence_interval.low, bootstrap_result.confidence_interval.high)
+
+
+def order_statistic_interval(values: np.ndarray, quantile: float,
+                             confidence_level: float = 0.95) -> QuantileConfidenceInterval:
+    """The interval [x_(l), x_(u)] of order statistics such that the number of values below the true quantile,
+    which is binomially distributed, lies in [l, u) with at least the confidence level.
+    Only the two order statistics and the quantile are selected (with a partition), the values are not sorted."""
+    import scipy
+    n = len(values)
+    alpha = 1 - confidence_level
+    binomial = scipy.stats.binom(n, quantile)
+    # 1-based ranks, the bounds are clipped to the data if there are too few values for the confidence level.
+    lower_rank = max(int(binomial.ppf(alpha / 2)), 1)
+    upper_rank = min(int(binomial.ppf(1 - alpha / 2)) + 1, n)
+
+    virtual_index = quantile * (n - 1)
+    estimate_ranks = [math.floor(virtual_index), math.ceil(virtual_index)]
+    partitioned = np.partition(values, [lower_rank - 1, upper_rank - 1, *estimate_ranks])
+    lower, upper = partitioned[estimate_ranks]
+    estimate = lower + (virtual_index - estimate_ranks[0]) * (upper - lower)
+    return estimate, partitioned[lower_rank - 1], partitioned[upper_rank - 1]
+
+
+def bootstrap_interval(sorted_values: np.ndarray, quantile: float, confidence_level: float = 0.95,
+                       resamples: int = 9999, resample_size: Optional[int] = None,
+                       rng: Optional[np.random.Generator] = None) -> QuantileConfidenceInterval:
+    """Percentile bootstrap of the quantile (with linear interpolation, like np.quantile) of sorted values.
+
+    The quantile of a resample only depends on two adjacent order statistics. The k-th order statistic of m uniform
+    draws is Beta(k, m - k + 1) distributed and the next one is the minimum of the remaining draws above it, so both
+    are drawn directly and mapped to the values by the inverse empirical distribution, without resampling the data.
+    With a resample_size m smaller than the number of values n (m-out-of-n bootstrap),
+    the deviations of the resampled quantiles are scaled by sqrt(m / n)."""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    n = len(sorted_values)
+    m = resample_size if resample_size is not None else n
+
+    virtual_index = quantile * (m - 1)
+    rank = math.floor(virtual_index)
+    fraction = virtual_index - rank
+    # 0-based rank k is the (k + 1)-th order statistic.
+    lower_uniform = rng.beta(rank + 1, m - rank, size=resamples)
+    lower = sorted_values[np.minimum((lower_uniform * n).astype(np.int64), n - 1)]
+    if fraction > 0:
+        upper_uniform = lower_uniform + (1 - lower_uniform) * (1 - rng.random(resamples) ** (1 / (m - rank - 1)))
+        upper = sorted_values[np.minimum((upper_uniform * n).astype(np.int64), n - 1)]
+        replicates = lower + fraction * (upper - lower)
+    else:
+        replicates = lower
+
+    estimate = np.quantile(sorted_values, quantile)
+    if m != n:
+        replicates = estimate + math.sqrt(m / n) * (replicates - estimate)
+    alpha = 1 - confidence_level
+    low, high = np.quantile(replicates, [alpha / 2, 1 - alpha / 2])
+    return estimate, low, high
+
+
+def _compute(request: QuantileConfidenceRequest) -> QuantileConfidenceInterval:
+    return request.compute()
+
+
+def compute_confidence_intervals(requests: Sequence[QuantileConfidenceRequest], jobs: int = 1,
+                                 use_cache: bool = True) -> List[QuantileConfidenceInterval]:
+    """Compute the confidence intervals of the requests, in a pool of jobs worker processes if jobs > 1.
+    Results are looked up in (and written to) the BootstrapMetricCache, unless use_cache is False."""
+    cache = BootstrapMetricCache.resolve() if use_cache else None
+    keys = [request.key() for request in requests] if use_cache else [None] * len(requests)
+    cached = cache.get_many(keys) if use_cache else {}
+    results: List[Optional[QuantileConfidenceInterval]] = [cached.get(key) for key in keys]
+    missing = [index for index, result in enumerate(results) if result is None]
+
+    if jobs > 1 and len(missing) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            computed = list(executor.map(_compute, [requests[index] for index in missing]))
+    else:
+        computed = [requests[index].compute() for index in missing]
+
+    for index, result in zip(missing, computed):
+        results[index] = tuple(float(value) for value in result)
+    if use_cache and len(missing) != 0:
+        cache.update_many({keys[index]: results[index] for index in missing})
+    return results
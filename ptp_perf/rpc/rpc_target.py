@@ -36,7 +36,7 @@ class RPCTarget:
             "-R", f"127.0.0.1:{settings.RPC_PORT}:127.0.0.1:{settings.RPC_PORT}", self.address,
             f"cd '{self.remote_root}/src' && "
             f"python3 rpc_client.py --host '127.0.0.1' --port {settings.RPC_PORT} --id '{self.id}'"
-        )
+        ).capture_bounded()
         self._rpc_ssh_connection.run_as_task()
 
     async def rpc_stop(self):
@@ -0,0 +1,128 @@
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch
+
+import numpy as np
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.test import TestCase
+
+from ptp_perf import config
+from ptp_perf.models import PTPProfile, PTPEndpoint, Sample, SampleSketch, BenchmarkSummary, BenchmarkSummaryAggregate
+from ptp_perf.models.endpoint import TimeNormalizationStrategy
+from ptp_perf.models.endpoint_type import EndpointType
+from ptp_perf.registry.benchmark_db import BenchmarkDB
+from ptp_perf.utilities.quantile_sketch import QuantileSketch
+from ptp_perf.vendor.registry import VendorDB
+
+
+class TestBenchmarkSummary(TestCase):
+    benchmark = BenchmarkDB.BASE
+    vendor = VendorDB.LINUXPTP
+    cluster = config.CLUSTER_PI
+
+    def setUp(self):
+        self.start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.generator = np.random.default_rng(0)
+
+    def create_profile(self, index: int) -> PTPProfile:
+        """An analyzed profile with a primary and a secondary slave."""
+        profile = PTPProfile.objects.create(
+            benchmark_id=self.benchmark.id, vendor_id=self.vendor.id, cluster_id=self.cluster.id,
+            start_time=self.start_time, stop_time=self.start_time, is_processed=True,
+        )
+        for endpoint_type in [EndpointType.PRIMARY_SLAVE, EndpointType.SECONDARY_SLAVE]:
+            endpoint = PTPEndpoint.objects.create(
+                profile=profile, machine_id=f"test-{index}-{endpoint_type}", endpoint_type=endpoint_type,
+                clock_step_timestamp=self.start_time, convergence_timestamp=self.start_time + timedelta(seconds=5),
+                convergence_duration=timedelta(seconds=10 + index), convergence_max_offset=1e-3, convergence_rate=1e-4,
+                converged_percentage=0.9, converged_samples=100 + index, missing_samples_percent=0.01 * index,
+                fault_clock_diff_post_max=1e-6 * (index + 1), fault_ratio_clock_diff_post_max_pre_median=2 + index,
+                proc_cpu_percent=0.1 * index,
+            )
+            for sample_type in [Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY]:
+                values = self.generator.lognormal(mean=np.log(1000 * (index + 1)), sigma=1, size=200).astype(np.int64)
+                Sample.objects.bulk_create(
+                    Sample(endpoint=endpoint, sample_type=sample_type, value=value,
+                           timestamp=self.start_time + timedelta(seconds=sample))
+                    for sample, value in enumerate(values)
+                )
+                converged = endpoint.load_samples_to_series(sample_type, normalize_time=TimeNormalizationStrategy.NONE)
+                SampleSketch.store(
+                    endpoint, sample_type,
+                    QuantileSketch().add(converged.abs() if sample_type == Sample.SampleType.CLOCK_DIFF else converged),
+                )
+        BenchmarkSummaryAggregate.update_profile(profile)
+        return profile
+
+    def test_incremental_same_as_rebuild(self):
+        profiles = [self.create_profile(index) for index in range(3)]
+        aggregate = BenchmarkSummaryAggregate.get_group(self.benchmark.id, self.vendor.id, self.cluster.id)
+        self.assertEqual([profile.id for profile in profiles], aggregate.profile_ids)
+        self.assertTrue(aggregate.is_dirty)
+
+        BenchmarkSummary.update(self.benchmark, self.vendor, self.cluster)
+        aggregate.refresh_from_db()
+        self.assertFalse(aggregate.is_dirty)
+        incremental = BenchmarkSummary.get_query(self.benchmark, self.vendor, self.cluster).get()
+
+        BenchmarkSummary.create(self.benchmark, self.vendor, self.cluster, force_update=True)
+        rebuilt = BenchmarkSummary.get_query(self.benchmark, self.vendor, self.cluster).get()
+        for field in BenchmarkSummary._meta.fields:
+            if field.name == "id":
+                continue
+            with self.subTest(field=field.name):
+                incremental_value, rebuilt_value = getattr(incremental, field.name), getattr(rebuilt, field.name)
+                if isinstance(incremental_value, float):
+                    self.assertAlmostEqual(rebuilt_value, incremental_value)
+                else:
+                    self.assertEqual(rebuilt_value, incremental_value)
+
+        self.assertEqual(3, incremental.count)
+        self.assertEqual(timedelta(seconds=11), incremental.convergence_duration)
+        self.assertAlmostEqual(0.01, incremental.missing_samples_all_percent)
+        self.assertAlmostEqual(3e-6, incremental.fault_clock_diff_post_max_max)
+        self.assertAlmostEqual(1e-6, incremental.secondary_fault_clock_diff_post_max_min)
+
+        # The exact summary is within the error bound of the sketches.
+        BenchmarkSummary.create(self.benchmark, self.vendor, self.cluster, force_update=True, exact=True)
+        exact = BenchmarkSummary.get_query(self.benchmark, self.vendor, self.cluster).get()
+        for quantile, value in exact.clock_quantiles().items():
+            self.assertAlmostEqual(value, incremental.clock_quantiles()[quantile], delta=0.02 * value)
+
+    def test_corrupt_profile(self):
+        profiles = [self.create_profile(index) for index in range(2)]
+        aggregate = BenchmarkSummaryAggregate.get_group(self.benchmark.id, self.vendor.id, self.cluster.id)
+        aggregate.is_dirty = False
+        aggregate.save()
+
+        profiles[1].is_corrupted = True
+        profiles[1].save()
+        BenchmarkSummaryAggregate.update_profile(profiles[1])
+        aggregate.refresh_from_db()
+        self.assertTrue(aggregate.is_dirty)
+        self.assertTrue(aggregate.is_stale)
+
+        aggregate = BenchmarkSummaryAggregate.get_group(self.benchmark.id, self.vendor.id, self.cluster.id)
+        self.assertFalse(aggregate.is_stale)
+        self.assertEqual([profiles[0].id], aggregate.profile_ids)
+        self.assertEqual(1, aggregate.primary_endpoints)
+        self.assertEqual(timedelta(seconds=10), aggregate.mean("primary", "convergence_duration"))
+
+    def test_reanalyzed_profiles_rebuild_once(self):
+        profiles = [self.create_profile(index) for index in range(3)]
+        BenchmarkSummaryAggregate.get_group(self.benchmark.id, self.vendor.id, self.cluster.id)
+
+        with patch.object(BenchmarkSummaryAggregate, "rebuild", autospec=True,
+                          side_effect=BenchmarkSummaryAggregate.rebuild) as rebuild:
+            for profile in profiles:
+                BenchmarkSummaryAggregate.update_profile(profile)
+            self.assertEqual(0, rebuild.call_count)
+
+            BenchmarkSummary.update(self.benchmark, self.vendor, self.cluster)
+            self.assertEqual(1, rebuild.call_count)
+
+        aggregate = BenchmarkSummaryAggregate.get_group(self.benchmark.id, self.vendor.id, self.cluster.id)
+        self.assertEqual([profile.id for profile in profiles], aggregate.profile_ids)
+        self.assertFalse(aggregate.is_dirty)
@@ -0,0 +1,99 @@
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch
+
+import numpy as np
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ptp_perf import config
+from ptp_perf.django_data.app.management.commands.analyze import convert_profile
+from ptp_perf.models import PTPProfile, PTPEndpoint, Sample, SampleSketch
+from ptp_perf.models.endpoint import ProfileCorruptError
+from ptp_perf.models.endpoint_type import EndpointType
+from ptp_perf.registry.benchmark_db import BenchmarkDB
+
+
+class TestConvertProfile(TestCase):
+
+    def setUp(self):
+        start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.profile = PTPProfile.objects.create(
+            benchmark_id=BenchmarkDB.BASE.id, vendor_id="linuxptp", cluster_id=config.CLUSTER_PI.id,
+            start_time=start_time, stop_time=start_time,
+        )
+        generator = np.random.default_rng(0)
+        for index, endpoint_type in enumerate([EndpointType.PRIMARY_SLAVE, EndpointType.SECONDARY_SLAVE]):
+            endpoint = PTPEndpoint.objects.create(
+                profile=self.profile, machine_id=config.CLUSTER_PI.machines[index + 1].id, endpoint_type=endpoint_type,
+                samples_streamed=True,
+            )
+            # A clock step, then an exponentially converging clock with noise.
+            clock_diff = np.concatenate([
+                np.full(5, 10_000_000), generator.normal(0, 100, 1195) + 5000 * np.exp(-np.arange(1195) / 20)
+            ]).astype(np.int64)
+            Sample.objects.bulk_create(
+                Sample(endpoint=endpoint, sample_type=sample_type, timestamp=start_time + timedelta(seconds=second),
+                       value=value if sample_type == Sample.SampleType.CLOCK_DIFF else 50_000 + second % 7)
+                for second, value in enumerate(clock_diff)
+                for sample_type in [Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY]
+            )
+
+    def test_convert_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            convert_profile(self.profile)
+        writes = [query for query in queries.captured_queries if query["sql"].lstrip().startswith(("INSERT", "UPDATE"))]
+        # Packed series, sketches, endpoints, profile and log records; not a write per endpoint field or message.
+        self.assertLessEqual(len(writes), 10)
+
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.is_processed)
+        self.assertFalse(self.profile.is_corrupted)
+        for endpoint in self.profile.ptpendpoint_set.all():
+            self.assertIsNotNone(endpoint.convergence_timestamp)
+            self.assertIsNotNone(endpoint.clock_diff_median)
+            self.assertEqual(2, endpoint.samplesketch_set.count())
+        self.assertEqual(
+            ["has 2400 streamed samples."] * 2,
+            [message.split(") ")[-1] for message in self.profile.analysislogrecord_set.order_by("id").values_list("message", flat=True)[:2]]
+        )
+
+    def test_failure_keeps_previous_analysis(self):
+        convert_profile(self.profile)
+        endpoint_statistics = list(self.profile.ptpendpoint_set.order_by("id").values_list("convergence_timestamp", "clock_diff_median"))
+        log_messages = list(self.profile.analysislogrecord_set.order_by("id").values_list("message", flat=True))
+
+        with patch.object(PTPEndpoint, "process_timeseries_data", side_effect=RuntimeError("Crash")):
+            with self.assertRaises(RuntimeError):
+                convert_profile(self.profile)
+
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.is_processed)
+        self.assertEqual(endpoint_statistics, list(self.profile.ptpendpoint_set.order_by("id").values_list("convergence_timestamp", "clock_diff_median")))
+        # The messages of the failed analysis are kept after the previous ones.
+        failed_log_messages = list(self.profile.analysislogrecord_set.order_by("id").values_list("message", flat=True))
+        self.assertEqual(log_messages, failed_log_messages[:len(log_messages)])
+        self.assertIn("has 2400 streamed samples.", failed_log_messages[len(log_messages)])
+        self.assertEqual(4, SampleSketch.objects.filter(endpoint__profile=self.profile).count())
+
+    def test_corrupt_profile_keeps_statistics(self):
+        process_timeseries_data = PTPEndpoint.process_timeseries_data
+
+        def process_or_fail(endpoint: PTPEndpoint, save: bool = True):
+            if endpoint.endpoint_type == EndpointType.SECONDARY_SLAVE:
+                raise ProfileCorruptError("Corrupt")
+            process_timeseries_data(endpoint, save=save)
+
+        with patch.object(PTPEndpoint, "process_timeseries_data", autospec=True, side_effect=process_or_fail):
+            convert_profile(self.profile)
+
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.is_corrupted)
+        primary_slave = self.profile.endpoint_primary_slave
+        self.assertIsNotNone(primary_slave.convergence_timestamp)
+        self.assertEqual(2, primary_slave.samplesketch_set.count())
+        self.assertTrue(self.profile.analysislogrecord_set.filter(message__contains="Profile marked as corrupt").exists())
@@ -1,14 +1,39 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
 from unittest import TestCase
 
+import numpy as np
+
 from ptp_perf.constants import LOCAL_DIR
-from ptp_perf.profiles.data_cache import DataCache
+from ptp_perf.profiles.data_cache import DataCache, fingerprint
+from ptp_perf.utilities.cache_store import CacheStore
+
+TEST_STORE_LOCATION = LOCAL_DIR.joinpath("test_cache.sqlite3")
 
 
 class TestCache(DataCache):
-    cache_location = LOCAL_DIR.joinpath("test_cache.json")
+    cache_location = TEST_STORE_LOCATION
+
+
+class TestTupleCache(DataCache):
+    cache_location = TEST_STORE_LOCATION
+    value_type = Tuple[float, str]
+
+
+def _write_entries(worker: int):
+    store = CacheStore(TEST_STORE_LOCATION, "concurrent")
+    for index in range(50):
+        store.put(f"{worker}-{index}", bytes([worker]) * 100)
+    return worker
+
 
 class TestDataCache(TestCase):
 
+    def tearDown(self):
+        for namespace in ["TestCache", "TestTupleCache", "eviction", "concurrent"]:
+            CacheStore(TEST_STORE_LOCATION, namespace).clear()
+
     def test_cache(self):
         cache = TestCache()
         self.assertRaises(KeyError, lambda: cache.get("key"))
@@ -17,6 +42,74 @@ class TestDataCache(TestCase):
 
         # Present in other cache
         cache2 = TestCache()
-        self.assertEqual("value", cache.get("key"))
+        self.assertEqual("value", cache2.get("key"))
         cache2.purge()
         self.assertRaises(KeyError, lambda: cache2.get("key"))
+
+        self.assertEqual(1, cache.statistics.hits)
+        self.assertEqual(1, cache.statistics.misses)
+
+    def test_namespaces(self):
+        cache = TestCache()
+        tuple_cache = TestTupleCache()
+        cache.update("key", "value")
+        tuple_cache.update_many({"key": (1.5, "a"), "other": (2.5, "b")})
+        self.assertEqual("value", cache.get("key"))
+        self.assertEqual((1.5, "a"), tuple_cache.get("key"))
+        self.assertEqual({"other": (2.5, "b")}, tuple_cache.get_many(["other", "missing"]))
+
+    def test_version(self):
+        CacheStore(TEST_STORE_LOCATION, "TestCache").put("key", b'"value"')
+        self.assertEqual(b'"value"', CacheStore(TEST_STORE_LOCATION, "TestCache").get("key"))
+        self.assertIsNone(CacheStore(TEST_STORE_LOCATION, "TestCache", version=2).get("key"))
+
+    def test_eviction(self):
+        store = CacheStore(TEST_STORE_LOCATION, "eviction", max_size=250)
+        store.put_many({"a": b"a" * 100, "b": b"b" * 100})
+        time.sleep(0.01)
+        # Use a, so that b is the least recently used entry.
+        store.get("a")
+        time.sleep(0.01)
+        store.put("c", b"c" * 100)
+        self.assertEqual(2, len(store))
+        self.assertEqual(200, store.size())
+        self.assertIsNone(store.get("b"))
+        self.assertIsNotNone(store.get("a"))
+        self.assertEqual(1, store.statistics.evictions)
+
+    def test_size_tracking(self):
+        store = CacheStore(TEST_STORE_LOCATION, "eviction", max_size=None)
+        store.put_many({"a": b"a" * 100, "b": b"b" * 100})
+        store.put("a", b"a" * 10)
+        store.delete("b")
+        self.assertEqual(10, store.size())
+        self.assertEqual(10, CacheStore(TEST_STORE_LOCATION, "eviction").size())
+
+    def test_access_time_flush(self):
+        store = CacheStore(TEST_STORE_LOCATION, "eviction", max_size=250)
+        store.put_many({"a": b"a" * 100, "b": b"b" * 100})
+        time.sleep(0.01)
+        store.get("a")
+        # The access time is written on close, before the write of another store.
+        store.close()
+        other_store = CacheStore(TEST_STORE_LOCATION, "eviction", max_size=250)
+        other_store.put("c", b"c" * 100)
+        self.assertIsNone(other_store.get("b"))
+        self.assertIsNotNone(other_store.get("a"))
+
+    def test_concurrent_processes(self):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            self.assertEqual(list(range(4)), list(executor.map(_write_entries, range(4))))
+        store = CacheStore(TEST_STORE_LOCATION, "concurrent")
+        self.assertEqual(4 * 50, len(store))
+        self.assertEqual(bytes([3]) * 100, store.get("3-49"))
+
+    def test_fingerprint(self):
+        values = np.arange(10, dtype=np.float64)
+        self.assertEqual(fingerprint(values), fingerprint(values.copy()))
+        self.assertNotEqual(fingerprint(values), fingerprint(values.astype(np.int64)))
+        self.assertNotEqual(fingerprint("ab", "c"), fingerprint("a", "bc"))
+        # Buffers and strided arrays are hashed by their content.
+        self.assertEqual(fingerprint(values[::2]), fingerprint(values[::2].copy()))
+        self.assertEqual(fingerprint(b"abc"), fingerprint(memoryview(b"abc")))
+        self.assertEqual(fingerprint(b"abc"), fingerprint("abc"))
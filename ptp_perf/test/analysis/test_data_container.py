@@ -1,9 +1,15 @@
+import tempfile
 from datetime import timedelta
+from pathlib import Path
 from unittest import TestCase
+from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 
-from ptp_perf.profiles.data_container import Timeseries
+from ptp_perf.profiles.data_container import Timeseries, MergedTimeSeries, timestamp_merge_append, BootstrapMetric, \
+    SummaryStatistics, SummaryStatisticCache
+from ptp_perf.utilities import columnar
 
 
 class TestTimeseries(TestCase):
@@ -41,3 +47,78 @@ class TestTimeseries(TestCase):
         # After segmentation, we should no longer have values > 1.5
         self.assertLess(segments.time_index.max(), timedelta(seconds=1.5))
 
+
+    def test_merge_series(self):
+        series = Timeseries.from_series(TestTimeseries.sampleFrame)
+        shifted_frame = TestTimeseries.sampleFrame.copy()
+        shifted_frame.index += timedelta(seconds=10)
+        merged = MergedTimeSeries.merge_series(
+            [series, Timeseries.from_series(shifted_frame)], ["first", "second"], timestamp_align=True,
+        )
+
+        # The second series starts one second after the first one ended.
+        self.assertEqual([timedelta(seconds=index) for index in range(10)], merged.time_index.tolist())
+        self.assertEqual(["first"] * 5 + ["second"] * 5, merged.get_discriminator().tolist())
+        self.assertEqual(TestTimeseries.sampleFrame["clock_diff"].tolist() * 2, merged.clock_diff.tolist())
+
+    def test_timestamp_merge_append_negative(self):
+        # Normalized timestamps before the origin (e.g. not only converged samples).
+        timestamps = [timedelta(seconds=second) for second in range(-2, 3)]
+        data = pd.Series(
+            range(10), index=pd.MultiIndex.from_product([["a", "b"], timestamps], names=["group", "timestamp"]),
+        )
+        timestamp_merge_append(data, "group")
+        # Both groups start at zero, the second one second after the first one ended.
+        self.assertEqual(
+            [timedelta(seconds=second) for second in range(10)], data.index.get_level_values("timestamp").tolist()
+        )
+
+    def test_serialization(self):
+        series = Timeseries.from_series(TestTimeseries.sampleFrame)
+        for compress in [False, True]:
+            with self.subTest(compress=compress):
+                data = series.to_bytes(compress=compress)
+                self.assertEqual(compress, columnar.is_compressed(data))
+                pd.testing.assert_frame_equal(TestTimeseries.sampleFrame, Timeseries(data).data_frame, check_dtype=False)
+
+        # Legacy JSON data
+        pd.testing.assert_frame_equal(
+            TestTimeseries.sampleFrame, Timeseries(series.to_json()).data_frame, check_dtype=False
+        )
+        self.assertEqual(series.to_bytes(), Timeseries(series.to_json()).to_bytes())
+
+    def test_serialization_merged(self):
+        series = Timeseries.from_series(TestTimeseries.sampleFrame)
+        merged = MergedTimeSeries.merge_series([series, series], ["first", 2], timestamp_align=True)
+        loaded = MergedTimeSeries(merged.to_bytes(compress=True))
+        pd.testing.assert_frame_equal(merged.data_frame, loaded.data_frame, check_dtype=False)
+        self.assertEqual(["first"] * 5 + [2] * 5, loaded.get_discriminator().tolist())
+
+    def test_save_load(self):
+        series = Timeseries.from_series(TestTimeseries.sampleFrame)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory).joinpath("series.bin")
+            series.save(path)
+            loaded = Timeseries.load(path)
+            pd.testing.assert_frame_equal(series.data_frame, loaded.data_frame, check_dtype=False)
+            # The memory mapped data is reused, not copied.
+            self.assertIsInstance(loaded.to_bytes(), memoryview)
+            self.assertEqual(path.read_bytes(), loaded.to_bytes())
+
+    def test_summarize_cached(self):
+        generator = np.random.default_rng(0)
+        frame = pd.DataFrame(
+            {'clock_diff': generator.normal(0, 1e-6, 200), 'path_delay': 50e-6 + generator.random(200) * 1e-6},
+            index=pd.TimedeltaIndex([timedelta(seconds=second) for second in range(200)], name="timestamp"),
+        )
+        series = Timeseries.from_series(frame)
+        cache = SummaryStatisticCache.resolve()
+        try:
+            statistics = series.summarize()
+            with patch.object(BootstrapMetric, "create", side_effect=AssertionError("Not cached")):
+                cached = Timeseries(series.to_bytes()).summarize()
+            self.assertIsInstance(cached, SummaryStatistics)
+            self.assertIsInstance(cached.clock_diff_p95, BootstrapMetric)
+            self.assertEqual(statistics, cached)
+        finally:
+            cache.purge()
@@ -0,0 +1,189 @@
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from ptp_perf.profiles.analysis import detect_clock_step, detect_clock_convergence
+from ptp_perf.profiles.data_container import ConvergenceStatistics
+from ptp_perf.profiles.endpoint_analysis import analyze_endpoint, EndpointAnalysis, timedelta_ns
+from ptp_perf.utilities import units
+from ptp_perf.utilities.quantile_sketch import QuantileSketch
+
+PROFILE_START = pd.Timestamp("2024-03-06 19:30:00", tz="UTC").value
+DURATION = timedelta(minutes=20)
+
+
+def record_profile(seed: int, gaps: bool = False, fault: bool = False, path_delay_shuffled: bool = False):
+    """A synthetic recording of a ptp4l slave (sync interval 1 second): leading zeros, a clock step of one minute,
+    an oscillating convergence and noise. With fault, the clock difference is offset by 100 us between minute 8 and 10."""
+    rng = np.random.default_rng(seed)
+    num_samples = int(DURATION.total_seconds())
+    timestamps = PROFILE_START + np.arange(num_samples, dtype=np.int64) * units.NANOSECONDS_IN_SECOND
+    # Jitter at microsecond precision, like the timestamps in the database.
+    timestamps += rng.integers(0, 100000, num_samples) * 1000
+    if gaps:
+        keep = np.ones(num_samples, dtype=bool)
+        keep[300:310] = False
+        keep[700:790] = False
+        timestamps = timestamps[keep]
+
+    time = (timestamps - timestamps[0]) / units.NANOSECONDS_IN_SECOND
+    clock_diff = 1e-7 * rng.standard_normal(len(timestamps)) + 1e-3 * np.cos(time) * np.exp(-time / 20)
+    clock_diff[time < 30] -= 60
+    clock_diff[:5] = 0
+    if fault:
+        # Additive, the oscillation has decayed to noise by then.
+        clock_diff[(time > 480) & (time < 600)] += 1e-4
+    clock_diff = np.round(clock_diff * units.NANOSECONDS_IN_SECOND).astype(np.int64)
+
+    path_delay = rng.integers(50000, 60000, len(timestamps))
+    path_delay_timestamps = timestamps
+    if path_delay_shuffled:
+        order = rng.permutation(len(timestamps))
+        path_delay_timestamps, path_delay = path_delay_timestamps[order], path_delay[order]
+
+    fault_interval = None
+    if fault:
+        fault_interval = (timestamps[0] + 480 * units.NANOSECONDS_IN_SECOND + 500, timestamps[0] + 600 * units.NANOSECONDS_IN_SECOND)
+    return timestamps, clock_diff, path_delay_timestamps, path_delay, fault_interval
+
+
+def to_series(timestamps: np.ndarray, values: np.ndarray) -> pd.Series:
+    index = pd.DatetimeIndex(timestamps.view("datetime64[ns]"), name="timestamp").tz_localize("UTC")
+    return pd.Series(values, index=index) * units.NANOSECONDS_TO_SECONDS
+
+
+def quantiles(series: pd.Series) -> Tuple[float, float, float]:
+    return tuple(series.quantile([0.5, 0.05, 0.95]).values)
+
+
+def reference_analysis(timestamps, clock_diff, path_delay_timestamps, path_delay,
+                       fault_interval: Optional[Tuple[int, int]]) -> Dict:
+    """The analysis of PTPEndpoint.process_timeseries_data before analyze_endpoint, on pandas series."""
+    entire_series = to_series(timestamps, clock_diff)
+    index_time_deltas = entire_series.index.diff()
+    total_time_missing = index_time_deltas[index_time_deltas >= timedelta(seconds=3)].sum()
+    result = {
+        "missing_samples_count": total_time_missing.total_seconds() / 1,
+        "missing_samples_percent": total_time_missing.total_seconds() / DURATION.total_seconds(),
+    }
+
+    frame_no_leading_zeros = entire_series[(entire_series != 0).cumsum() != 0]
+    detected_clock_step = detect_clock_step(frame_no_leading_zeros, 1)
+    result["clock_step_timestamp"] = detected_clock_step.time.value
+    result["clock_step_magnitude"] = detected_clock_step.magnitude
+    frame_no_clock_step = frame_no_leading_zeros[frame_no_leading_zeros.index > detected_clock_step.time]
+
+    detected_clock_convergence = detect_clock_convergence(frame_no_clock_step, timedelta(seconds=10))
+    convergence_statistics = ConvergenceStatistics.from_convergence_series(
+        detected_clock_convergence,
+        frame_no_clock_step[frame_no_clock_step.index <= detected_clock_convergence.timestamp]
+    )
+    convergence_timestamp = detected_clock_convergence.timestamp
+    result.update(
+        convergence_timestamp=convergence_timestamp.value,
+        convergence_duration=detected_clock_convergence.duration.value,
+        convergence_rate=convergence_statistics.convergence_rate,
+        convergence_max_offset=convergence_statistics.convergence_max_offset,
+        converged_percentage=detected_clock_convergence.ratio_converged_samples,
+        converged_samples=detected_clock_convergence.num_converged_samples,
+    )
+
+    abs_clock_diff = frame_no_clock_step[frame_no_clock_step.index > convergence_timestamp].abs()
+    path_delay_values = to_series(path_delay_timestamps, path_delay)
+    path_delay_values = path_delay_values[path_delay_values.index >= convergence_timestamp]
+    result.update(
+        clock_diff=quantiles(abs_clock_diff),
+        path_delay=quantiles(path_delay_values),
+        path_delay_std=path_delay_values.std(),
+        clock_diff_sketch=QuantileSketch().add(frame_no_clock_step[frame_no_clock_step.index >= convergence_timestamp].abs()),
+        path_delay_sketch=QuantileSketch().add(path_delay_values),
+    )
+
+    if fault_interval is not None:
+        fault_start, fault_end = pd.Timestamp(fault_interval[0], tz="UTC"), pd.Timestamp(fault_interval[1], tz="UTC")
+        pre_fault_series = abs_clock_diff[abs_clock_diff.index <= fault_start]
+        post_fault_series = abs_clock_diff[abs_clock_diff.index >= fault_end]
+        pre_median = quantiles(pre_fault_series)[0]
+        post_fault_under_2x_median = post_fault_series[post_fault_series.rolling(5).median() < 2 * pre_median]
+        result.update(
+            fault_clock_diff_pre=quantiles(pre_fault_series),
+            fault_path_delay_pre=quantiles(path_delay_values[path_delay_values.index <= fault_start]),
+            fault_clock_diff_post=quantiles(post_fault_series),
+            fault_path_delay_post=quantiles(path_delay_values[path_delay_values.index >= fault_end]),
+            fault_actual_duration=(post_fault_series.index.min() - pre_fault_series.index.max()).value,
+            fault_clock_diff_post_max=post_fault_series.max(),
+            fault_clock_diff_return_to_normal_time=(post_fault_under_2x_median.index[0] - fault_end).value,
+            fault_clock_diff_mid_max=abs_clock_diff[
+                (abs_clock_diff.index > fault_start) & (abs_clock_diff.index < fault_end)
+            ].max(),
+        )
+    return result
+
+
+class TestEndpointAnalysis(TestCase):
+
+    def analyze(self, timestamps, clock_diff, path_delay_timestamps, path_delay, fault_interval) -> EndpointAnalysis:
+        return analyze_endpoint(
+            timestamps, clock_diff * units.NANOSECONDS_TO_SECONDS,
+            path_delay_timestamps, path_delay * units.NANOSECONDS_TO_SECONDS,
+            sync_interval_seconds=1, duration=DURATION, fault_interval=fault_interval,
+        )
+
+    def assert_same_as_reference(self, profile):
+        expected = reference_analysis(*profile)
+        result = self.analyze(*profile)
+
+        for name in ["clock_step_timestamp", "clock_step_magnitude", "convergence_timestamp", "convergence_duration",
+                     "convergence_max_offset", "converged_percentage", "converged_samples", "clock_diff", "path_delay"]:
+            self.assertEqual(expected[name], getattr(result, name), name)
+        # Divided by durations in seconds.
+        for name in ["convergence_rate", "missing_samples_count", "missing_samples_percent", "path_delay_std"]:
+            np.testing.assert_allclose(expected[name], getattr(result, name), rtol=1e-12, err_msg=name)
+        self.assertEqual(expected["clock_diff_sketch"].to_bytes(), result.clock_diff_sketch.to_bytes())
+        self.assertEqual(expected["path_delay_sketch"].quantiles([0.05, 0.5, 0.95]).tolist(),
+                         result.path_delay_sketch.quantiles([0.05, 0.5, 0.95]).tolist())
+
+        if profile[-1] is not None:
+            for name in ["clock_diff_pre", "path_delay_pre", "clock_diff_post", "path_delay_post", "actual_duration",
+                         "clock_diff_post_max", "clock_diff_return_to_normal_time", "clock_diff_mid_max"]:
+                self.assertEqual(expected[f"fault_{name}"], getattr(result.fault, name), name)
+        return result
+
+    def test_profile(self):
+        result = self.assert_same_as_reference(record_profile(seed=1))
+        self.assertEqual(0, result.missing_samples_count)
+        self.assertAlmostEqual(60, result.clock_step_magnitude, delta=0.01)
+        self.assertIsNone(result.fault)
+
+    def test_profile_with_gaps(self):
+        result = self.assert_same_as_reference(record_profile(seed=2, gaps=True))
+        self.assertGreater(result.missing_samples_count, 90)
+
+    def test_profile_with_fault(self):
+        result = self.assert_same_as_reference(record_profile(seed=3, fault=True))
+        self.assertGreater(result.fault.clock_diff_mid_max, result.fault.clock_diff_pre[2])
+
+    def test_path_delay_order(self):
+        self.assert_same_as_reference(record_profile(seed=4, path_delay_shuffled=True))
+
+    def test_no_convergence(self):
+        timestamps, clock_diff, path_delay_timestamps, path_delay, _ = record_profile(seed=5)
+        # No sign changes after the clock step (at 30 seconds), without introducing a second step.
+        after_clock_step = timestamps - timestamps[0] >= 30 * units.NANOSECONDS_IN_SECOND
+        clock_diff[after_clock_step] = np.abs(clock_diff[after_clock_step]) + 1
+        result = self.analyze(timestamps, clock_diff, path_delay_timestamps, path_delay, None)
+        self.assertIsNotNone(result.clock_step_timestamp)
+        self.assertIsNone(result.convergence_timestamp)
+
+    def test_too_many_clock_steps(self):
+        timestamps, clock_diff, path_delay_timestamps, path_delay, _ = record_profile(seed=6)
+        clock_diff[600:610] += 60 * units.NANOSECONDS_IN_SECOND
+        with self.assertRaises(RuntimeError):
+            self.analyze(timestamps, clock_diff, path_delay_timestamps, path_delay, None)
+
+    def test_timedelta_ns(self):
+        self.assertEqual(pd.Timedelta(days=1, seconds=3, microseconds=7).value,
+                         timedelta_ns(timedelta(days=1, seconds=3, microseconds=7)))
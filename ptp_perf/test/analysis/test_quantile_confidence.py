@@ -0,0 +1,91 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from ptp_perf.profiles.data_container import BootstrapMetric
+from ptp_perf.profiles.quantile_confidence import ConfidenceIntervalMethod, QuantileConfidenceRequest, \
+    compute_confidence_intervals, BootstrapMetricCache, order_statistic_interval, bootstrap_interval, \
+    scipy_bootstrap_interval
+
+
+class TestQuantileConfidence(TestCase):
+
+    def get_reference_data(self):
+        rng = np.random.default_rng(1)
+        # Clock differences are roughly half-normal, path delays roughly normal with a long tail.
+        return {
+            "half_normal": np.abs(rng.standard_normal(5000)) * 1e-6,
+            "lognormal": rng.lognormal(mean=-10, sigma=0.5, size=5000),
+        }
+
+    def assert_close_to_scipy(self, interval, reference, tolerance: float = 0.2):
+        value, low, high = interval
+        reference_value, reference_low, reference_high = reference
+        width = reference_high - reference_low
+        self.assertAlmostEqual(reference_value, value, delta=1e-12 * abs(reference_value))
+        self.assertLessEqual(low, value)
+        self.assertGreaterEqual(high, value)
+        self.assertAlmostEqual(reference_low, low, delta=tolerance * width)
+        self.assertAlmostEqual(reference_high, high, delta=tolerance * width)
+
+    def test_against_scipy(self):
+        for name, values in self.get_reference_data().items():
+            for quantile in [0.05, 0.5, 0.95]:
+                with self.subTest(data=name, quantile=quantile):
+                    reference = scipy_bootstrap_interval(values, quantile)
+                    self.assert_close_to_scipy(order_statistic_interval(values, quantile), reference)
+                    self.assert_close_to_scipy(bootstrap_interval(np.sort(values), quantile), reference)
+
+    def test_m_out_of_n_bootstrap(self):
+        values = self.get_reference_data()["half_normal"]
+        reference = scipy_bootstrap_interval(values, 0.5)
+        # Resampling less values needs a larger tolerance.
+        self.assert_close_to_scipy(
+            bootstrap_interval(np.sort(values), 0.5, resample_size=len(values) // 4), reference, tolerance=0.3
+        )
+
+    def test_order_statistic_coverage(self):
+        # The true median of the standard normal distribution is 0.
+        rng = np.random.default_rng(2)
+        covered = 0
+        for _ in range(400):
+            value, low, high = order_statistic_interval(rng.standard_normal(101), 0.5)
+            covered += low <= 0 <= high
+        self.assertGreaterEqual(covered / 400, 0.92)
+
+    def test_parallel(self):
+        values = self.get_reference_data()["lognormal"]
+        requests = [
+            QuantileConfidenceRequest(values, quantile, method=method)
+            for quantile in [0.5, 0.95] for method in [ConfidenceIntervalMethod.ORDER_STATISTIC, ConfidenceIntervalMethod.BOOTSTRAP]
+        ]
+        self.assertEqual(
+            compute_confidence_intervals(requests, use_cache=False),
+            compute_confidence_intervals(requests, jobs=2, use_cache=False),
+        )
+
+    def test_cache(self):
+        cache = BootstrapMetricCache.resolve()
+        values = self.get_reference_data()["half_normal"]
+        requests = [QuantileConfidenceRequest(values, 0.5, method=ConfidenceIntervalMethod.ORDER_STATISTIC)]
+        try:
+            result = compute_confidence_intervals(requests)
+            self.assertEqual(result[0], cache.get(requests[0].key()))
+            with patch.object(QuantileConfidenceRequest, "compute", side_effect=AssertionError("Not cached")):
+                self.assertEqual(result, compute_confidence_intervals(requests))
+
+            # Different parameters or data are different entries.
+            self.assertNotEqual(requests[0].key(), QuantileConfidenceRequest(values, 0.95).key())
+            self.assertNotEqual(requests[0].key(), QuantileConfidenceRequest(values[1:], 0.5).key())
+        finally:
+            cache.purge()
+
+    def test_bootstrap_metric_missing_values(self):
+        values = pd.Series(self.get_reference_data()["lognormal"])
+        values[::10] = np.nan
+        metric = BootstrapMetric.create(values, 0.95, method=ConfidenceIntervalMethod.ORDER_STATISTIC)
+        self.assertAlmostEqual(values.quantile(0.95), metric.value, delta=1e-12 * metric.value)
+        self.assertLessEqual(metric.confidence_interval_lower, metric.value)
+        self.assertGreaterEqual(metric.confidence_interval_upper, metric.value)
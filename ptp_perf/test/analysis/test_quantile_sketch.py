@@ -0,0 +1,114 @@
+from datetime import datetime, timezone, timedelta
+from unittest import TestCase as UnitTestCase
+
+import numpy as np
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.test import TestCase
+
+from ptp_perf.models import PTPProfile, PTPEndpoint, Sample, SampleSketch
+from ptp_perf.models.endpoint import TimeNormalizationStrategy
+from ptp_perf.models.sample_query import SampleQuery
+from ptp_perf.utilities.quantile_sketch import QuantileSketch
+from ptp_perf.utilities.series_reducers import QuantileReducer
+
+QUANTILES = [0, 0.001, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 0.999, 1]
+
+
+class TestQuantileSketch(UnitTestCase):
+
+    def assert_error_bound(self, sketch: QuantileSketch, values: np.ndarray):
+        expected = np.quantile(values, QUANTILES, method='lower')
+        estimated = sketch.quantiles(QUANTILES)
+        bound = sketch.relative_accuracy * np.abs(expected) * (1 + 1e-9) + sketch.minimum_value
+        self.assertTrue(
+            np.all(np.abs(estimated - expected) <= bound),
+            f"Quantiles {estimated} exceed the error bound of {expected}"
+        )
+
+    def test_error_bound(self):
+        generator = np.random.default_rng(0)
+        # Clock differences in seconds spanning several orders of magnitude, path delays, signed values.
+        data = {
+            "lognormal": generator.lognormal(mean=np.log(1e-7), sigma=2, size=100_000),
+            "normal": generator.normal(loc=5e-6, scale=1e-7, size=100_000),
+            "signed": generator.normal(loc=0, scale=1e-6, size=100_000),
+            "zeros": np.concatenate([np.zeros(1000), generator.exponential(1e-8, size=1000)]),
+        }
+        for name, values in data.items():
+            for relative_accuracy in [0.001, 0.01, 0.05]:
+                with self.subTest(name=name, relative_accuracy=relative_accuracy):
+                    sketch = QuantileSketch(relative_accuracy=relative_accuracy).add(values)
+                    self.assert_error_bound(sketch, values)
+                    self.assertEqual(len(values), sketch.count)
+                    self.assertAlmostEqual(values.mean(), sketch.mean)
+                    self.assertEqual(values.max(), sketch.quantile(1))
+
+    def test_merge(self):
+        generator = np.random.default_rng(1)
+        parts = [generator.lognormal(mean=np.log(10 ** -exponent), sigma=1, size=5000) for exponent in range(4, 10)]
+        parts.append(-parts[0])
+        merged = QuantileSketch.merge_all(QuantileSketch().add(part) for part in parts)
+        values = np.concatenate(parts)
+        self.assert_error_bound(merged, values)
+
+        # Merging is lossless: same result as adding all the values to one sketch.
+        np.testing.assert_array_equal(QuantileSketch().add(values).quantiles(QUANTILES), merged.quantiles(QUANTILES))
+
+        with self.assertRaises(ValueError):
+            QuantileSketch(relative_accuracy=0.01).merge(QuantileSketch(relative_accuracy=0.02))
+
+    def test_serialization(self):
+        values = np.random.default_rng(2).normal(loc=0, scale=1e-6, size=10_000)
+        sketch = QuantileSketch(relative_accuracy=0.005).add(values).add([np.nan, 0])
+        restored = QuantileSketch.from_bytes(sketch.to_bytes())
+        self.assertEqual(sketch.count, restored.count)
+        self.assertEqual(sketch.relative_accuracy, restored.relative_accuracy)
+        np.testing.assert_array_equal(sketch.quantiles(QUANTILES), restored.quantiles(QUANTILES))
+        # A few kilobytes regardless of the number of values.
+        self.assertLess(len(sketch.to_bytes()), 10_000)
+
+        empty = QuantileSketch.from_bytes(QuantileSketch().to_bytes())
+        self.assertEqual(0, empty.count)
+        self.assertTrue(np.isnan(empty.quantile(0.5)))
+
+
+class TestSampleSketch(TestCase):
+
+    def test_merged_sketches_match_exact(self):
+        start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        profile = PTPProfile.objects.create(
+            benchmark_id="test-benchmark", vendor_id="linuxptp", start_time=start_time, stop_time=start_time,
+            is_processed=True,
+        )
+        generator = np.random.default_rng(3)
+        for index in range(4):
+            endpoint = PTPEndpoint.objects.create(
+                profile=profile, machine_id=f"test-{index}",
+                clock_step_timestamp=start_time, convergence_timestamp=start_time + timedelta(seconds=10),
+            )
+            values = generator.lognormal(mean=np.log(1000 * (index + 1)), sigma=1, size=500).astype(np.int64)
+            Sample.objects.bulk_create(
+                Sample(endpoint=endpoint, sample_type=Sample.SampleType.CLOCK_DIFF, value=value,
+                       timestamp=start_time + timedelta(seconds=sample))
+                for sample, value in enumerate(values)
+            )
+            converged = endpoint.load_samples_to_series(
+                Sample.SampleType.CLOCK_DIFF, normalize_time=TimeNormalizationStrategy.NONE
+            )
+            SampleSketch.store(endpoint, Sample.SampleType.CLOCK_DIFF, QuantileSketch().add(converged.abs()))
+
+        sketches = SampleSketch.load_of_endpoints(
+            profile.ptpendpoint_set.values_list("id", flat=True), Sample.SampleType.CLOCK_DIFF
+        )
+        self.assertEqual(4, len(sketches))
+        merged = QuantileSketch.merge_all(sketches.values())
+
+        # The quantiles of the summary, the exact path interpolates between samples.
+        quantiles = [0.05, 0.5, 0.95, 0.99, 1]
+        exact = QuantileReducer(quantiles)
+        SampleQuery(profile=profile, timestamp_merge_append=False).reduce(Sample.SampleType.CLOCK_DIFF, [exact])
+        self.assertEqual(4 * 490, merged.count)
+        np.testing.assert_allclose(exact.result(), merged.quantiles(quantiles), rtol=2 * merged.relative_accuracy)
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone, timedelta
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.test import TestCase
+
+from ptp_perf.models import PTPProfile, PTPEndpoint, ResourceSample
+
+
+class TestResourceSamples(TestCase):
+
+    def test_process_system_metrics_data(self):
+        start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        profile = PTPProfile.objects.create(
+            benchmark_id="test-benchmark", vendor_id="linuxptp", start_time=start_time, stop_time=start_time,
+        )
+        endpoint = PTPEndpoint.objects.create(profile=profile, machine_id="test")
+
+        ResourceSample.objects.bulk_create(
+            [
+                ResourceSample(
+                    endpoint=endpoint,
+                    timestamp=start_time + timedelta(seconds=index),
+                    proc_cpu_user=0.01 * index, proc_cpu_system=0.02 * index,
+                    proc_mem_uss=1000 + index, proc_mem_pss=2000, proc_mem_rss=3000, proc_mem_vms=4000 - index,
+                    proc_ctx_switches_voluntary=10 * index, proc_ctx_switches_involuntary=index,
+                    sys_cpu_frequency=1500 + 100 * (index % 2), sys_sensors_temperature_cpu=50,
+                    sys_net_ptp_iface_bytes_sent=100 * index, sys_net_ptp_iface_bytes_received=200 * index,
+                    sys_net_ptp_iface_packets_sent=index, sys_net_ptp_iface_packets_received=2 * index,
+                ) for index in range(11)
+            ]
+            # Samples without process data are ignored
+            + [ResourceSample(endpoint=endpoint, timestamp=start_time + timedelta(seconds=20), sys_cpu_frequency=0)]
+        )
+
+        endpoint.process_system_metrics_data()
+        endpoint.refresh_from_db()
+
+        self.assertEqual(timedelta(seconds=10), endpoint.resource_profile_length)
+        self.assertAlmostEqual(0.01, endpoint.proc_cpu_percent_user)
+        self.assertAlmostEqual(0.02, endpoint.proc_cpu_percent_system)
+        self.assertAlmostEqual(0.03, endpoint.proc_cpu_percent)
+        self.assertEqual(1010, endpoint.proc_mem_uss)
+        self.assertEqual(4000, endpoint.proc_mem_vms)
+        self.assertEqual(100, endpoint.proc_ctx_switches_voluntary)
+        self.assertEqual(10, endpoint.proc_ctx_switches_involuntary)
+        self.assertAlmostEqual(1550 - 50 / 11, endpoint.sys_cpu_frequency)
+        self.assertEqual(50, endpoint.sys_sensors_temperature_cpu)
+        self.assertEqual(3000, endpoint.sys_net_ptp_iface_bytes_total)
+        self.assertEqual(30, endpoint.sys_net_ptp_iface_packets_total)
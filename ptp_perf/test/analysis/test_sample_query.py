@@ -0,0 +1,154 @@
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+import pandas as pd
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.test import TestCase
+
+from ptp_perf.models import PTPProfile, PTPEndpoint, Sample, SampleSeries
+from ptp_perf.models.endpoint import TimeNormalizationStrategy
+from ptp_perf.models.exceptions import NoDataError
+from ptp_perf.models.sample_loader import load_sample_arrays_of_endpoints, iter_sample_arrays_of_endpoints
+from ptp_perf.models.sample_query import SampleQuery
+from ptp_perf.utilities.series_reducers import CountReducer, MeanReducer, MinMaxReducer, QuantileReducer, \
+    HistogramReducer
+
+
+class TestSampleQuery(TestCase):
+
+    def setUp(self):
+        self.start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.profile = PTPProfile.objects.create(
+            benchmark_id="test-benchmark", vendor_id="linuxptp", start_time=self.start_time, stop_time=self.start_time,
+            is_processed=True,
+        )
+        self.endpoints = []
+        for index in range(3):
+            endpoint = PTPEndpoint.objects.create(
+                profile=self.profile, machine_id=f"test-{index}",
+                clock_step_timestamp=self.start_time + timedelta(seconds=2 + index),
+                convergence_timestamp=self.start_time + timedelta(seconds=5 + index),
+            )
+            Sample.objects.bulk_create(
+                [
+                    Sample(
+                        endpoint=endpoint, sample_type=sample_type, value=100 * index + sample,
+                        timestamp=self.start_time + timedelta(seconds=sample + index, milliseconds=index),
+                    )
+                    for sample in range(20) for sample_type in [Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY]
+                ]
+            )
+            self.endpoints.append(endpoint)
+        # Mixing packed series and sample rows
+        self.endpoints[1].pack_samples()
+        self.endpoints[1].sample_set.all().delete()
+
+    def test_same_as_per_endpoint(self):
+        for normalization in TimeNormalizationStrategy:
+            for converged_only in [True, False]:
+                query = SampleQuery(
+                    profile=self.profile, converged_only=converged_only, normalize_time=normalization,
+                    timestamp_merge_append=False,
+                )
+                result = query.run(Sample.SampleType.CLOCK_DIFF)
+
+                expected = pd.concat(
+                    [
+                        endpoint.load_samples_to_series(
+                            Sample.SampleType.CLOCK_DIFF, converged_only=converged_only, normalize_time=normalization,
+                        ) for endpoint in self.endpoints
+                    ],
+                    keys=[endpoint.id for endpoint in self.endpoints],
+                    names=["endpoint_id"],
+                )
+                pd.testing.assert_series_equal(expected, result, check_index_type=False)
+
+    def test_database_filter(self):
+        row_endpoints = [self.endpoints[0], self.endpoints[2]]
+        endpoint_ids, timestamps, _ = load_sample_arrays_of_endpoints(
+            [endpoint.id for endpoint in row_endpoints], Sample.SampleType.CLOCK_DIFF,
+            ["convergence_timestamp", "clock_step_timestamp"],
+        )
+        for endpoint in row_endpoints:
+            endpoint_timestamps = timestamps[endpoint_ids == endpoint.id]
+            self.assertEqual(15, len(endpoint_timestamps))
+            self.assertGreaterEqual(endpoint_timestamps.min(), pd.Timestamp(endpoint.convergence_timestamp).value)
+
+        blocks = list(iter_sample_arrays_of_endpoints(
+            [endpoint.id for endpoint in row_endpoints], Sample.SampleType.CLOCK_DIFF,
+            ["convergence_timestamp", "clock_step_timestamp"], fetch_size=7,
+        ))
+        np.testing.assert_array_equal(timestamps, np.concatenate([block[1] for block in blocks]))
+
+    def test_missing_normalization_origin(self):
+        PTPEndpoint.objects.filter(id=self.endpoints[0].id).update(convergence_timestamp=None)
+        with self.assertRaises(RuntimeError):
+            SampleQuery(profile=self.profile, converged_only=False, timestamp_merge_append=False).run(
+                Sample.SampleType.CLOCK_DIFF
+            )
+
+    def test_timestamp_merge_append(self):
+        for normalization in [TimeNormalizationStrategy.CONVERGENCE, TimeNormalizationStrategy.NONE]:
+            result = SampleQuery(
+                profile=self.profile, normalize_time=normalization, timestamp_merge_append=True,
+            ).run(Sample.SampleType.CLOCK_DIFF)
+            timestamps = result.index.get_level_values("timestamp")
+            self.assertTrue(timestamps.is_monotonic_increasing)
+            self.assertTrue(timestamps.is_unique)
+
+            group_bounds = pd.Series(timestamps, index=result.index).groupby("endpoint_id").agg(["min", "max"])
+            gaps = (group_bounds["min"].shift(-1) - group_bounds["max"]).dropna().tolist()
+            if normalization == TimeNormalizationStrategy.NONE:
+                # Every endpoint starts one second after the previous one ended.
+                self.assertEqual([timedelta(seconds=1)] * 2, gaps)
+                self.assertEqual(timedelta(0), timestamps[0])
+            else:
+                # Normalized timestamps are offset by the end of the previous endpoint.
+                self.assertTrue(all(gap >= timedelta(seconds=1) for gap in gaps))
+                self.assertEqual(
+                    self.endpoints[0].load_samples_to_series(Sample.SampleType.CLOCK_DIFF).index.max(),
+                    group_bounds["max"].iloc[0]
+                )
+
+    def test_iter_chunks(self):
+        query = SampleQuery(profile=self.profile, timestamp_merge_append=False)
+        expected = query.run(Sample.SampleType.PATH_DELAY)
+
+        chunks = list(query.iter_chunks(Sample.SampleType.PATH_DELAY))
+        self.assertEqual(
+            [[endpoint.id] for endpoint in self.endpoints],
+            sorted(chunk.index.get_level_values("endpoint_id").unique().tolist() for chunk in chunks)
+        )
+        pd.testing.assert_series_equal(expected, pd.concat(chunks).sort_index(), check_index_type=False)
+
+        chunks = list(query.iter_chunks(Sample.SampleType.PATH_DELAY, chunk_size=7))
+        self.assertTrue(all(len(chunk) <= 7 for chunk in chunks))
+        pd.testing.assert_series_equal(expected, pd.concat(chunks).sort_index(), check_index_type=False)
+
+    def test_reduce(self):
+        query = SampleQuery(profile=self.profile, timestamp_merge_append=False)
+        expected = query.run(Sample.SampleType.CLOCK_DIFF).abs()
+
+        count, mean, minmax = CountReducer(), MeanReducer(), MinMaxReducer()
+        quantiles = QuantileReducer([0.05, 0.5, 0.99, 1])
+        histogram = HistogramReducer(np.linspace(0, 1e-7, 11))
+        query.reduce(
+            Sample.SampleType.CLOCK_DIFF, [count, mean, minmax, quantiles, histogram], transform=pd.Series.abs,
+            chunk_size=10,
+        )
+
+        self.assertEqual(len(expected), count.result())
+        self.assertEqual(3, count.level_count)
+        self.assertAlmostEqual(expected.mean(), mean.result())
+        self.assertEqual((expected.min(), expected.max()), minmax.result())
+        np.testing.assert_allclose(expected.quantile([0.05, 0.5, 0.99, 1]).values, quantiles.result())
+        self.assertEqual(len(expected), histogram.result().sum() + histogram.overflow)
+
+    def test_no_data(self):
+        with self.assertRaises(NoDataError):
+            SampleQuery(profile=self.profile).run(Sample.SampleType.FAULT)
+        with self.assertRaises(NoDataError):
+            list(SampleQuery(profile=self.profile).iter_chunks(Sample.SampleType.FAULT))
@@ -0,0 +1,61 @@
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+import pandas as pd
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.test import TestCase
+
+from ptp_perf.models import PTPProfile, PTPEndpoint, Sample, SampleSeries
+from ptp_perf.models.endpoint import TimeNormalizationStrategy
+from ptp_perf.models.sample_series import encode_int64_deltas, decode_int64_deltas
+
+
+class TestSampleSeries(TestCase):
+
+    def setUp(self):
+        self.start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        profile = PTPProfile.objects.create(
+            benchmark_id="test-benchmark", vendor_id="linuxptp", start_time=self.start_time, stop_time=self.start_time,
+        )
+        self.endpoint = PTPEndpoint.objects.create(profile=profile, machine_id="test")
+
+    def test_encoding(self):
+        values = np.array([0, -5, 2 ** 62, -2 ** 62, 17], dtype=np.int64)
+        np.testing.assert_array_equal(values, decode_int64_deltas(encode_int64_deltas(values)))
+
+        timestamps = np.arange(1_000_000, dtype=np.int64) * 1_000_000_000 + 1_700_000_000_000_000_000
+        self.assertLess(len(encode_int64_deltas(timestamps)), timestamps.nbytes / 100)
+
+    def test_pack_and_load(self):
+        Sample.objects.bulk_create(
+            [
+                Sample(
+                    endpoint=self.endpoint, sample_type=Sample.SampleType.CLOCK_DIFF,
+                    timestamp=self.start_time + timedelta(seconds=index, microseconds=index), value=(-1) ** index * index,
+                ) for index in range(25)
+            ]
+        )
+        self.endpoint.convergence_timestamp = self.start_time + timedelta(seconds=5)
+        self.endpoint.clock_step_timestamp = self.start_time + timedelta(seconds=2)
+
+        load_arguments = dict(sample_type=Sample.SampleType.CLOCK_DIFF, normalize_time=TimeNormalizationStrategy.NONE)
+        row_series = self.endpoint.load_samples_to_series(**load_arguments)
+
+        self.assertEqual(25, SampleSeries.pack(self.endpoint, Sample.SampleType.CLOCK_DIFF, chunk_size=10))
+        self.assertEqual(3, SampleSeries.objects.filter(endpoint=self.endpoint).count())
+        self.assertEqual(25, SampleSeries.count_samples(self.endpoint))
+
+        # The series is preferred even without the rows.
+        self.endpoint.sample_set.all().delete()
+        packed_series = self.endpoint.load_samples_to_series(**load_arguments)
+        pd.testing.assert_series_equal(row_series, packed_series, check_index_type=False)
+        self.assertEqual(20, len(packed_series))
+
+        # Packing without rows keeps the existing series.
+        self.assertEqual(0, SampleSeries.pack(self.endpoint, Sample.SampleType.CLOCK_DIFF))
+        self.assertEqual(25, SampleSeries.count_samples(self.endpoint))
+
+        self.assertIsNone(self.endpoint.load_samples_to_series(Sample.SampleType.PATH_DELAY, converged_only=False))
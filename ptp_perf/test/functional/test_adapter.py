@@ -0,0 +1,75 @@
+import asyncio
+from asyncio import CancelledError
+from datetime import timedelta
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from ptp_perf.adapters.adapter import IntervalActionAdapter
+
+real_sleep = asyncio.sleep
+
+
+class VirtualClock:
+    """Replaces the event loop clock and asyncio.sleep, so that the schedule does not depend on the machine's load.
+    Sleeping advances the clock instantly, the adapter is cancelled once the clock passes duration."""
+
+    def __init__(self, duration: float):
+        self.now = 0.0
+        self.duration = duration
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.now += max(delay, 0)
+        if self.now > self.duration:
+            raise CancelledError()
+        await real_sleep(0)
+
+
+class TickRecorder(IntervalActionAdapter):
+    interval = timedelta(milliseconds=50)
+
+    def __init__(self, slow_tick: int = None):
+        super().__init__(endpoint=None)
+        self.tick_times = []
+        self.slow_tick = slow_tick
+
+    async def update(self):
+        self.tick_times.append(asyncio.get_running_loop().time())
+        if len(self.tick_times) == self.slow_tick:
+            await asyncio.sleep(0.12)
+        else:
+            # Some collection cost which must not shift the schedule.
+            await asyncio.sleep(0.01)
+
+
+class TestIntervalActionAdapter(IsolatedAsyncioTestCase):
+
+    async def run_adapter(self, adapter: IntervalActionAdapter, duration: float):
+        clock = VirtualClock(duration)
+        with patch.object(asyncio.get_running_loop(), "time", clock.time), patch("asyncio.sleep", clock.sleep):
+            await adapter.run()
+
+    async def test_no_drift(self):
+        adapter = TickRecorder()
+        await self.run_adapter(adapter, 0.52)
+
+        self.assertEqual(11, adapter.statistics.ticks)
+        for index, tick_time in enumerate(adapter.tick_times):
+            self.assertAlmostEqual(index * 0.05, tick_time, delta=1e-9)
+        self.assertEqual(0, adapter.statistics.overruns)
+        self.assertAlmostEqual(0.01, adapter.statistics.update_duration_max.total_seconds(), delta=1e-6)
+
+    async def test_overrun(self):
+        adapter = TickRecorder(slow_tick=2)
+        await self.run_adapter(adapter, 0.52)
+
+        # The second tick takes 120ms, so the ticks at 100ms and 150ms are skipped.
+        self.assertEqual(1, adapter.statistics.overruns)
+        self.assertEqual(2, adapter.statistics.skipped_ticks)
+        self.assertAlmostEqual(0.2, adapter.tick_times[2], delta=1e-9)
+        self.assertEqual(9, adapter.statistics.ticks)
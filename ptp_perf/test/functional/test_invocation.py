@@ -1,5 +1,7 @@
 import asyncio
+import tempfile
 from asyncio import CancelledError
+from pathlib import Path
 from unittest import IsolatedAsyncioTestCase
 
 from ptp_perf.invoke.invocation import Invocation
@@ -42,3 +44,43 @@ class TestInvocation(IsolatedAsyncioTestCase):
         with self.assertRaises(CancelledError):
             await task
         self.assertListEqual(["OK"] * 2, invocation.output.splitlines())
+
+    async def test_line_callback(self):
+        lines = []
+        await Invocation.of_shell("echo first; echo second >&2; printf third").add_line_callback(lines.append).run()
+        self.assertListEqual(["first", "second", "third"], sorted(lines))
+
+    async def test_bounded_capture(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spill_path = Path(directory).joinpath("output.txt")
+            invocation = Invocation.of_shell("seq 1 1000").capture_bounded(
+                head_size=20, tail_size=20, spill_path=spill_path
+            ).hide()
+            await invocation.run()
+
+            lines = invocation.output.splitlines()
+            self.assertListEqual(["1", "2", "3", "4", "5", "6", "7", "8", "9"], lines[:9])
+            self.assertIn("omitted", lines[9])
+            self.assertListEqual(["997", "998", "999", "1000"], lines[-4:])
+            self.assertEqual(1000, len(spill_path.read_text().splitlines()))
+
+        # Unbounded capture keeps everything
+        invocation = await Invocation.of_shell("seq 1 1000").hide().run()
+        self.assertEqual(1000, len(invocation.output.splitlines()))
+
+    async def test_output_filter(self):
+        lines = []
+        invocation = Invocation.of_shell(
+            "for i in $(seq 1 10); do echo status $i; echo result $i; done"
+        ).add_output_filter("^status", keep_every=5).add_line_callback(lines.append).hide()
+        await invocation.run()
+
+        self.assertListEqual(
+            ["status 1", "status 6"], [line for line in invocation.output.splitlines() if line.startswith("status")]
+        )
+        self.assertEqual(10, len([line for line in invocation.output.splitlines() if line.startswith("result")]))
+        # Callbacks see every line
+        self.assertEqual(20, len(lines))
+        self.assertEqual(20, invocation.lines_read)
+        self.assertEqual(8, invocation.lines_dropped)
+        self.assertEqual(len("".join(f"status {i}\nresult {i}\n" for i in range(1, 11))), invocation.bytes_read)
@@ -0,0 +1,107 @@
+from datetime import datetime, timezone, timedelta
+from typing import List
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.test import TestCase
+
+from ptp_perf.models import PTPProfile, PTPEndpoint, LogRecord, Sample
+from ptp_perf.vendor.chrony import ChronyVendor
+from ptp_perf.vendor.linuxptp import LinuxPTPVendor
+from ptp_perf.vendor.ptpd import PTPDVendor
+from ptp_perf.vendor.sptp import SPTPVendor
+from ptp_perf.vendor.vendor import Vendor
+
+
+class TestLogParser(TestCase):
+
+    def get_dummy_endpoint(self, vendor: Vendor, source: str, lines: List[str]) -> PTPEndpoint:
+        profile = PTPProfile.objects.create(
+            benchmark_id="test-benchmark", vendor_id=vendor.id,
+            start_time=datetime.now(timezone.utc), stop_time=datetime.now(timezone.utc)
+        )
+        endpoint = PTPEndpoint.objects.create(profile=profile, machine_id="test")
+        LogRecord.objects.bulk_create(
+            LogRecord(endpoint=endpoint, source=source, message=f"| {line}",
+                      timestamp=datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=index))
+            for index, line in enumerate(lines)
+        )
+        return endpoint
+
+    def get_values(self, endpoint: PTPEndpoint):
+        return list(endpoint.sample_set.order_by('timestamp', 'sample_type').values_list('timestamp', 'sample_type', 'value'))
+
+    def assert_same_as_regex(self, vendor: Vendor, lines: List[str], expected_count: int):
+        parsed_endpoint = self.get_dummy_endpoint(vendor, vendor.sample_log_source, lines)
+        self.assertEqual(expected_count, vendor.parse_log_data(parsed_endpoint))
+
+        reference_endpoint = self.get_dummy_endpoint(vendor, vendor.sample_log_source, lines)
+        self.assertEqual(expected_count, Vendor.extract_sample_from_log_using_regex(
+            reference_endpoint, vendor.sample_log_source, vendor.sample_log_pattern, vendor.sample_number_conversion,
+        ))
+        self.assertListEqual(self.get_values(reference_endpoint), self.get_values(parsed_endpoint))
+        return self.get_values(parsed_endpoint)
+
+    def test_linuxptp(self):
+        values = self.assert_same_as_regex(LinuxPTPVendor(), [
+            "ptp4l[1030.123]: master offset        -12 s2 freq   -2573 path delay     53105",
+            "ptp4l[1031.123]: port 1: announce timeout",
+            "ptp4l[1031.623]: master offset  123456789 s0 freq      +0 path delay     53090",
+            "ptp4l[1031.823]: selected best master clock 000000.fffe.000001",
+            "ptp4l[1032.123]: master offset         25 s2 freq   -2540 path delay     53101",
+        ], expected_count=6)
+        self.assertIn((Sample.SampleType.CLOCK_DIFF, 123456789), [value[1:] for value in values])
+
+    def test_sptp(self):
+        self.assert_same_as_regex(SPTPVendor(), [
+            'time="2024-04-10T20:43:50Z" level=info msg="offset         -8 s2 freq     -12 path delay      52104 (52100: 52110)"',
+            'time="2024-04-10T20:43:51Z" level=warning msg="GM changed to 000000.fffe.000001"',
+            'time="2024-04-10T20:43:52Z" level=info msg="offset         14 s2 freq     +20 path delay      52098 (52090: 52110)"',
+        ], expected_count=4)
+
+    def test_chrony(self):
+        values = self.assert_same_as_regex(ChronyVendor(), [
+            "==========================================================================================================================================",
+            "2024-04-10 20:43:50 10.0.0.56       N 10 111 111 1111   0  0 1.00 -4.530e-07  1.526e-04  1.146e-07  0.000e+00  0.000e+00 7F7F0101 4I K K",
+            "   Date (UTC) Time     IP Address   L St 123 567 ABCD  LP RP Score    Offset  Peer del. Peer disp.  Root del. Root disp. Refid     MTxRx",
+            "2024-04-10 20:43:52 10.0.0.56       N 10 111 111 1111   0  0 1.00  2.100e-08  1.530e-04  1.146e-07  0.000e+00  0.000e+00 7F7F0101 4I K K",
+        ], expected_count=4)
+        self.assertIn((Sample.SampleType.PATH_DELAY, 152600), [value[1:] for value in values])
+
+    def test_ptpd(self):
+        lines = [
+            "# Timestamp, State, Clock ID, One Way Delay, Offset From Master, Slave to Master, Master to Slave, Observed Drift, Last packet Received, One Way Delay Mean, One Way Delay Std Dev, Offset From Master Mean, Offset From Master Std Dev, Observed Drift Mean, Observed Drift Std Dev, raw delayMS, raw delaySM",
+            "2024-03-06 19:32:48.655021, lstn_reset, dca632fffecdcf52(unknown)/1,  0.000000000,  0.000000000,  0.000000000,  0.000000000, 0.000000000, I, 0.000000000, 0, 0.000000000, 0, 0, 0,  0.000000000,  0.000000000",
+            "2024-03-06 19:32:49.655021, slv, dca632fffecdcf52(unknown)/1,  0.000062474, -0.000028681,  0.000092819,  0.000028279, -6677.771000000, D, 0.000061376, 221, -0.000044591, 10390, -5282, 392,  0.000028279,  0.000092819",
+            "# Timestamp, State, Clock ID, Offset From Master, One Way Delay",
+            "2024-03-06 19:32:50.655021, slv, dca632fffecdcf52(unknown)/1,  0.000062500, -0.000001000,  0.000092819,  0.000028279, -6677.771000000, S, 0.000061376, 221, -0.000044591, 10390, -5282, 392,  0.000028279,  0.000092819",
+        ]
+        endpoint = self.get_dummy_endpoint(PTPDVendor(), "stdbuf", lines)
+        self.assertEqual(4, PTPDVendor().parse_log_data(endpoint))
+        # The columns of the first header are used, the values are converted from seconds.
+        self.assertListEqual([
+            (Sample.SampleType.CLOCK_DIFF, -28681), (Sample.SampleType.PATH_DELAY, 62474),
+            (Sample.SampleType.CLOCK_DIFF, -1000), (Sample.SampleType.PATH_DELAY, 62500),
+        ], [value[1:] for value in self.get_values(endpoint)])
+
+        master_endpoint = self.get_dummy_endpoint(PTPDVendor(), "stdbuf", lines[1:3])
+        self.assertEqual(0, PTPDVendor().parse_log_data(master_endpoint))
+
+    def test_blocks(self):
+        vendor = LinuxPTPVendor()
+        lines = [
+            f"ptp4l[{1000 + index}.123]: master offset {index - 50:10d} s2 freq {-2500 + index:7d} path delay {53000 + index:10d}"
+            if index % 3 != 0 else f"ptp4l[{1000 + index}.123]: port 1: delay timeout"
+            for index in range(100)
+        ]
+        endpoint = self.get_dummy_endpoint(vendor, vendor.sample_log_source, lines)
+        parser = vendor.create_log_parser()
+        parser.block_size = 7
+        self.assertEqual(2 * 66, parser.parse(endpoint))
+
+        reference_endpoint = self.get_dummy_endpoint(vendor, vendor.sample_log_source, lines)
+        Vendor.extract_sample_from_log_using_regex(
+            reference_endpoint, vendor.sample_log_source, vendor.sample_log_pattern, vendor.sample_number_conversion,
+        )
+        self.assertListEqual(self.get_values(reference_endpoint), self.get_values(endpoint))
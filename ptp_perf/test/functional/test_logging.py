@@ -1,5 +1,8 @@
 import logging
-from datetime import datetime, timezone
+import tempfile
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from unittest.mock import patch
 
 from ptp_perf.utilities.django_utilities import bootstrap_django_environment
 bootstrap_django_environment()
@@ -8,10 +11,13 @@ from ptp_perf.adapters.fault_generators import SoftwareFaultGenerator
 from ptp_perf.util import setup_logging
 
 
+from django.db.models import Max
 from django.test import TestCase
 from ptp_perf.models import PTPProfile
 from ptp_perf.models import LogRecord, PTPEndpoint
+from ptp_perf.utilities.log_spool import LogSpool, LogSpoolUploader
 from ptp_perf.utilities.logging import LogToDBLogRecordHandler
+from ptp_perf.utilities.server_clock import ServerClock
 
 
 class TestLogToDBLogRecordHandler(TestCase):
@@ -28,16 +34,18 @@ class TestLogToDBLogRecordHandler(TestCase):
         profile, endpoint = self.get_dummy_profile_and_endpoint()
 
         # Install handler
-        handler = LogToDBLogRecordHandler(endpoint)
+        handler = self.get_manually_flushed_handler(endpoint)
         handler.install()
 
         # Message should be captured
         logging.info("This is a test message")
+        handler.flush()
         self.assertEqual(1, LogRecord.objects.count())
         self.assertIn("test message", LogRecord.objects.get().message)
 
         # Logging to specific logger
         logging.getLogger("test_module").info("Test module message")
+        handler.flush()
         self.assertEqual(2, LogRecord.objects.count())
         self.assertIn("Test module message", LogRecord.objects.get(id=2).message)
         self.assertIn("test_module", LogRecord.objects.get(id=2).source)
@@ -46,7 +54,114 @@ class TestLogToDBLogRecordHandler(TestCase):
 
         # Should no longer be captured.
         logging.info("Test log 2")
-        self.assertEqual(2, LogRecord.objects.count())
+        handler.flush()
+        # The handler logs its statistics on uninstall
+        self.assertEqual(3, LogRecord.objects.count())
+        self.assertEqual(3, handler.statistics.records_written)
+
+    def test_backpressure(self):
+        setup_logging()
+
+        profile, endpoint = self.get_dummy_profile_and_endpoint()
+        handler = self.get_manually_flushed_handler(endpoint)
+        handler.queue_size = 2
+        handler.install()
+
+        for index in range(5):
+            logging.info(f"Message {index}")
+        self.assertEqual(2, handler.queue_depth)
+        self.assertEqual(3, handler.statistics.records_dropped)
+
+        handler.flush()
+        self.assertEqual(0, handler.queue_depth)
+        self.assertEqual(2, LogRecord.objects.filter(endpoint=endpoint).count())
+        handler.uninstall()
+
+    def test_spool(self):
+        setup_logging()
+
+        profile, endpoint = self.get_dummy_profile_and_endpoint()
+        with tempfile.TemporaryDirectory() as directory:
+            spool = LogSpool(endpoint.id, directory=Path(directory), segment_size=100)
+            handler = LogToDBLogRecordHandler(
+                endpoint, flush_batch_size=10000, flush_interval=timedelta(hours=1), spool=spool
+            )
+            handler.install()
+            for index in range(10):
+                logging.info(f"Spooled message {index}")
+            handler.flush()
+            # Nothing reaches the database until uploaded
+            self.assertEqual(0, LogRecord.objects.filter(endpoint=endpoint).count())
+            self.assertEqual(10, spool.pending_records)
+            self.assertLess(1, len(list(spool.path.glob("*.jsonl"))))
+
+            uploader = LogSpoolUploader(spool, batch_size=3)
+            self.assertEqual(10, uploader.upload_pending())
+            self.assertEqual(0, spool.pending_records)
+            self.assertEqual(10, LogRecord.objects.filter(endpoint=endpoint).count())
+            # Uploaded segments are removed, only the active one remains
+            self.assertEqual(1, len(list(spool.path.glob("*.jsonl"))))
+
+            # Replaying from a lost checkpoint (e.g. crash after insert) must not duplicate records
+            spool.commit(0)
+            self.assertLess(0, uploader.upload_pending())
+            self.assertEqual(10, LogRecord.objects.filter(endpoint=endpoint).count())
+
+            # A reopened spool continues numbering after the last record
+            handler.uninstall()
+            spool.close(remove_if_empty=False)
+            spool = LogSpool(endpoint.id, directory=Path(directory))
+            self.assertEqual(1, spool.pending_records)
+            spool.append([(0, "test", "After reopen")])
+            LogSpoolUploader(spool).stop(timeout=timedelta(0))
+            self.assertEqual(12, LogRecord.objects.filter(endpoint=endpoint).count())
+            self.assertEqual(
+                list(range(1, 13)),
+                list(LogRecord.objects.filter(endpoint=endpoint).order_by('spool_sequence').values_list('spool_sequence', flat=True))
+            )
+
+    def test_spool_during_outage(self):
+        profile, endpoint = self.get_dummy_profile_and_endpoint()
+        with tempfile.TemporaryDirectory() as directory:
+            spool = LogSpool(endpoint.id, directory=Path(directory))
+            handler = LogToDBLogRecordHandler(
+                endpoint, flush_batch_size=10000, flush_interval=timedelta(hours=1), spool=spool
+            )
+            clock = ServerClock.resolve()
+            clock.synchronize()
+            # Stale estimate while the database is unreachable: records are spooled without a refresh.
+            clock.synchronization_time -= 2 * clock.refresh_interval // timedelta(microseconds=1) * 1000
+            with patch.object(ServerClock, "synchronize", side_effect=AssertionError("Database unreachable")) as synchronize:
+                handler.emit(logging.makeLogRecord({"msg": "During outage"}))
+                handler.flush()
+            synchronize.assert_not_called()
+            self.assertEqual(1, spool.pending_records)
+            self.assertEqual(0, handler.statistics.records_failed)
+            spool.close(remove_if_empty=False)
+
+    def test_spool_restart(self):
+        profile, endpoint = self.get_dummy_profile_and_endpoint()
+        with tempfile.TemporaryDirectory() as directory:
+            for run in range(2):
+                # Like benchmark(): the spool of the previous run was removed after its upload.
+                last_sequence = LogRecord.objects.filter(endpoint=endpoint).aggregate(
+                    last_sequence=Max('spool_sequence')
+                )['last_sequence'] or 0
+                spool = LogSpool(endpoint.id, directory=Path(directory), last_sequence=last_sequence)
+                self.assertEqual(0, spool.pending_records)
+                spool.append([(0, "test", f"Run {run} message {index}") for index in range(3)])
+                LogSpoolUploader(spool).stop(timeout=timedelta(0))
+                self.assertFalse(spool.path.exists())
+
+            self.assertEqual(
+                [f"Run {run} message {index}" for run in range(2) for index in range(3)],
+                list(LogRecord.objects.filter(endpoint=endpoint).order_by('spool_sequence').values_list('message', flat=True))
+            )
+
+    @staticmethod
+    def get_manually_flushed_handler(endpoint: PTPEndpoint) -> LogToDBLogRecordHandler:
+        # The test runs inside a transaction, so the background thread must not write on its own connection.
+        return LogToDBLogRecordHandler(endpoint, flush_batch_size=10000, flush_interval=timedelta(hours=1))
 
     def get_dummy_profile_and_endpoint(self):
         profile = PTPProfile.objects.create(
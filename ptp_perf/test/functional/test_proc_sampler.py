@@ -0,0 +1,36 @@
+import os
+from unittest import TestCase
+
+import psutil
+
+from ptp_perf.utilities.proc_sampler import ProcSampler, ProcessSampler
+
+
+class TestProcSampler(TestCase):
+
+    def test_process_sample(self):
+        sampler = ProcessSampler(os.getpid())
+        sample = sampler.sample()
+        reference = psutil.Process(os.getpid())
+
+        self.assertEqual(reference.num_threads(), sample.num_threads)
+        self.assertAlmostEqual(reference.cpu_times().user, sample.cpu_user, delta=0.1)
+        self.assertAlmostEqual(reference.memory_info().rss, sample.mem_rss, delta=4 * 1024 * 1024)
+        self.assertIsNone(sample.mem_uss)
+
+        # The file descriptors are reused for the next sample.
+        sample = sampler.sample(read_smaps=True)
+        self.assertGreater(sample.mem_uss, 0)
+        self.assertGreater(sample.mem_pss, 0)
+        sampler.close()
+
+    def test_sample_processes(self):
+        sampler = ProcSampler()
+        single = sampler.sample_processes([os.getpid()])
+        summed = sampler.sample_processes([os.getpid(), os.getppid()])
+        self.assertGreater(summed.mem_rss, single.mem_rss)
+
+        # Processes that do not exist (anymore) are skipped.
+        self.assertIsNone(sampler.sample_processes([2 ** 22 + 1]))
+        self.assertIsNotNone(sampler.system.interface_counters("lo"))
+        sampler.close()
@@ -0,0 +1,69 @@
+import time
+from datetime import datetime, timezone
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.test import TestCase
+
+from ptp_perf.models import PTPProfile, PTPEndpoint, LogRecord, Sample
+from ptp_perf.utilities.server_clock import ServerClock
+from ptp_perf.vendor.linuxptp import LinuxPTPVendor
+
+
+class TestStreamingSampleParser(TestCase):
+    lines = [
+        "ptp4l[1030.123]: master offset        -12 s2 freq   -2573 path delay     53105",
+        "ptp4l[1031.123]: port 1: announce timeout",
+        "ptp4l[1032.123]: master offset         25 s2 freq   -2540 path delay     53101",
+    ]
+
+    def get_dummy_endpoint(self) -> PTPEndpoint:
+        profile = PTPProfile.objects.create(
+            benchmark_id="test-benchmark", vendor_id="linuxptp",
+            start_time=datetime.now(timezone.utc), stop_time=datetime.now(timezone.utc)
+        )
+        return PTPEndpoint.objects.create(profile=profile, machine_id="test")
+
+    def get_values(self, endpoint: PTPEndpoint):
+        return list(endpoint.sample_set.order_by('timestamp', 'sample_type').values_list('sample_type', 'value'))
+
+    def test_same_as_log_parsing(self):
+        vendor = LinuxPTPVendor()
+
+        streamed_endpoint = self.get_dummy_endpoint()
+        parser = vendor.create_streaming_parser(streamed_endpoint)
+        for line in self.lines:
+            parser(line)
+        self.assertTrue(parser.save())
+        self.assertEqual(4, parser.count)
+        self.assertTrue(streamed_endpoint.samples_streamed)
+
+        parsed_endpoint = self.get_dummy_endpoint()
+        for index, line in enumerate(self.lines):
+            LogRecord.objects.create(
+                endpoint=parsed_endpoint, source="ptp4l", message=f"| {line}",
+                timestamp=datetime(2024, 1, 1, second=index, tzinfo=timezone.utc),
+            )
+        self.assertEqual(4, vendor.parse_log_data(parsed_endpoint))
+
+        self.assertListEqual(self.get_values(parsed_endpoint), self.get_values(streamed_endpoint))
+        self.assertIn((Sample.SampleType.CLOCK_DIFF, -12), self.get_values(streamed_endpoint))
+
+        # Streamed samples survive clearing the analysis data unless reparsing.
+        streamed_endpoint.clear_analysis_data()
+        self.assertEqual(4, streamed_endpoint.sample_set.count())
+        streamed_endpoint.clear_analysis_data(reparse=True)
+        self.assertEqual(0, streamed_endpoint.sample_set.count())
+        self.assertFalse(streamed_endpoint.samples_streamed)
+
+    def test_line_time(self):
+        endpoint = self.get_dummy_endpoint()
+        parser = LinuxPTPVendor().create_streaming_parser(endpoint)
+        line_time = time.monotonic_ns() - 10 ** 9
+        parser(self.lines[0], line_time)
+        self.assertTrue(parser.save())
+
+        # The same timestamp as the log record of the line.
+        expected = ServerClock.resolve().server_time_of(line_time, refresh=False)
+        self.assertEqual([expected] * 2, list(endpoint.sample_set.values_list('timestamp', flat=True)))
@@ -1,4 +1,5 @@
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 
 from ptp_perf.utilities.django_utilities import bootstrap_django_environment, get_server_datetime
 
@@ -6,9 +7,38 @@ bootstrap_django_environment()
 
 from django.test import TestCase
 
+from ptp_perf.utilities.server_clock import ServerClock, query_server_datetime, datetime_to_ns, ns_to_datetime
+
 
 class TestLogToDBLogRecordHandler(TestCase):
 
     def test_server_datetime(self):
         now = get_server_datetime()
         self.assertIsInstance(now, datetime)
+
+
+class TestServerClock(TestCase):
+
+    def test_synchronize(self):
+        clock = ServerClock(num_samples=3)
+        self.assertTrue(clock.stale)
+        clock.synchronize()
+        self.assertFalse(clock.stale)
+        self.assertGreaterEqual(clock.error_bound, timedelta(0))
+
+        # Estimated time should agree with the queried time within the error bounds (and some scheduling slack)
+        queried_time = query_server_datetime()
+        self.assertLess(abs(clock.now() - queried_time), clock.error_bound + timedelta(milliseconds=100))
+
+        # Converting past monotonic timestamps
+        monotonic_time = time.monotonic_ns()
+        self.assertLessEqual(clock.server_time_of(monotonic_time - 10 ** 9), clock.now() - timedelta(seconds=1))
+
+        # Refreshing with a consistent clock should not alarm
+        clock.synchronize()
+        self.assertIsNotNone(clock.drift)
+        self.assertEqual(0, clock.drift_alarms)
+
+    def test_conversion(self):
+        timestamp = datetime.fromisoformat("2024-05-24T11:43:12.123456+00:00")
+        self.assertEqual(timestamp, ns_to_datetime(datetime_to_ns(timestamp)))
@@ -0,0 +1,88 @@
+import logging
+import time
+from datetime import datetime, timezone, timedelta
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.db import connection
+from django.test import TestCase
+
+from ptp_perf.models import PTPProfile, PTPEndpoint, Sample, LogRecord
+from ptp_perf.util import setup_logging
+from ptp_perf.utilities.bulk_insert import bulk_insert, SampleWriter
+
+
+class TestBulkInsert(TestCase):
+    num_samples = 100000
+    minimum_speedup = 1.25
+    """Required speedup of bulk_insert over bulk_create (on SQLite and PostgreSQL)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        setup_logging()
+
+    def get_dummy_endpoint(self) -> PTPEndpoint:
+        profile = PTPProfile.objects.create(
+            benchmark_id="test-benchmark", vendor_id="test-vendor",
+            start_time=datetime.now(timezone.utc), stop_time=datetime.now(timezone.utc)
+        )
+        return PTPEndpoint.objects.create(profile=profile, machine_id="test")
+
+    def get_rows(self, endpoint: PTPEndpoint):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        return [
+            (start + timedelta(milliseconds=index), Sample.SampleType.CLOCK_DIFF, index - self.num_samples // 2)
+            for index in range(self.num_samples)
+        ]
+
+    def test_sample_writer(self):
+        endpoint = self.get_dummy_endpoint()
+        rows = self.get_rows(endpoint)
+
+        with SampleWriter(endpoint, chunk_size=1000) as writer:
+            for row in rows[:2500]:
+                writer.add(*row)
+        self.assertEqual(2500, writer.count)
+
+        samples = Sample.objects.filter(endpoint=endpoint).order_by('timestamp')
+        self.assertEqual(2500, samples.count())
+        self.assertEqual(rows[0][0], samples.first().timestamp)
+        self.assertEqual(rows[2499][2], samples.last().value)
+
+    def test_ignore_conflicts(self):
+        endpoint = self.get_dummy_endpoint()
+        rows = [(endpoint.id, datetime.now(timezone.utc), "test", f"Message {index}", index) for index in range(10)]
+        fields = ['endpoint', 'timestamp', 'source', 'message', 'spool_sequence']
+        # Both calls run inside the transaction of the test case.
+        bulk_insert(LogRecord, fields, rows[:6], ignore_conflicts=True)
+        bulk_insert(LogRecord, fields, rows, ignore_conflicts=True)
+        self.assertEqual(10, LogRecord.objects.filter(endpoint=endpoint).count())
+
+    def test_throughput(self):
+        endpoint = self.get_dummy_endpoint()
+        rows = self.get_rows(endpoint)
+
+        start = time.perf_counter()
+        Sample.objects.bulk_create(
+            [Sample(endpoint=endpoint, timestamp=timestamp, sample_type=sample_type, value=value)
+             for timestamp, sample_type, value in rows]
+        )
+        bulk_create_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk_insert(
+            Sample, ['endpoint', 'timestamp', 'sample_type', 'value'],
+            [(endpoint.id, *row) for row in rows]
+        )
+        bulk_insert_duration = time.perf_counter() - start
+
+        self.assertEqual(2 * self.num_samples, Sample.objects.filter(endpoint=endpoint).count())
+        logging.info(
+            f"Inserting {self.num_samples} samples on {connection.vendor}: "
+            f"bulk_create {self.num_samples / bulk_create_duration:.0f} rows/s, "
+            f"bulk_insert {self.num_samples / bulk_insert_duration:.0f} rows/s "
+            f"(speedup {bulk_create_duration / bulk_insert_duration:.1f}x)"
+        )
+        self.assertGreater(bulk_create_duration / bulk_insert_duration, self.minimum_speedup)
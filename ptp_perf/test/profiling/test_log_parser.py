@@ -0,0 +1,112 @@
+import logging
+import time
+from datetime import datetime, timezone, timedelta
+from typing import List
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.db import connection
+from django.test import TestCase
+
+from ptp_perf.models import PTPProfile, PTPEndpoint, LogRecord
+from ptp_perf.util import setup_logging
+from ptp_perf.utilities import units
+from ptp_perf.utilities.bulk_insert import bulk_insert
+from ptp_perf.vendor.chrony import ChronyVendor
+from ptp_perf.vendor.linuxptp import LinuxPTPVendor
+from ptp_perf.vendor.ptpd import PTPDVendor
+from ptp_perf.vendor.sptp import SPTPVendor
+from ptp_perf.vendor.vendor import Vendor
+
+
+class TestLogParserThroughput(TestCase):
+    num_records = 50000
+    minimum_speedup = 1.5
+    """Required speedup of the vendor log parsers over the per-record regex extraction."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        setup_logging()
+
+    def get_dummy_endpoint(self, vendor: Vendor, source: str, lines: List[str]) -> PTPEndpoint:
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        profile = PTPProfile.objects.create(
+            benchmark_id="test-benchmark", vendor_id=vendor.id, start_time=start, stop_time=start
+        )
+        endpoint = PTPEndpoint.objects.create(profile=profile, machine_id="test")
+        bulk_insert(
+            LogRecord, ['endpoint', 'timestamp', 'source', 'message'],
+            [(endpoint.id, start + timedelta(milliseconds=index), source, f"| {line}") for index, line in enumerate(lines)]
+        )
+        return endpoint
+
+    def get_lines(self, sample_line: str, other_line: str) -> List[str]:
+        # Every fourth line is not a sample, like the state changes and timeouts in the real logs.
+        return [
+            sample_line.format(
+                index=index, offset=index - self.num_records // 2, delay=50000 + index % 1000,
+                offset_seconds=(index - self.num_records // 2) / units.NANOSECONDS_IN_SECOND,
+                delay_seconds=(50000 + index % 1000) / units.NANOSECONDS_IN_SECOND,
+            )
+            if index % 4 != 0 else other_line
+            for index in range(self.num_records)
+        ]
+
+    def measure(self, vendor: Vendor, source: str, lines: List[str], reference: bool = True):
+        endpoint = self.get_dummy_endpoint(vendor, source, lines)
+        start = time.perf_counter()
+        count = vendor.parse_log_data(endpoint)
+        parser_duration = time.perf_counter() - start
+        self.assertEqual(2 * (self.num_records - self.num_records // 4), count)
+
+        message = f"Parsing {self.num_records} {vendor.id} log records on {connection.vendor}: " \
+                  f"log parser {self.num_records / parser_duration:.0f} records/s"
+
+        if reference:
+            reference_endpoint = self.get_dummy_endpoint(vendor, source, lines)
+            start = time.perf_counter()
+            reference_count = Vendor.extract_sample_from_log_using_regex(
+                reference_endpoint, source, vendor.sample_log_pattern, vendor.sample_number_conversion,
+            )
+            reference_duration = time.perf_counter() - start
+            self.assertEqual(reference_count, count)
+            self.assertEqual(self.get_samples(reference_endpoint), self.get_samples(endpoint))
+            message += f", per-record regex {self.num_records / reference_duration:.0f} records/s " \
+                       f"(speedup {reference_duration / parser_duration:.1f}x)"
+
+        logging.info(message)
+        if reference:
+            self.assertGreater(reference_duration / parser_duration, self.minimum_speedup)
+
+    @staticmethod
+    def get_samples(endpoint: PTPEndpoint) -> List:
+        return list(endpoint.sample_set.order_by("timestamp", "sample_type").values_list("timestamp", "sample_type", "value"))
+
+    def test_linuxptp(self):
+        self.measure(LinuxPTPVendor(), LinuxPTPVendor.sample_log_source, self.get_lines(
+            "ptp4l[{index}.123]: master offset {offset:10d} s2 freq   -2573 path delay {delay:9d}",
+            "ptp4l[1031.123]: port 1: announce timeout",
+        ))
+
+    def test_sptp(self):
+        self.measure(SPTPVendor(), SPTPVendor.sample_log_source, self.get_lines(
+            'time="2024-04-10T20:43:50Z" level=info msg="offset {offset:10d} s2 freq     -12 path delay {delay:10d} (52100: 52110)"',
+            'time="2024-04-10T20:43:51Z" level=warning msg="GM changed to 000000.fffe.000001"',
+        ))
+
+    def test_chrony(self):
+        self.measure(ChronyVendor(), ChronyVendor.sample_log_source, self.get_lines(
+            "2024-04-10 20:43:50 10.0.0.56       N 10 111 111 1111   0  0 1.00 {offset_seconds:.3e}  {delay_seconds:.3e}  1.146e-07  0.000e+00  0.000e+00 7F7F0101 4I K K",
+            "   Date (UTC) Time     IP Address   L St 123 567 ABCD  LP RP Score    Offset  Peer del. Peer disp.  Root del. Root disp. Refid     MTxRx",
+        ))
+
+    def test_ptpd(self):
+        # The first line (not a sample) is replaced by the CSV header, PTPd has no per-record regex to compare against.
+        lines = self.get_lines(
+            "2024-03-06 19:32:49.655021, slv, dca632fffecdcf52(unknown)/1,  {delay_seconds:.9f}, {offset_seconds:.9f},  0.000092819,  0.000028279, -6677.771000000, D, 0.000061376, 221, -0.000044591, 10390, -5282, 392,  0.000028279,  0.000092819",
+            "2024-03-06 19:32:48.655021, lstn_reset, dca632fffecdcf52(unknown)/1,  0.000000000,  0.000000000,  0.000000000,  0.000000000, 0.000000000, I, 0.000000000, 0, 0.000000000, 0, 0, 0,  0.000000000,  0.000000000",
+        )
+        lines[0] = "# Timestamp, State, Clock ID, One Way Delay, Offset From Master, Slave to Master, Master to Slave, Observed Drift, Last packet Received, One Way Delay Mean, One Way Delay Std Dev, Offset From Master Mean, Offset From Master Std Dev, Observed Drift Mean, Observed Drift Std Dev, raw delayMS, raw delaySM"
+        self.measure(PTPDVendor(), "stdbuf", lines, reference=False)
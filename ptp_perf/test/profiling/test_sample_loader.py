@@ -0,0 +1,93 @@
+import logging
+import time
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+import pandas as pd
+
+from ptp_perf.utilities.django_utilities import bootstrap_django_environment
+bootstrap_django_environment()
+
+from django.db import connection
+from django.test import TestCase
+
+from ptp_perf.models import PTPProfile, PTPEndpoint, Sample
+from ptp_perf.models.endpoint import TimeNormalizationStrategy
+from ptp_perf.models.sample_loader import load_sample_arrays
+from ptp_perf.util import setup_logging
+from ptp_perf.utilities.bulk_insert import bulk_insert
+
+
+class TestSampleLoader(TestCase):
+    num_samples = 100000
+    minimum_speedup = 1.5
+    """Required speedup of the array loader over loading the same samples through the ORM."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        setup_logging()
+
+    def setUp(self):
+        self.start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        profile = PTPProfile.objects.create(
+            benchmark_id="test-benchmark", vendor_id="test-vendor", start_time=self.start_time, stop_time=self.start_time
+        )
+        self.endpoint = PTPEndpoint.objects.create(profile=profile, machine_id="test")
+        bulk_insert(
+            Sample, ['endpoint', 'timestamp', 'sample_type', 'value'],
+            [
+                (self.endpoint.id, self.start_time + timedelta(seconds=index // 2, microseconds=index % 1000),
+                 Sample.SampleType.CLOCK_DIFF if index % 2 == 0 else Sample.SampleType.PATH_DELAY,
+                 index - self.num_samples // 2)
+                for index in range(self.num_samples)
+            ]
+        )
+
+    def load_reference(self, sample_type: Sample.SampleType, minimum_timestamp: datetime = None) -> pd.Series:
+        sample_set = self.endpoint.sample_set.filter(sample_type=sample_type).order_by('id')
+        if minimum_timestamp is not None:
+            sample_set = sample_set.filter(timestamp__gte=minimum_timestamp)
+        return pd.DataFrame(sample_set.values("timestamp", "value")).set_index("timestamp")["value"]
+
+    def test_same_as_orm(self):
+        minimum_timestamp = self.start_time + timedelta(seconds=100, microseconds=500)
+        arrays = load_sample_arrays(
+            self.endpoint.id, [Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY, Sample.SampleType.FAULT],
+            minimum_timestamp=minimum_timestamp,
+        )
+        self.assertEqual(0, len(arrays[Sample.SampleType.FAULT][0]))
+
+        for sample_type in [Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY]:
+            reference = self.load_reference(sample_type, minimum_timestamp)
+            timestamps, values = arrays[sample_type]
+            np.testing.assert_array_equal(reference.values, values)
+            np.testing.assert_array_equal(reference.index.as_unit("ns").asi8, timestamps)
+
+        self.endpoint.clock_step_timestamp = minimum_timestamp
+        series = self.endpoint.load_samples_to_series(
+            Sample.SampleType.CLOCK_DIFF, converged_only=False, normalize_time=TimeNormalizationStrategy.NONE
+        )
+        self.assertIsInstance(series.index.dtype, pd.DatetimeTZDtype)
+        self.assertEqual(len(arrays[Sample.SampleType.CLOCK_DIFF][0]), len(series))
+
+    def test_throughput(self):
+        sample_types = [Sample.SampleType.CLOCK_DIFF, Sample.SampleType.PATH_DELAY]
+
+        start = time.perf_counter()
+        references = [self.load_reference(sample_type) for sample_type in sample_types]
+        orm_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        arrays = load_sample_arrays(self.endpoint.id, sample_types)
+        loader_duration = time.perf_counter() - start
+
+        logging.info(
+            f"Loading {self.num_samples} samples on {connection.vendor}: "
+            f"ORM {self.num_samples / orm_duration:.0f} rows/s, "
+            f"array loader {self.num_samples / loader_duration:.0f} rows/s "
+            f"(speedup {orm_duration / loader_duration:.1f}x)"
+        )
+        for sample_type, reference in zip(sample_types, references):
+            np.testing.assert_array_equal(reference.values, arrays[sample_type][1])
+        self.assertGreater(orm_duration / loader_duration, self.minimum_speedup)
@@ -0,0 +1,83 @@
+import logging
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from ptp_perf.profiles.data_container import Timeseries, MergedTimeSeries, COLUMN_TIMESTAMP_INDEX, \
+    COLUMN_CLOCK_DIFF, COLUMN_PATH_DELAY
+from ptp_perf.util import setup_logging
+
+
+class TestTimeseriesSerialization(TestCase):
+    num_samples = 200000
+    minimum_speedup = 2
+    """Required speedup of loading the columnar format over loading JSON."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        setup_logging()
+
+    def get_series(self) -> Timeseries:
+        rng = np.random.default_rng(0)
+        # Samples about once per second with some jitter, like a converged profile.
+        timestamps = np.arange(self.num_samples, dtype=np.int64) * 1_000_000_000 + rng.integers(0, 1000, self.num_samples)
+        frame = pd.DataFrame(
+            {
+                COLUMN_CLOCK_DIFF: rng.standard_normal(self.num_samples) * 1e-6,
+                COLUMN_PATH_DELAY: 50e-6 + np.abs(rng.standard_normal(self.num_samples)) * 1e-6,
+            },
+            index=pd.TimedeltaIndex(timestamps.view("timedelta64[ns]"), name=COLUMN_TIMESTAMP_INDEX),
+        )
+        return Timeseries.from_series(frame, copy=False)
+
+    def measure_load(self, name: str, data, reference: pd.DataFrame, repetitions: int = 3,
+                     tolerance: float = 0) -> float:
+        durations = []
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            frame = Timeseries(data).data_frame
+            durations.append(time.perf_counter() - start)
+        pd.testing.assert_frame_equal(reference, frame, check_exact=tolerance == 0, atol=tolerance)
+        duration = min(durations)
+        logging.info(f"Loading {self.num_samples} samples from {name}: {len(data) / 1024 ** 2:.1f} MiB, "
+                     f"{duration * 1000:.1f} ms")
+        return duration
+
+    def test_load(self):
+        series = self.get_series()
+        json_duration = self.measure_load(
+            "JSON", series.to_json(), series.data_frame, tolerance=1e-10
+        )
+        binary_duration = self.measure_load("columnar", series.to_bytes(), series.data_frame)
+        compressed_duration = self.measure_load(
+            "compressed columnar", series.to_bytes(compress=True), series.data_frame
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory).joinpath("series.bin")
+            series.save(path)
+            start = time.perf_counter()
+            frame = Timeseries.load(path).data_frame
+            mapped_duration = time.perf_counter() - start
+            logging.info(f"Loading {self.num_samples} samples from a memory mapped file: "
+                         f"{mapped_duration * 1000:.1f} ms")
+            pd.testing.assert_frame_equal(series.data_frame, frame)
+
+        self.assertLess(len(series.to_bytes(compress=True)), len(series.to_bytes()))
+        self.assertLess(len(series.to_bytes()), len(series.to_json()))
+        for duration in [binary_duration, compressed_duration, mapped_duration]:
+            self.assertGreater(json_duration / duration, self.minimum_speedup)
+
+    def test_merge(self):
+        series = [self.get_series() for _ in range(4)]
+        start = time.perf_counter()
+        merged = MergedTimeSeries.merge_series(series, ["a", "b", "c", "d"], timestamp_align=True)
+        logging.info(f"Merging {len(series)} series of {self.num_samples} samples: "
+                     f"{(time.perf_counter() - start) * 1000:.1f} ms")
+        self.assertIsNone(merged.data)
+        self.assertEqual(len(series) * self.num_samples, len(merged.data_frame))
@@ -0,0 +1,138 @@
+import itertools
+import typing
+from datetime import datetime
+from typing import Iterable, List, Sequence, Type
+
+import numpy as np
+from django.db import connection, models, transaction
+from django.db.models.constants import OnConflict
+
+if typing.TYPE_CHECKING:
+    from ptp_perf.models import PTPEndpoint
+
+
+def _columns(model: Type[models.Model], field_names: Sequence[str]) -> List[models.Field]:
+    return [model._meta.get_field(field_name) for field_name in field_names]
+
+
+def bulk_insert(model: Type[models.Model], field_names: Sequence[str], rows: Iterable[Sequence],
+                chunk_size: int = 10000, ignore_conflicts: bool = False) -> int:
+    """Insert rows into the table of model without creating model instances.
+
+    Rows contain one value per field in field_names (foreign keys by their primary key, e.g. 'endpoint' -> endpoint id),
+    as plain python values (int, str, timezone aware datetime). Returns the number of rows sent to the database.
+    On PostgreSQL, the rows are streamed with COPY FROM STDIN, otherwise they are inserted with executemany in chunks.
+    With ignore_conflicts, rows violating a unique constraint are skipped (so the returned count may be too high).
+    """
+    columns = _columns(model, field_names)
+    if connection.vendor == 'postgresql':
+        return _copy_insert(model, columns, rows, ignore_conflicts)
+    return _execute_many_insert(model, columns, rows, chunk_size, ignore_conflicts)
+
+
+def _copy_insert(model: Type[models.Model], columns: List[models.Field], rows: Iterable[Sequence],
+                 ignore_conflicts: bool) -> int:
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    column_list = ", ".join(quote_name(column.column) for column in columns)
+    count = 0
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if ignore_conflicts:
+            # COPY cannot skip conflicting rows, so we copy into a temporary table and insert from there.
+            # The temporary table only has the copied columns (without e.g. the identity column id).
+            target = quote_name(f"bulk_insert_{model._meta.db_table}")
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {target} AS SELECT {column_list} FROM {table} WITH NO DATA"
+            )
+        else:
+            target = table
+
+        with cursor.copy(f"COPY {target} ({column_list}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+                count += 1
+
+        if ignore_conflicts:
+            cursor.execute(
+                f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {target} ON CONFLICT DO NOTHING"
+            )
+            # Dropped right away (not on commit), so that it can be created again within an outer transaction.
+            cursor.execute(f"DROP TABLE {target}")
+    return count
+
+
+def _execute_many_insert(model: Type[models.Model], columns: List[models.Field], rows: Iterable[Sequence],
+                         chunk_size: int, ignore_conflicts: bool) -> int:
+    operations = connection.ops
+    statement = operations.insert_statement(on_conflict=OnConflict.IGNORE if ignore_conflicts else None)
+    sql = (
+        f"{statement} {operations.quote_name(model._meta.db_table)} "
+        f"({', '.join(operations.quote_name(column.column) for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    # Same conversion as the ORM would apply (e.g. timezone handling on SQLite), only for the fields that need it.
+    datetime_columns = [
+        index for index, column in enumerate(columns) if isinstance(column, models.DateTimeField)
+    ]
+
+    count = 0
+    rows = iter(rows)
+    with transaction.atomic(), connection.cursor() as cursor:
+        while chunk := list(itertools.islice(rows, chunk_size)):
+            if len(datetime_columns) > 0:
+                chunk = [list(row) for row in chunk]
+                for row in chunk:
+                    for index in datetime_columns:
+                        row[index] = operations.adapt_datetimefield_value(row[index])
+            cursor.executemany(sql, chunk)
+            count += len(chunk)
+    return count
+
+
+class SampleWriter:
+    """Buffers samples of an endpoint and inserts them with bulk_insert once chunk_size samples are pending.
+
+    Use as a context manager or call flush() at the end. count is the total number of samples added."""
+    endpoint_id: int
+    chunk_size: int
+    count: int = 0
+
+    _buffer: List[tuple]
+
+    def __init__(self, endpoint: "PTPEndpoint", chunk_size: int = 50000):
+        self.endpoint_id = endpoint.id
+        self.chunk_size = chunk_size
+        self._buffer = []
+
+    def add(self, timestamp: datetime, sample_type: str, value: int):
+        self._buffer.append((self.endpoint_id, timestamp, sample_type, int(value)))
+        self.count += 1
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def add_many(self, timestamps: Sequence[datetime], sample_type: str, values: Sequence[int]):
+        """Add samples of one type, e.g. from the arrays of a log parser."""
+        if len(timestamps) != len(values):
+            raise ValueError(f"Received {len(timestamps)} timestamps but {len(values)} values.")
+        if isinstance(values, np.ndarray):
+            # Python ints, like add().
+            values = values.tolist()
+        self._buffer.extend(zip(itertools.repeat(self.endpoint_id), timestamps, itertools.repeat(sample_type), values))
+        self.count += len(values)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        from ptp_perf.models import Sample
+
+        if len(self._buffer) != 0:
+            bulk_insert(Sample, ['endpoint', 'timestamp', 'sample_type', 'value'], self._buffer)
+            self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,217 @@
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+@dataclass
+class CacheStatistics:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups != 0 else None
+
+
+class CacheStore:
+    """A persistent key-value store of binary entries in an SQLite database (in WAL mode),
+    which can be used by several processes at once. Entries are read and written individually.
+
+    Entries belong to a namespace with a version: opening a namespace with a new version drops the entries of the
+    other versions (e.g. when the format of the values changed). When the entries of a namespace exceed max_size bytes,
+    the least recently used ones are evicted until the namespace is below eviction_target of max_size.
+    The total size of every namespace is maintained by triggers, so writes below max_size do not scan the entries.
+    Reads do not write: access times are kept in memory and written with the next write (or after
+    access_flush_interval seconds or access_flush_size reads). The hits, misses, writes and evictions of this process
+    are counted."""
+    eviction_target: float = 0.9
+    access_flush_interval: float = 60
+    access_flush_size: int = 1000
+
+    def __init__(self, path: Path, namespace: str, version: int = 1, max_size: Optional[int] = 256 * 1024 ** 2):
+        self.path = Path(path)
+        self.namespace = namespace
+        self.version = version
+        self.max_size = max_size
+        self.statistics = CacheStatistics()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        self._pending_access: Dict[str, float] = {}
+        self._pending_access_since: Optional[float] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # Connections must not be shared with forked worker processes.
+        if self._connection is None or self._connection_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                self._create_schema(connection)
+                connection.execute(
+                    "DELETE FROM cache_entry WHERE namespace = ? AND version != ?", (self.namespace, self.version)
+                )
+            self._connection = connection
+            self._connection_pid = os.getpid()
+            self._pending_access = {}
+            self._pending_access_since = None
+        return self._connection
+
+    @staticmethod
+    def _create_schema(connection: sqlite3.Connection):
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entry ("
+            "namespace TEXT NOT NULL, version INTEGER NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS cache_entry_last_access ON cache_entry (namespace, last_access)"
+        )
+        if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'cache_namespace'").fetchone() is not None:
+            return
+        # The total size of the entries of every namespace, kept up to date by the triggers.
+        connection.execute("CREATE TABLE cache_namespace (namespace TEXT PRIMARY KEY, size INTEGER NOT NULL)")
+        connection.execute(
+            "INSERT INTO cache_namespace (namespace, size) "
+            "SELECT namespace, SUM(size) FROM cache_entry GROUP BY namespace"
+        )
+        connection.execute(
+            "CREATE TRIGGER cache_entry_insert AFTER INSERT ON cache_entry BEGIN "
+            "INSERT OR IGNORE INTO cache_namespace (namespace, size) VALUES (NEW.namespace, 0); "
+            "UPDATE cache_namespace SET size = size + NEW.size WHERE namespace = NEW.namespace; END"
+        )
+        connection.execute(
+            "CREATE TRIGGER cache_entry_update AFTER UPDATE OF size ON cache_entry BEGIN "
+            "UPDATE cache_namespace SET size = size + NEW.size - OLD.size WHERE namespace = NEW.namespace; END"
+        )
+        connection.execute(
+            "CREATE TRIGGER cache_entry_delete AFTER DELETE ON cache_entry BEGIN "
+            "UPDATE cache_namespace SET size = size - OLD.size WHERE namespace = OLD.namespace; END"
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The value of the key, None if it is not cached."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """The values of the keys that are cached."""
+        keys = list(keys)
+        result = {}
+        # Stay below the maximum number of SQLite parameters.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ", ".join(["?"] * len(chunk))
+            result.update(self.connection.execute(
+                f"SELECT key, value FROM cache_entry WHERE namespace = ? AND key IN ({placeholders})",
+                (self.namespace, *chunk)
+            ).fetchall())
+        self.statistics.hits += len(result)
+        self.statistics.misses += len(keys) - len(result)
+
+        now = time.time()
+        self._pending_access.update(dict.fromkeys(result, now))
+        if self._pending_access_since is None:
+            self._pending_access_since = now
+        if (len(self._pending_access) >= self.access_flush_size
+                or now - self._pending_access_since >= self.access_flush_interval):
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                self._flush_access()
+        return result
+
+    def _flush_access(self):
+        """Write the pending access times, within a write transaction."""
+        if len(self._pending_access) != 0:
+            self.connection.executemany(
+                "UPDATE cache_entry SET last_access = MAX(last_access, ?) WHERE namespace = ? AND key = ?",
+                [(last_access, self.namespace, key) for key, last_access in self._pending_access.items()]
+            )
+        self._pending_access = {}
+        self._pending_access_since = None
+
+    def put(self, key: str, value: bytes):
+        self.put_many({key: value})
+
+    def put_many(self, entries: Dict[str, bytes]):
+        """Insert or replace the entries in one transaction, evicting entries if the namespace gets too large."""
+        now = time.time()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self._flush_access()
+            # An upsert instead of INSERT OR REPLACE, whose implicit delete would not fire the delete trigger.
+            self.connection.executemany(
+                "INSERT INTO cache_entry (namespace, version, key, value, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (namespace, key) DO UPDATE SET "
+                "version = excluded.version, value = excluded.value, size = excluded.size, "
+                "last_access = excluded.last_access",
+                [(self.namespace, self.version, key, value, len(value), now) for key, value in entries.items()]
+            )
+            self._evict()
+        self.statistics.writes += len(entries)
+
+    def evict(self):
+        """Remove the least recently used entries if the namespace does not fit into max_size."""
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self._flush_access()
+            self._evict()
+
+    def _evict(self):
+        if self.max_size is None:
+            return
+        size = self.size()
+        if size <= self.max_size:
+            return
+        excess_size = size - int(self.eviction_target * self.max_size)
+        evicted_keys = []
+        # Only the least recently used entries are read from the index, not the entire namespace.
+        cursor = self.connection.execute(
+            "SELECT key, size FROM cache_entry WHERE namespace = ? ORDER BY last_access, key", (self.namespace,)
+        )
+        for key, entry_size in cursor:
+            if excess_size <= 0:
+                break
+            evicted_keys.append(key)
+            excess_size -= entry_size
+        cursor.close()
+        self.connection.executemany(
+            "DELETE FROM cache_entry WHERE namespace = ? AND key = ?", [(self.namespace, key) for key in evicted_keys]
+        )
+        self.statistics.evictions += len(evicted_keys)
+
+    def delete(self, key: str):
+        self._pending_access.pop(key, None)
+        self.connection.execute("DELETE FROM cache_entry WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self):
+        self._pending_access = {}
+        self._pending_access_since = None
+        self.connection.execute("DELETE FROM cache_entry WHERE namespace = ?", (self.namespace,))
+
+    def size(self) -> int:
+        """The total size of the values of the namespace in bytes."""
+        row = self.connection.execute(
+            "SELECT size FROM cache_namespace WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return row[0] if row is not None else 0
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM cache_entry WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def close(self):
+        if self._connection is not None and self._connection_pid == os.getpid():
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._flush_access()
+            self._connection.close()
+        self._connection = None
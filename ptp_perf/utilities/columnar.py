@@ -0,0 +1,125 @@
+import json
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Layout: header, metadata (JSON, padded to 8 bytes), payload (the columns one after another, each padded to 8 bytes).
+# Header: magic, format version, flags, metadata length in bytes, number of rows.
+_HEADER = struct.Struct("<4sHHIQ4x")
+_MAGIC = b"PTPC"
+_FORMAT_VERSION = 1
+_FLAG_COMPRESSED = 0x1
+_ALIGNMENT = 8
+
+Buffer = Union[bytes, bytearray, memoryview, np.ndarray]
+
+_NUMERIC_TYPES = {
+    "int64": "<i8",
+    "float64": "<f8",
+    "timedelta64[ns]": "<i8",
+    "datetime64[ns]": "<i8",
+}
+_CATEGORY_CODE_TYPE = "<i4"
+
+
+def _padding(length: int) -> bytes:
+    return b"\0" * (-length % _ALIGNMENT)
+
+
+def _encode_values(values) -> Tuple[str, np.ndarray, Dict[str, Any]]:
+    array = np.asarray(values)
+    if array.dtype.kind in "mM":
+        type = "timedelta64[ns]" if array.dtype.kind == "m" else "datetime64[ns]"
+        return type, array.astype(type, copy=False).view(np.int64).astype("<i8", copy=False), {}
+    if array.dtype.kind in "iu":
+        return "int64", array.astype("<i8", copy=False), {}
+    if array.dtype.kind == "f":
+        return "float64", array.astype("<f8", copy=False), {}
+    # Anything else (e.g. the source labels of merged series) is stored as codes into a table of labels.
+    codes, labels = pd.factorize(array, use_na_sentinel=False)
+    return "category", codes.astype(_CATEGORY_CODE_TYPE), {"labels": labels.tolist()}
+
+
+def _decode_values(payload: np.ndarray, column: Dict[str, Any], rows: int) -> np.ndarray:
+    type = column["type"]
+    if type == "category":
+        codes = np.frombuffer(payload, dtype=_CATEGORY_CODE_TYPE, count=rows, offset=column["offset"])
+        # The extra element keeps numpy from turning sequence labels (e.g. tuples) into another dimension.
+        return np.asarray(column["labels"] + [None], dtype=object)[:-1][codes]
+    values = np.frombuffer(payload, dtype=_NUMERIC_TYPES[type], count=rows, offset=column["offset"])
+    return values.view(type) if type != "int64" and type != "float64" else values
+
+
+def encode_frame(frame: pd.DataFrame, compress: bool = False) -> bytes:
+    """Serialize the frame column by column: every index level and column is stored as raw little-endian values
+    (int64 for integers, timedeltas and datetimes, float64 for floats, int32 codes and a label table otherwise).
+    With compress, the payload is compressed with zlib, otherwise it can be read without copying (see decode_frame)."""
+    metadata: Dict[str, List[Dict[str, Any]]] = {"index": [], "columns": []}
+    chunks = []
+    offset = 0
+    entries = [("index", name, frame.index.get_level_values(level)) for level, name in enumerate(frame.index.names)]
+    entries += [("columns", name, frame[name]) for name in frame.columns]
+    for section, name, values in entries:
+        type, array, extra = _encode_values(values)
+        data = array.tobytes()
+        metadata[section].append({"name": name, "type": type, "offset": offset, **extra})
+        chunks += [data, _padding(len(data))]
+        offset += len(data) + len(chunks[-1])
+
+    payload = b"".join(chunks)
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload)
+        flags |= _FLAG_COMPRESSED
+    metadata_bytes = json.dumps(metadata, default=str).encode()
+    return b"".join([
+        _HEADER.pack(_MAGIC, _FORMAT_VERSION, flags, len(metadata_bytes), len(frame)),
+        metadata_bytes, _padding(len(metadata_bytes)), payload,
+    ])
+
+
+def _read_header(data: np.ndarray) -> Tuple[int, int, int]:
+    if len(data) < _HEADER.size:
+        raise ValueError(f"Not a columnar frame (only {len(data)} bytes).")
+    magic, format_version, flags, metadata_length, rows = _HEADER.unpack(data[:_HEADER.size].tobytes())
+    if magic != _MAGIC:
+        raise ValueError(f"Not a columnar frame (magic {magic!r}).")
+    if format_version != _FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar frame format version {format_version}.")
+    return flags, metadata_length, rows
+
+
+def is_compressed(buffer: Buffer) -> bool:
+    flags, _, _ = _read_header(np.frombuffer(buffer, dtype=np.uint8))
+    return bool(flags & _FLAG_COMPRESSED)
+
+
+def decode_frame(buffer: Buffer) -> pd.DataFrame:
+    """Deserialize a frame of encode_frame. If the buffer is not compressed, the index levels and numeric columns
+    are read-only views of the buffer (e.g. a memory map of a file, see map_file) instead of copies."""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    flags, metadata_length, rows = _read_header(data)
+    metadata = json.loads(data[_HEADER.size:_HEADER.size + metadata_length].tobytes())
+    payload = data[_HEADER.size + metadata_length + len(_padding(metadata_length)):]
+    if flags & _FLAG_COMPRESSED:
+        payload = np.frombuffer(zlib.decompress(payload), dtype=np.uint8)
+
+    levels = [_decode_values(payload, column, rows) for column in metadata["index"]]
+    names = [column["name"] for column in metadata["index"]]
+    if len(levels) == 1:
+        index = pd.Index(levels[0], name=names[0], copy=False)
+    else:
+        index = pd.MultiIndex.from_arrays(levels, names=names)
+    return pd.DataFrame(
+        {column["name"]: _decode_values(payload, column, rows) for column in metadata["columns"]},
+        index=index, copy=False,
+    )
+
+
+def map_file(path: Path) -> np.ndarray:
+    """Memory map a file (read-only), to be decoded with decode_frame."""
+    return np.memmap(path, dtype=np.uint8, mode="r")
@@ -4,9 +4,10 @@ from typing import Callable
 
 from admin_actions.admin import ActionsModelAdmin
 from django.core.exceptions import FieldDoesNotExist
-from django.db import connection, models
+from django.db import models
 
 from ptp_perf.utilities import units
+from ptp_perf.utilities.server_clock import ServerClock
 
 
 def bootstrap_django_environment():
@@ -21,10 +22,9 @@ def bootstrap_django_environment():
 
 
 def get_server_datetime():
-    """Function to query the current time from the database because we often have no idea what time it is."""
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT NOW()")
-        return cursor.fetchone()[0]
+    """The current time of the database server because we often have no idea what time it is.
+    Estimated from the local monotonic clock, see ServerClock."""
+    return ServerClock.resolve().now()
 
 
 def create_format_function(field: models.FloatField, format_function: Callable[[float], str]) -> Callable:
@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, TextIO
+
+from django.db import connection, DatabaseError
+
+from ptp_perf.constants import LOCAL_DIR
+from ptp_perf.utilities.bulk_insert import bulk_insert
+from ptp_perf.utilities.server_clock import ns_to_datetime, ServerClock
+
+SPOOL_DIR = LOCAL_DIR.joinpath("spool")
+
+
+@dataclass
+class SpooledLogRecord:
+    sequence: int
+    timestamp: int
+    """Server time in ns since the epoch."""
+    source: str
+    message: str
+
+
+class LogSpool:
+    """Append-only on-disk spool of the log records of one endpoint, so that logging continues at memory speed while
+    the database is unreachable (e.g. during hardware fault benchmarks).
+
+    Records are stored as JSON lines in segment files named after the sequence number of their first record.
+    Every record gets a sequence number that is unique per endpoint. The database enforces uniqueness of
+    (endpoint, sequence), so uploading a record multiple times (e.g. when resuming an interrupted upload) is harmless.
+    The sequence number of the last uploaded record is kept in a checkpoint file and fully uploaded segments are deleted.
+    The spool directory is removed when it is closed empty, so a restarted endpoint must pass the last sequence number
+    in the database as last_sequence, otherwise its records would conflict with (and be dropped in favor of) the
+    records of the previous run.
+    """
+    endpoint_id: int
+    path: Path
+    segment_size: int
+
+    _next_sequence: int
+    _committed_sequence: int
+    _segment_file: Optional[TextIO] = None
+    _segment_first_sequence: Optional[int] = None
+    _read_position: Optional[Tuple[int, int]] = None
+    """Reader state: (first sequence of the segment, byte offset within segment)."""
+
+    def __init__(self, endpoint_id: int, directory: Path = SPOOL_DIR, segment_size: int = 16 * 1024 ** 2,
+                 last_sequence: int = 0):
+        self.endpoint_id = endpoint_id
+        self.path = directory.joinpath(str(endpoint_id))
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+
+        # Records up to last_sequence are in the database already.
+        self._committed_sequence = max(self._read_checkpoint(), last_sequence)
+        self._next_sequence = max(self._committed_sequence, self._recover_last_sequence()) + 1
+
+    @staticmethod
+    def find_existing(directory: Path = SPOOL_DIR) -> List["LogSpool"]:
+        """Open all spools left behind in the spool directory, e.g. by a previous run that could not finish uploading."""
+        if not directory.exists():
+            return []
+        return [LogSpool(int(path.name), directory) for path in directory.iterdir() if path.is_dir() and path.name.isdigit()]
+
+    @property
+    def checkpoint_path(self) -> Path:
+        return self.path.joinpath("checkpoint")
+
+    def _segment_path(self, first_sequence: int) -> Path:
+        return self.path.joinpath(f"{first_sequence:012d}.jsonl")
+
+    def _segments(self) -> List[int]:
+        return sorted(int(path.stem) for path in self.path.glob("*.jsonl"))
+
+    def _read_checkpoint(self) -> int:
+        try:
+            return int(self.checkpoint_path.read_text())
+        except FileNotFoundError:
+            return 0
+
+    def _recover_last_sequence(self) -> int:
+        """Find the last sequence number written, dropping a partially written last line (e.g. after a crash)."""
+        segments = self._segments()
+        if len(segments) == 0:
+            return 0
+        segment_path = self._segment_path(segments[-1])
+        content = segment_path.read_bytes()
+        complete_length = content.rfind(b"\n") + 1
+        if complete_length != len(content):
+            with segment_path.open("r+b") as segment_file:
+                segment_file.truncate(complete_length)
+        if complete_length == 0:
+            return segments[-1] - 1
+        last_line = content[content.rfind(b"\n", 0, complete_length - 1) + 1:complete_length]
+        return json.loads(last_line)[0]
+
+    def append(self, records: Iterable[Tuple[int, str, str]]) -> int:
+        """Append records given as (timestamp in ns, source, message) tuples. Returns the number of records appended."""
+        count = 0
+        with self._lock:
+            for timestamp, source, message in records:
+                if self._segment_file is None or self._segment_file.tell() >= self.segment_size:
+                    self._open_segment()
+                self._segment_file.write(json.dumps([self._next_sequence, timestamp, source, message]) + "\n")
+                self._next_sequence += 1
+                count += 1
+        return count
+
+    def _open_segment(self):
+        if self._segment_file is not None:
+            self._segment_file.close()
+        self._segment_first_sequence = self._next_sequence
+        self._segment_file = self._segment_path(self._segment_first_sequence).open("a", encoding="utf-8")
+
+    def flush(self):
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.flush()
+
+    def read_pending(self, max_records: int) -> List[SpooledLogRecord]:
+        """Read up to max_records records that were not committed yet, in order.
+        Consecutive calls continue where the previous one stopped, regardless of whether the records were committed."""
+        self.flush()
+        records = []
+        segments = self._segments()
+        if self._read_position is None or self._read_position[0] not in segments:
+            self._read_position = (segments[0], 0) if len(segments) > 0 else None
+
+        while self._read_position is not None and len(records) < max_records:
+            segment, offset = self._read_position
+            with self._segment_path(segment).open("rb") as segment_file:
+                segment_file.seek(offset)
+                while len(records) < max_records:
+                    line = segment_file.readline()
+                    if not line.endswith(b"\n"):
+                        # End of segment or line that is still being written
+                        break
+                    offset += len(line)
+                    sequence, timestamp, source, message = json.loads(line)
+                    if sequence > self._committed_sequence:
+                        records.append(SpooledLogRecord(sequence, timestamp, source, message))
+            self._read_position = (segment, offset)
+
+            later_segments = [later for later in segments if later > segment]
+            if len(records) < max_records and len(later_segments) > 0:
+                self._read_position = (later_segments[0], 0)
+            else:
+                break
+        return records
+
+    def rewind(self):
+        """Restart reading at the first uncommitted record, e.g. after a failed upload."""
+        self._read_position = None
+
+    def commit(self, sequence: int):
+        """Mark all records up to and including sequence as uploaded and delete segments that are no longer needed."""
+        checkpoint_temporary = self.checkpoint_path.with_suffix(".tmp")
+        checkpoint_temporary.write_text(str(sequence))
+        os.replace(checkpoint_temporary, self.checkpoint_path)
+        self._committed_sequence = sequence
+
+        segments = self._segments()
+        with self._lock:
+            for segment, next_segment in zip(segments, segments[1:]):
+                # Keep the active segment and any segment still containing uncommitted records
+                if next_segment - 1 <= sequence and segment != self._segment_first_sequence:
+                    self._segment_path(segment).unlink()
+
+    @property
+    def pending_records(self) -> int:
+        return self._next_sequence - 1 - self._committed_sequence
+
+    def close(self, remove_if_empty: bool = True):
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+        if remove_if_empty and self.pending_records == 0:
+            for path in self.path.iterdir():
+                path.unlink()
+            self.path.rmdir()
+
+
+class LogSpoolUploader:
+    """Uploads records from a log spool to the database in large batches.
+
+    A background thread uploads continuously while the database is reachable and retries after connection errors.
+    After a successful upload, it also refreshes the server clock estimate used to stamp spooled records.
+    stop() uploads everything that is left at the end of the run. Records that cannot be uploaded stay in the spool
+    and are uploaded by the next run (see upload_leftover_spools).
+    """
+    spool: LogSpool
+    batch_size: int
+    interval: timedelta
+    records_uploaded: int = 0
+    upload_failures: int = 0
+
+    _thread: Optional[threading.Thread] = None
+
+    def __init__(self, spool: LogSpool, batch_size: int = 5000, interval: timedelta = timedelta(seconds=5)):
+        self.spool = spool
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def upload_pending(self) -> int:
+        """Upload all pending records from the calling thread. Raises DatabaseError if the database is unreachable."""
+        from ptp_perf.models import LogRecord
+
+        uploaded = 0
+        self.spool.rewind()
+        while True:
+            records = self.spool.read_pending(self.batch_size)
+            if len(records) == 0:
+                return uploaded
+            bulk_insert(
+                LogRecord,
+                ['endpoint', 'timestamp', 'source', 'message', 'spool_sequence'],
+                [
+                    (self.spool.endpoint_id, ns_to_datetime(record.timestamp), record.source, record.message,
+                     record.sequence) for record in records
+                ],
+                ignore_conflicts=True,
+            )
+            self.spool.commit(records[-1].sequence)
+            uploaded += len(records)
+            self.records_uploaded += len(records)
+
+    def _run(self):
+        try:
+            while not self._stop_event.wait(self.interval.total_seconds()):
+                try:
+                    self.upload_pending()
+                    ServerClock.resolve().refresh_if_stale()
+                except DatabaseError as e:
+                    self.upload_failures += 1
+                    logging.warning(f"Log spool upload failed, retrying later: {e}")
+                    # Force a new connection on the next attempt.
+                    connection.close()
+        finally:
+            connection.close()
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="Log spool upload thread", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: timedelta = timedelta(minutes=1)):
+        """Stop the background thread and upload the remaining records, retrying until the timeout is reached."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+        deadline = time.monotonic() + timeout.total_seconds()
+        while True:
+            try:
+                self.upload_pending()
+                break
+            except DatabaseError as e:
+                connection.close()
+                if time.monotonic() >= deadline:
+                    logging.error(
+                        f"Could not upload {self.spool.pending_records} spooled log records: {e}. "
+                        f"They remain in {self.spool.path}."
+                    )
+                    break
+                time.sleep(1)
+        self.spool.close()
+
+
+def upload_leftover_spools(exclude_endpoint_id: int = None):
+    """Upload the spools of previous runs that could not be uploaded at the end of their run."""
+    for spool in LogSpool.find_existing():
+        if spool.endpoint_id == exclude_endpoint_id:
+            continue
+        logging.info(f"Uploading {spool.pending_records} leftover spooled log records of endpoint {spool.endpoint_id}.")
+        LogSpoolUploader(spool).stop(timeout=timedelta(0))
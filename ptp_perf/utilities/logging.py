@@ -1,47 +1,196 @@
 import logging
 import os
-from queue import Queue
-from threading import Thread
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Deque, Optional, Tuple
+
+from django.db import connection
 
 from ptp_perf.models import PTPEndpoint, LogRecord
-from ptp_perf.utilities.django_utilities import get_server_datetime
+from ptp_perf.utilities.bulk_insert import bulk_insert
+from ptp_perf.utilities.log_spool import LogSpool
+from ptp_perf.utilities.server_clock import ServerClock, datetime_to_ns, MONOTONIC_TIME_ATTRIBUTE
+
+
+@dataclass
+class LogToDBStatistics:
+    """Counters describing the health of the log to database pipeline."""
+    records_enqueued: int = 0
+    """Records accepted into the queue."""
+    records_written: int = 0
+    """Records saved to the database."""
+    records_dropped: int = 0
+    """Records rejected because the queue was full (see backpressure policy)."""
+    records_failed: int = 0
+    """Records lost because the database write of their batch failed."""
+    batches_written: int = 0
+    flush_duration_total: timedelta = timedelta(0)
+    flush_duration_max: timedelta = timedelta(0)
+    queue_depth_max: int = 0
+
+    @property
+    def flush_duration_mean(self) -> Optional[timedelta]:
+        if self.batches_written == 0:
+            return None
+        return self.flush_duration_total / self.batches_written
+
+    def __str__(self):
+        return (f"{self.records_written} records written in {self.batches_written} batches "
+                f"(mean flush {self.flush_duration_mean}, max flush {self.flush_duration_max}), "
+                f"{self.records_dropped} dropped, {self.records_failed} failed, max queue depth {self.queue_depth_max}")
+
+
+# A pending record: (local monotonic time of emission in ns, source, formatted message)
+PendingLogRecord = Tuple[int, str, str]
 
 
 class LogToDBLogRecordHandler(logging.Handler):
+    """Saves log messages to the database as log records of an endpoint.
+
+    Records are not saved synchronously: emit() only places the formatted message into a bounded in-memory queue.
+    A background thread drains the queue and saves the records with a single bulk insert per batch, either when
+    flush_batch_size records are pending or every flush_interval, whichever comes first.
+    Record timestamps are taken from the local monotonic clock on emission (or from the record's
+    MONOTONIC_TIME_ATTRIBUTE) and converted to the database server's time using the ServerClock,
+    so that clock jumps on the worker do not affect them.
+
+    If a spool is given, batches are appended to the worker-local spool instead of the database,
+    and a LogSpoolUploader is responsible for moving them to the database. Spooled batches never wait for the database:
+    they are stamped with the last clock estimate, which the uploader refreshes while the database is reachable.
+
+    Backpressure policy: when queue_size records are pending (the database cannot keep up or is unreachable),
+    new records are dropped and counted in the statistics. We never block the emitting thread,
+    as that would stall the event loop reading the output of the benchmarked processes.
+    """
     endpoint: PTPEndpoint
-    queue: Queue[LogRecord]
-    thread: Thread
+    flush_batch_size: int
+    flush_interval: timedelta
+    queue_size: int
+    statistics: LogToDBStatistics
+    spool: Optional[LogSpool]
+
+    _pending: Deque[PendingLogRecord]
+    _condition: threading.Condition
+    _write_lock: threading.Lock
+    _thread: Optional[threading.Thread] = None
+    _stopping: bool = False
 
-    def __init__(self, endpoint: PTPEndpoint, level=0):
+    def __init__(self, endpoint: PTPEndpoint, level=0, flush_batch_size: int = 500,
+                 flush_interval: timedelta = timedelta(seconds=1), queue_size: int = 50000,
+                 spool: LogSpool = None):
         super().__init__(level)
         self.endpoint = endpoint
-        # self.queue = Queue(maxsize=20)
-        # self.thread = Thread(self._run_db_save(), name="Log to DB save thread")
-        # self.thread.start()
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.statistics = LogToDBStatistics()
+        self.spool = spool
+
+        self._pending = deque()
+        self._condition = threading.Condition()
+        # Serializes batch writes so that records are saved in the order they were emitted.
+        self._write_lock = threading.Lock()
 
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
 
     def emit(self, record: logging.LogRecord):
-        db_record = LogRecord(
-            timestamp=get_server_datetime(),
-            endpoint=self.endpoint,
-            source=record.name,
-            message=self.format(record)
-        )
-        db_record.save()
+        # Don't feed the messages of the writer thread (e.g. database errors) back into the queue.
+        if self._thread is not None and record.thread == self._thread.ident:
+            return
 
+        emit_time = getattr(record, MONOTONIC_TIME_ATTRIBUTE, None)
+        entry = (emit_time if emit_time is not None else time.monotonic_ns(), record.name, self.format(record))
+        with self._condition:
+            if len(self._pending) >= self.queue_size:
+                self.statistics.records_dropped += 1
+                return
+            self._pending.append(entry)
+            self.statistics.records_enqueued += 1
+            self.statistics.queue_depth_max = max(self.statistics.queue_depth_max, len(self._pending))
+            if len(self._pending) >= self.flush_batch_size:
+                self._condition.notify()
 
-    def _run_db_save(self):
-        while True:
-            item: LogRecord = self.queue.get()
-            item.save()
+    def flush(self):
+        """Save all pending records to the database from the calling thread."""
+        with self._write_lock:
+            with self._condition:
+                entries = self._pending
+                self._pending = deque()
+            if len(entries) != 0:
+                self._write_batch(entries)
+
+    def _write_batch(self, entries: Deque[PendingLogRecord]):
+        start_time = time.monotonic_ns()
+        try:
+            server_clock = ServerClock.resolve()
+            if self.spool is not None:
+                self.spool.append(
+                    (datetime_to_ns(server_clock.server_time_of(emit_time, refresh=False)), source, message)
+                    for emit_time, source, message in entries
+                )
+            else:
+                bulk_insert(
+                    LogRecord,
+                    ['timestamp', 'endpoint', 'source', 'message'],
+                    [
+                        (server_clock.server_time_of(emit_time), self.endpoint.id, source, message)
+                        for emit_time, source, message in entries
+                    ]
+                )
+        except Exception as e:
+            self.statistics.records_failed += len(entries)
+            logging.warning(f"Failed to save {len(entries)} log records to the database: {e}")
+            return
 
+        flush_duration = timedelta(microseconds=(time.monotonic_ns() - start_time) // 1000)
+        self.statistics.records_written += len(entries)
+        self.statistics.batches_written += 1
+        self.statistics.flush_duration_total += flush_duration
+        self.statistics.flush_duration_max = max(self.statistics.flush_duration_max, flush_duration)
+
+    def _run_db_save(self):
+        try:
+            while True:
+                with self._condition:
+                    if not self._stopping and len(self._pending) < self.flush_batch_size:
+                        self._condition.wait(timeout=self.flush_interval.total_seconds())
+                    if self._stopping:
+                        # The remaining records are saved by uninstall()
+                        break
+                self.flush()
+        finally:
+            # Every thread gets its own database connection from django, which we need to clean up.
+            connection.close()
 
     def install(self):
         """Sets allow unsafe async for this to work :/"""
 
         # Cannot run save/time query from synchronous function within asynchronous context if this is unset :/
         os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"] = "true"
+        # Estimate the server clock offset now rather than when the first batch is written.
+        ServerClock.resolve().synchronize()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run_db_save, name="Log to DB save thread", daemon=True)
+        self._thread.start()
         logging.root.addHandler(self)
 
     def uninstall(self):
+        logging.info(f"Log to database: {self.statistics}")
         logging.root.removeHandler(self)
+
+        if self._thread is not None:
+            with self._condition:
+                self._stopping = True
+                self._condition.notify()
+            self._thread.join(timeout=30)
+            if self._thread.is_alive():
+                logging.warning("Log to database thread did not exit in time.")
+            self._thread = None
+
+        # Save the remaining records from the calling thread.
+        self.flush()
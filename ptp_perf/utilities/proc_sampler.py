@@ -0,0 +1,227 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Iterable, List
+
+CLOCK_TICKS_PER_SECOND = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+PROC_PATH = Path("/proc")
+
+# Types of the thermal zone of the CPU, by platform (normalized to lower case with underscores)
+CPU_THERMAL_ZONE_TYPES = ["cpu_thermal", "cpu_therm"]
+
+
+class ProcFile:
+    """A file in /proc or /sys that is opened once and re-read from the start on every read,
+    which saves the path lookup and open/close system calls of every sample."""
+    path: Path
+    buffer_size: int
+    _fd: Optional[int] = None
+
+    def __init__(self, path: Path, buffer_size: int = 8192):
+        self.path = path
+        self.buffer_size = buffer_size
+
+    def read(self) -> bytes:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDONLY)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        chunks = []
+        while chunk := os.read(self._fd, self.buffer_size):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+@dataclass
+class ProcessSample:
+    cpu_user: float
+    """Cumulative user cpu time in seconds."""
+    cpu_system: float
+    """Cumulative system cpu time in seconds."""
+    mem_rss: int
+    mem_vms: int
+    ctx_switches_voluntary: int
+    ctx_switches_involuntary: int
+    num_threads: int
+    mem_uss: Optional[int] = None
+    """Only present if smaps_rollup was read for this sample."""
+    mem_pss: Optional[int] = None
+    """Only present if smaps_rollup was read for this sample."""
+
+    def __add__(self, other: "ProcessSample") -> "ProcessSample":
+        def add_optional(a, b):
+            return None if a is None or b is None else a + b
+
+        return ProcessSample(
+            cpu_user=self.cpu_user + other.cpu_user,
+            cpu_system=self.cpu_system + other.cpu_system,
+            mem_rss=self.mem_rss + other.mem_rss,
+            mem_vms=self.mem_vms + other.mem_vms,
+            ctx_switches_voluntary=self.ctx_switches_voluntary + other.ctx_switches_voluntary,
+            ctx_switches_involuntary=self.ctx_switches_involuntary + other.ctx_switches_involuntary,
+            num_threads=self.num_threads + other.num_threads,
+            mem_uss=add_optional(self.mem_uss, other.mem_uss),
+            mem_pss=add_optional(self.mem_pss, other.mem_pss),
+        )
+
+
+class ProcessSampler:
+    """Reads the resource consumption of a single process directly from /proc/<pid>/{stat,statm,status}.
+
+    Unlike psutil.Process.memory_full_info, the expensive smaps_rollup (USS/PSS) is only read on request.
+    Raises ProcessLookupError if the process no longer exists."""
+    pid: int
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        base_path = PROC_PATH.joinpath(str(pid))
+        self._stat = ProcFile(base_path.joinpath("stat"))
+        self._statm = ProcFile(base_path.joinpath("statm"))
+        self._status = ProcFile(base_path.joinpath("status"))
+        self._smaps_rollup = ProcFile(base_path.joinpath("smaps_rollup"))
+
+    def sample(self, read_smaps: bool = False) -> ProcessSample:
+        try:
+            # The command name in parentheses may contain spaces, the remaining fields start after it.
+            stat_fields = self._stat.read().rsplit(b")", 1)[1].split()
+            statm_fields = self._statm.read().split()
+            status = self._status.read()
+            memory = self._read_smaps_rollup() if read_smaps else {}
+        except OSError as e:
+            raise ProcessLookupError(f"Process {self.pid} not found: {e}")
+
+        if len(stat_fields) == 0:
+            # A process that has exited but whose files are still open reads as empty.
+            raise ProcessLookupError(f"Process {self.pid} not found.")
+
+        return ProcessSample(
+            # Field numbers as in proc(5), the first field after the command name is field 3 (state).
+            cpu_user=int(stat_fields[14 - 3]) / CLOCK_TICKS_PER_SECOND,
+            cpu_system=int(stat_fields[15 - 3]) / CLOCK_TICKS_PER_SECOND,
+            num_threads=int(stat_fields[20 - 3]),
+            mem_vms=int(statm_fields[0]) * PAGE_SIZE,
+            mem_rss=int(statm_fields[1]) * PAGE_SIZE,
+            ctx_switches_voluntary=self._status_value(status, b"voluntary_ctxt_switches:"),
+            ctx_switches_involuntary=self._status_value(status, b"nonvoluntary_ctxt_switches:"),
+            mem_uss=memory["Private_Clean"] + memory["Private_Dirty"] if read_smaps else None,
+            mem_pss=memory["Pss"] if read_smaps else None,
+        )
+
+    @staticmethod
+    def _status_value(status: bytes, key: bytes) -> int:
+        start = status.index(key) + len(key)
+        return int(status[start:status.index(b"\n", start)])
+
+    def _read_smaps_rollup(self) -> Dict[str, int]:
+        memory = {}
+        for line in self._smaps_rollup.read().splitlines()[1:]:
+            fields = line.split()
+            if len(fields) == 3 and fields[2] == b"kB":
+                memory[fields[0].rstrip(b":").decode()] = int(fields[1]) * 1024
+        return memory
+
+    def close(self):
+        for proc_file in (self._stat, self._statm, self._status, self._smaps_rollup):
+            proc_file.close()
+
+
+@dataclass
+class InterfaceCounters:
+    bytes_received: int
+    packets_received: int
+    bytes_sent: int
+    packets_sent: int
+
+
+class SystemSampler:
+    """Reads network interface counters, the CPU temperature and the CPU frequency from /proc and /sys."""
+
+    def __init__(self):
+        self._net_dev = ProcFile(PROC_PATH.joinpath("net", "dev"))
+        self._cpu_temperature = self._find_cpu_thermal_zone()
+        cpu_frequency_path = Path("/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq")
+        self._cpu_frequency = ProcFile(cpu_frequency_path) if cpu_frequency_path.exists() else None
+
+    @staticmethod
+    def _find_cpu_thermal_zone() -> Optional[ProcFile]:
+        for zone in sorted(Path("/sys/class/thermal").glob("thermal_zone*")):
+            try:
+                zone_type = zone.joinpath("type").read_text().strip().lower().replace("-", "_")
+            except OSError:
+                continue
+            if zone_type in CPU_THERMAL_ZONE_TYPES:
+                return ProcFile(zone.joinpath("temp"))
+        return None
+
+    def interface_counters(self, interface: str) -> Optional[InterfaceCounters]:
+        prefix = interface.encode() + b":"
+        for line in self._net_dev.read().splitlines()[2:]:
+            line = line.strip()
+            if line.startswith(prefix):
+                fields = line[len(prefix):].split()
+                return InterfaceCounters(
+                    bytes_received=int(fields[0]), packets_received=int(fields[1]),
+                    bytes_sent=int(fields[8]), packets_sent=int(fields[9]),
+                )
+        return None
+
+    def cpu_temperature(self) -> Optional[float]:
+        """CPU temperature in degrees celsius."""
+        if self._cpu_temperature is None:
+            return None
+        return int(self._cpu_temperature.read()) / 1000
+
+    def cpu_frequency(self) -> Optional[float]:
+        """Current CPU frequency in MHz."""
+        if self._cpu_frequency is None:
+            return None
+        return int(self._cpu_frequency.read()) / 1000
+
+    def close(self):
+        for proc_file in (self._net_dev, self._cpu_temperature, self._cpu_frequency):
+            if proc_file is not None:
+                proc_file.close()
+
+
+class ProcSampler:
+    """Samples a set of processes (e.g. all processes of a vendor) and the system, keeping the files of every
+    process open between samples. Samplers of processes that are no longer sampled are closed."""
+    system: SystemSampler
+    _process_samplers: Dict[int, ProcessSampler]
+
+    def __init__(self):
+        self.system = SystemSampler()
+        self._process_samplers = {}
+
+    def sample_processes(self, pids: Iterable[int], read_smaps: bool = False) -> Optional[ProcessSample]:
+        """The summed resource consumption of the processes, None if none of them exist."""
+        pids = set(pids)
+        for stale_pid in self._process_samplers.keys() - pids:
+            self._process_samplers.pop(stale_pid).close()
+
+        samples: List[ProcessSample] = []
+        for pid in pids:
+            if pid not in self._process_samplers:
+                self._process_samplers[pid] = ProcessSampler(pid)
+            try:
+                samples.append(self._process_samplers[pid].sample(read_smaps=read_smaps))
+            except ProcessLookupError:
+                self._process_samplers.pop(pid).close()
+
+        if len(samples) == 0:
+            return None
+        total = samples[0]
+        for sample in samples[1:]:
+            total = total + sample
+        return total
+
+    def close(self):
+        self.system.close()
+        for process_sampler in self._process_samplers.values():
+            process_sampler.close()
+        self._process_samplers = {}
@@ -0,0 +1,218 @@
+import math
+import zlib
+from typing import Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+
+class _BucketStore:
+    """Dense bucket counts, indexed from offset."""
+    offset: int
+    counts: np.ndarray
+
+    def __init__(self, offset: int = 0, counts: Optional[np.ndarray] = None):
+        self.offset = offset
+        self.counts = counts if counts is not None else np.zeros(0, dtype=np.int64)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def _extend(self, minimum_index: int, maximum_index: int):
+        if len(self.counts) == 0:
+            self.offset = minimum_index
+            self.counts = np.zeros(maximum_index - minimum_index + 1, dtype=np.int64)
+            return
+        new_offset = min(self.offset, minimum_index)
+        new_end = max(self.offset + len(self.counts), maximum_index + 1)
+        if new_offset != self.offset or new_end != self.offset + len(self.counts):
+            counts = np.zeros(new_end - new_offset, dtype=np.int64)
+            counts[self.offset - new_offset:self.offset - new_offset + len(self.counts)] = self.counts
+            self.offset, self.counts = new_offset, counts
+
+    def add(self, indices: np.ndarray):
+        if len(indices) == 0:
+            return
+        self._extend(int(indices.min()), int(indices.max()))
+        self.counts += np.bincount(indices - self.offset, minlength=len(self.counts))
+
+    def merge(self, other: "_BucketStore"):
+        if len(other.counts) == 0:
+            return
+        self._extend(other.offset, other.offset + len(other.counts) - 1)
+        start = other.offset - self.offset
+        self.counts[start:start + len(other.counts)] += other.counts
+
+
+class QuantileSketch:
+    """
+    A mergeable quantile sketch with relative error guarantees (DDSketch, Masson et al., VLDB 2019).
+
+    Values are counted in logarithmically sized buckets: bucket i holds the values x with gamma^(i-1) < |x| <= gamma^i,
+    where gamma = (1 + relative_accuracy) / (1 - relative_accuracy).
+    Error bound: for every quantile q, the estimate x' of the sample x at rank floor(q * (n - 1)) of the sorted values
+    (numpy.quantile(..., method='lower')) satisfies |x' - x| <= relative_accuracy * |x|.
+    Values with |x| < minimum_value are counted as zero, for those the absolute error is below minimum_value.
+    Count, sum, minimum and maximum are exact, so are the mean and the quantiles 0 and 1.
+
+    Sketches with the same parameters are merged without loss of accuracy by adding up the bucket counts,
+    the size depends on the range of the values (log(max / minimum_value) / log(gamma) buckets), not on their number.
+    """
+    relative_accuracy: float
+    minimum_value: float
+    count: int
+    sum: float
+    minimum: float
+    maximum: float
+    zero_count: int
+    _positive: _BucketStore
+    _negative: _BucketStore
+
+    _format_version = 1
+
+    def __init__(self, relative_accuracy: float = 0.01, minimum_value: float = 1e-12):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"Relative accuracy must be between 0 and 1 (received {relative_accuracy}).")
+        if minimum_value <= 0:
+            raise ValueError(f"Minimum value must be positive (received {minimum_value}).")
+        self.relative_accuracy = relative_accuracy
+        self.minimum_value = minimum_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.count = 0
+        self.sum = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.zero_count = 0
+        self._positive = _BucketStore()
+        self._negative = _BucketStore()
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return (f"QuantileSketch(count={self.count}, relative_accuracy={self.relative_accuracy}, "
+                f"buckets={len(self._positive.counts) + len(self._negative.counts)})")
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count != 0 else None
+
+    def _indices(self, magnitudes: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+    def _value(self, index: int) -> float:
+        # The value with the lowest relative error to all values of the bucket.
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def add(self, values: Union[Sequence[float], np.ndarray]) -> "QuantileSketch":
+        """Add the values (NaNs are ignored)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+        is_zero = np.abs(values) < self.minimum_value
+        self.zero_count += int(np.count_nonzero(is_zero))
+        self._positive.add(self._indices(values[~is_zero & (values > 0)]))
+        self._negative.add(self._indices(-values[~is_zero & (values < 0)]))
+        return self
+
+    def _check_compatible(self, other: "QuantileSketch"):
+        if self.relative_accuracy != other.relative_accuracy or self.minimum_value != other.minimum_value:
+            raise ValueError(f"Cannot merge sketches with different parameters: {self} and {other}.")
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Add the values of the other sketch to this sketch."""
+        self._check_compatible(other)
+        self.count += other.count
+        self.sum += other.sum
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.zero_count += other.zero_count
+        self._positive.merge(other._positive)
+        self._negative.merge(other._negative)
+        return self
+
+    @staticmethod
+    def merge_all(sketches: Iterable["QuantileSketch"]) -> "QuantileSketch":
+        """A new sketch with the values of all the sketches."""
+        sketches = list(sketches)
+        if len(sketches) == 0:
+            raise ValueError("Received no sketches to merge.")
+        merged = QuantileSketch(sketches[0].relative_accuracy, sketches[0].minimum_value)
+        for sketch in sketches:
+            merged.merge(sketch)
+        return merged
+
+    def quantile(self, q: float) -> float:
+        if not 0 <= q <= 1:
+            raise ValueError(f"Quantile must be between 0 and 1 (received {q}).")
+        if self.count == 0:
+            return math.nan
+        if q == 0:
+            return self.minimum
+        if q == 1:
+            return self.maximum
+
+        rank = math.floor(q * (self.count - 1))
+        negative_count = self._negative.total
+        if rank < negative_count:
+            # Negative values in ascending order are the buckets of the magnitudes in descending order.
+            cumulative_counts = np.cumsum(self._negative.counts[::-1])
+            position = int(np.searchsorted(cumulative_counts, rank, side='right'))
+            value = -self._value(self._negative.offset + len(self._negative.counts) - 1 - position)
+        elif rank < negative_count + self.zero_count:
+            value = 0.0
+        else:
+            cumulative_counts = np.cumsum(self._positive.counts)
+            position = int(np.searchsorted(cumulative_counts, rank - negative_count - self.zero_count, side='right'))
+            value = self._value(self._positive.offset + position)
+        return min(max(value, self.minimum), self.maximum)
+
+    def quantiles(self, quantiles: Iterable[float]) -> np.ndarray:
+        return np.array([self.quantile(q) for q in quantiles], dtype=np.float64)
+
+    def to_bytes(self) -> bytes:
+        header = np.array(
+            [self.relative_accuracy, self.minimum_value, self.sum, self.minimum, self.maximum], dtype='<f8'
+        )
+        integers = np.array(
+            [self._format_version, self.count, self.zero_count,
+             self._positive.offset, len(self._positive.counts), self._negative.offset, len(self._negative.counts)],
+            dtype='<i8'
+        )
+        return zlib.compress(
+            header.tobytes() + integers.tobytes()
+            + self._positive.counts.astype('<i8', copy=False).tobytes()
+            + self._negative.counts.astype('<i8', copy=False).tobytes()
+        )
+
+    @staticmethod
+    def from_bytes(data: bytes) -> "QuantileSketch":
+        data = zlib.decompress(data)
+        header = np.frombuffer(data, dtype='<f8', count=5)
+        integers = np.frombuffer(data, dtype='<i8', count=7, offset=header.nbytes)
+        format_version, count, zero_count, positive_offset, positive_length, negative_offset, negative_length = (
+            int(value) for value in integers
+        )
+        if format_version != QuantileSketch._format_version:
+            raise ValueError(f"Unsupported quantile sketch format version {format_version}.")
+
+        sketch = QuantileSketch(relative_accuracy=float(header[0]), minimum_value=float(header[1]))
+        sketch.sum, sketch.minimum, sketch.maximum = (float(value) for value in header[2:])
+        sketch.count, sketch.zero_count = count, zero_count
+        offset = header.nbytes + integers.nbytes
+        sketch._positive = _BucketStore(
+            positive_offset, np.frombuffer(data, dtype='<i8', count=positive_length, offset=offset).astype(np.int64)
+        )
+        offset += 8 * positive_length
+        sketch._negative = _BucketStore(
+            negative_offset, np.frombuffer(data, dtype='<i8', count=negative_length, offset=offset).astype(np.int64)
+        )
+        return sketch
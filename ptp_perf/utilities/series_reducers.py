@@ -0,0 +1,127 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ptp_perf.utilities.quantile_sketch import QuantileSketch
+
+
+class SeriesReducer:
+    """Computes a statistic over a series that is received in chunks (e.g. from SampleQuery.iter_chunks),
+    without holding the entire series in memory. This class is meant to be subclassed."""
+
+    def update(self, chunk: pd.Series):
+        raise NotImplementedError()
+
+    def result(self):
+        raise NotImplementedError()
+
+
+class CountReducer(SeriesReducer):
+    """Number of samples and number of distinct values of an index level (e.g. endpoints)."""
+    count: int
+    level: Optional[str]
+    _level_values: set
+
+    def __init__(self, level: Optional[str] = "endpoint_id"):
+        self.count = 0
+        self.level = level
+        self._level_values = set()
+
+    def update(self, chunk: pd.Series):
+        self.count += len(chunk)
+        if self.level is not None:
+            self._level_values.update(chunk.index.get_level_values(self.level).unique())
+
+    @property
+    def level_count(self) -> int:
+        return len(self._level_values)
+
+    def result(self) -> int:
+        return self.count
+
+
+class MeanReducer(SeriesReducer):
+    total: float = 0
+    count: int = 0
+
+    def update(self, chunk: pd.Series):
+        self.total += chunk.sum()
+        self.count += chunk.count()
+
+    def result(self) -> Optional[float]:
+        return self.total / self.count if self.count != 0 else None
+
+
+class MinMaxReducer(SeriesReducer):
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+    def update(self, chunk: pd.Series):
+        if len(chunk) == 0:
+            return
+        chunk_minimum, chunk_maximum = chunk.min(), chunk.max()
+        self.minimum = chunk_minimum if self.minimum is None else min(self.minimum, chunk_minimum)
+        self.maximum = chunk_maximum if self.maximum is None else max(self.maximum, chunk_maximum)
+
+    def result(self):
+        return self.minimum, self.maximum
+
+
+class HistogramReducer(SeriesReducer):
+    """Counts of the values per bin, values outside of the bins are counted in underflow/overflow."""
+    bin_edges: np.ndarray
+    counts: np.ndarray
+    underflow: int = 0
+    overflow: int = 0
+
+    def __init__(self, bin_edges: Sequence[float]):
+        self.bin_edges = np.asarray(bin_edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.bin_edges) - 1, dtype=np.int64)
+
+    def update(self, chunk: pd.Series):
+        values = chunk.to_numpy()
+        self.counts += np.histogram(values, bins=self.bin_edges)[0]
+        self.underflow += np.count_nonzero(values < self.bin_edges[0])
+        self.overflow += np.count_nonzero(values > self.bin_edges[-1])
+
+    def result(self) -> np.ndarray:
+        return self.counts
+
+
+class QuantileReducer(SeriesReducer):
+    """Exact quantiles. The values (without index) are kept in a compact float64 buffer, which needs a fraction
+    of the memory of the indexed series but still grows with the number of samples."""
+    quantiles: List[float]
+    _buffers: List[np.ndarray]
+
+    def __init__(self, quantiles: Sequence[float]):
+        self.quantiles = list(quantiles)
+        self._buffers = []
+
+    def update(self, chunk: pd.Series):
+        self._buffers.append(chunk.to_numpy(dtype=np.float64, copy=True))
+
+    def result(self) -> np.ndarray:
+        values = np.concatenate(self._buffers) if len(self._buffers) != 0 else np.empty(0)
+        # Compact the buffers, further updates are possible.
+        self._buffers = [values]
+        if len(values) == 0:
+            return np.full(len(self.quantiles), np.nan)
+        return np.quantile(values, self.quantiles)
+
+
+class QuantileSketchReducer(SeriesReducer):
+    """Approximate quantiles in bounded memory, see QuantileSketch for the error bound."""
+    quantiles: List[float]
+    sketch: QuantileSketch
+
+    def __init__(self, quantiles: Sequence[float], relative_accuracy: float = 0.01):
+        self.quantiles = list(quantiles)
+        self.sketch = QuantileSketch(relative_accuracy=relative_accuracy)
+
+    def update(self, chunk: pd.Series):
+        self.sketch.add(chunk.to_numpy(dtype=np.float64))
+
+    def result(self) -> np.ndarray:
+        return self.sketch.quantiles(self.quantiles)
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import ClassVar, List, Optional, Self
+
+from django.db import connection
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+MONOTONIC_TIME_ATTRIBUTE = "monotonic_time"
+"""Attribute of a logging.LogRecord with the local monotonic time (ns) to timestamp it with instead of its emission."""
+
+
+def datetime_to_ns(value: datetime) -> int:
+    """Convert a timezone aware datetime to integer nanoseconds since the epoch without losing precision."""
+    return (value - EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def ns_to_datetime(value: int) -> datetime:
+    """Convert integer nanoseconds since the epoch to a timezone aware (UTC) datetime (microsecond resolution)."""
+    return EPOCH + timedelta(microseconds=value // 1000)
+
+
+def query_server_datetime() -> datetime:
+    """Query the current time from the database server. This is a network round trip, use ServerClock instead."""
+    if connection.vendor == 'sqlite':
+        # A local database file has no clock of its own.
+        return datetime.now(timezone.utc)
+    with connection.cursor() as cursor:
+        # NOW() is the start of the current transaction, clock_timestamp() is the actual time.
+        cursor.execute("SELECT clock_timestamp()")
+        return cursor.fetchone()[0]
+
+
+@dataclass
+class ServerClockSample:
+    """A single NTP-style measurement of the server clock against the local monotonic clock."""
+    offset: int
+    """Server time (ns since epoch) minus local monotonic time (ns) at the midpoint of the query."""
+    round_trip_time: int
+    """Duration of the query in ns. The true offset is within half of this of the measured offset."""
+
+    @property
+    def error_bound(self) -> int:
+        return self.round_trip_time // 2
+
+
+@dataclass
+class ServerClock:
+    """Estimates the offset between the local monotonic clock and the database server clock.
+
+    Several round trip samples are taken on synchronization and the one with the lowest round trip time is kept.
+    Server timestamps are then computed from the monotonic clock without any I/O, which also makes them immune to
+    jumps of the local wall clock (which we do on purpose during benchmarks).
+    The estimate is refreshed once it is older than refresh_interval. A warning is logged if the refreshed offset
+    disagrees with the previous estimate by more than the combined error bounds plus drift_alarm_threshold.
+    """
+    num_samples: int = 5
+    refresh_interval: timedelta = timedelta(minutes=5)
+    drift_alarm_threshold: timedelta = timedelta(milliseconds=10)
+
+    offset: Optional[ServerClockSample] = None
+    """The current best offset estimate."""
+    synchronization_time: Optional[int] = None
+    """Local monotonic time (ns) of the last synchronization."""
+    drift: Optional[int] = None
+    """Change of the offset (ns) observed at the last refresh."""
+    drift_alarms: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    singleton: ClassVar[Optional[Self]] = None
+
+    @classmethod
+    def resolve(cls) -> Self:
+        if cls.singleton is None:
+            cls.singleton = cls()
+        return cls.singleton
+
+    @staticmethod
+    def measure() -> ServerClockSample:
+        local_start = time.monotonic_ns()
+        server_time = query_server_datetime()
+        local_end = time.monotonic_ns()
+        return ServerClockSample(
+            offset=datetime_to_ns(server_time) - (local_start + local_end) // 2,
+            round_trip_time=local_end - local_start,
+        )
+
+    def synchronize(self):
+        """Take num_samples measurements and update the offset estimate with the most accurate one."""
+        with self._lock:
+            samples: List[ServerClockSample] = [self.measure() for _ in range(self.num_samples)]
+            best_sample = min(samples, key=lambda sample: sample.round_trip_time)
+
+            if self.offset is not None:
+                self.drift = best_sample.offset - self.offset.offset
+                tolerance = (self.offset.error_bound + best_sample.error_bound
+                             + self.drift_alarm_threshold // timedelta(microseconds=1) * 1000)
+                if abs(self.drift) > tolerance:
+                    self.drift_alarms += 1
+                    logging.warning(
+                        f"Server clock drifted by {timedelta(microseconds=self.drift // 1000)} since the last "
+                        f"synchronization (tolerance {timedelta(microseconds=tolerance // 1000)})."
+                    )
+
+            self.offset = best_sample
+            self.synchronization_time = time.monotonic_ns()
+
+    @property
+    def stale(self) -> bool:
+        return (self.synchronization_time is None
+                or time.monotonic_ns() - self.synchronization_time > self.refresh_interval // timedelta(microseconds=1) * 1000)
+
+    @property
+    def error_bound(self) -> Optional[timedelta]:
+        """The uncertainty of the timestamps handed out by this clock (excluding drift since the last refresh)."""
+        if self.offset is None:
+            return None
+        return timedelta(microseconds=self.offset.error_bound // 1000)
+
+    def refresh_if_stale(self):
+        """Synchronize if the offset estimate is stale. Keeps the previous estimate if the database is unreachable."""
+        if not self.stale:
+            return
+        try:
+            self.synchronize()
+        except Exception as e:
+            if self.offset is None:
+                raise
+            # The database may be temporarily unreachable (e.g. during hardware faults), keep the last estimate.
+            logging.warning(f"Failed to refresh server clock offset, keeping previous estimate: {e}")
+            self.synchronization_time = time.monotonic_ns()
+
+    def server_time_of(self, monotonic_time: int, refresh: bool = True) -> datetime:
+        """Convert a local monotonic timestamp (ns, from time.monotonic_ns()) to server time.
+        Without refresh, a stale estimate is used as is (no I/O), the clock must have been synchronized before."""
+        if refresh:
+            self.refresh_if_stale()
+        if self.offset is None:
+            raise RuntimeError("The server clock was never synchronized.")
+        return ns_to_datetime(monotonic_time + self.offset.offset)
+
+    def now(self) -> datetime:
+        """The current server time. Only performs I/O if the offset estimate needs to be refreshed."""
+        return self.server_time_of(time.monotonic_ns())